@@ -1,38 +1,146 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort
-from database import create_tables
-from services import TripService, BookingService, ExpenseService, AuthService
+"""Trip Management System web app.
+
+create_app(config) builds the Flask app. Building it does no database work.
+Engines connect on the first request that needs them, and the schema is set
+up by an explicit step (`python migrations.py`, or MIGRATE_ON_START) instead
+of on every worker start. WSGI servers can load `app:create_app()` or the
+default instance `app:app`, which is built on first access.
+"""
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort, g, Response, stream_with_context, current_app
+from database import create_tables, db_session
+from services import TripService, BookingService, ExpenseService, AuthService, SearchService, TripStatsService
 from functools import wraps
+from typing import Optional
 from flask_wtf import CSRFProtect
 from flask_wtf.csrf import generate_csrf
+import batch
+import bulk
+import database
 import notifications
+import reports
+import profiling
+import writer
+from passwords import HashingBusy
+from cache import page_cache
+from checkouts import checkout_store
+import hmac
+import io
 import os
+import threading
 
-create_tables()
-
-app = Flask(__name__)
-app.secret_key = "dev-secret-change-this"
-csrf = CSRFProtect(app)
+csrf = CSRFProtect()
 
+# services are stateless; each call uses the request's session, opened on first use
 trip_svc = TripService()
 booking_svc = BookingService()
 expense_svc = ExpenseService()
 auth_svc = AuthService()
+search_svc = SearchService()
+stats_svc = TripStatsService()
+report_svc = reports.ReportService()
+
+# Views are declared here and added to each app by create_app(). Unlike a blueprint this keeps
+# endpoint names unprefixed ("index", "view_trip"), as templates and /metrics labels use them.
+_routes = []
+
+def route(rule, **options):
+    def decorator(f):
+        _routes.append((rule, options, f))
+        return f
+    return decorator
+
+def create_app(config: Optional[dict] = None) -> Flask:
+    """Build the app from environment settings, overridden by `config`:
+    SECRET_KEY, DATABASE_URL (before first use), MIGRATE_ON_START (run create_tables() now),
+    OUTBOX_WORKER ("thread": deliver from a thread started by the first request, or "off") and PROFILING."""
+    app = Flask(__name__)
+    app.config.from_mapping(
+        SECRET_KEY=os.environ.get("SECRET_KEY", "dev-secret-change-this"),
+        DATABASE_URL=None,
+        MIGRATE_ON_START=os.environ.get("MIGRATE_ON_START", "off") == "on",
+        OUTBOX_WORKER=os.environ.get("OUTBOX_WORKER", "thread"),
+        PROFILING=os.environ.get("PROFILING") == "1",
+    )
+    app.config.from_mapping(config or {})
+    if app.config["DATABASE_URL"]:
+        database.configure(app.config["DATABASE_URL"])
+    if app.config["MIGRATE_ON_START"]:
+        create_tables()
+
+    csrf.init_app(app)
+    app.register_error_handler(writer.WriteQueueFull, server_busy)
+    app.register_error_handler(HashingBusy, server_busy)
+    app.before_request(route_reads)
+    app.teardown_appcontext(shutdown_session)
+    app.context_processor(inject_user)
+    for rule, options, view in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+    # deliver queued notification emails off the request thread (set OUTBOX_WORKER=off when
+    # running `python notifications.py` as a separate process instead). The thread starts with the
+    # first request, so building the app for scripts, tests or a pre-forking master polls nothing.
+    if app.config["OUTBOX_WORKER"] == "thread":
+        app.before_request(start_outbox_worker)
+    # per-endpoint timing (total / SQL / templates) and query counts, scraped from /metrics;
+    # instrumenting the engines creates them up front
+    if app.config["PROFILING"]:
+        app.extensions["profiler"] = profiling.RequestProfiler(app, binds=database.engines())
+    return app
+
+def __getattr__(name):
+    # the default app for `from app import app` and `app:app`, built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def server_busy(exc):
+    # back-pressure from the single-writer queue or the password-hashing pool: ask the client to retry shortly
+    resp = Response("The server is busy; please try again in a moment.", status=503, mimetype="text/plain")
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+# GET/HEAD handlers only read, so their session runs on the read-only pool and never
+# queues behind a writer's connection
+def route_reads():
+    if request.method in ("GET", "HEAD"):
+        db_session().info["read_only"] = True
+
+_outbox_lock = threading.Lock()
+
+def start_outbox_worker():
+    app = current_app._get_current_object()
+    if "outbox_worker" not in app.extensions:
+        with _outbox_lock:
+            if "outbox_worker" not in app.extensions:
+                app.extensions["outbox_worker"] = notifications.start_worker()
+
+# each request gets its own session from the pool; finish it when the request ends
+def shutdown_session(exc=None):
+    try:
+        if exc is None:
+            db_session.commit()
+        else:
+            db_session.rollback()
+    finally:
+        db_session.remove()
+
+def get_current_user():
+    """Logged-in user's Identity, resolved at most once per request and kept on flask.g."""
+    if "current_user" not in g:
+        user_id = session.get("user_id")
+        g.current_user = auth_svc.get_identity(user_id) if user_id else None
+    return g.current_user
 
 # expose current_user and csrf_token to templates
-@app.context_processor
 def inject_user():
-    user = None
-    user_id = session.get("user_id")
-    if user_id:
-        user = auth_svc.get_user_by_id(user_id)
-    return dict(current_user=user, csrf_token=generate_csrf)
+    return dict(current_user=get_current_user(), csrf_token=generate_csrf)
 
 def require_role(allowed_roles):
     def decorator(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-            user_id = session.get("user_id")
-            user = auth_svc.get_user_by_id(user_id) if user_id else None
+            user = get_current_user()
             if not user:
                 flash("Login required.")
                 return redirect(url_for("login"))
@@ -46,13 +154,77 @@ def require_role(allowed_roles):
         return wrapped
     return decorator
 
-@app.route("/")
+def cached_page(tags):
+    """Serve a GET page from page_cache, keyed by path + query string and the viewer's variant
+    (role, id and, for agents, approval: approving an agent must not serve their pending-approval pages).
+    `tags(**view_args)` lists the invalidation tags the page depends on; service writes bump them."""
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            # pages carrying flash messages are one-off; don't serve or store them
+            if not page_cache.enabled or session.get("_flashes"):
+                return f(*args, **kwargs)
+            user = get_current_user()
+            variant = f"{user.role}:{user.id}" if user else "anon"
+            if user and user.role == "agent":
+                variant += ":approved" if user.agent_approved else ":pending"
+            key = page_cache.key(request.full_path, tags(**kwargs), variant)
+            html = page_cache.get(key)
+            if html is not None:
+                return html
+            rv = f(*args, **kwargs)
+            if isinstance(rv, str):
+                page_cache.set(key, rv)
+            return rv
+        return wrapped
+    return decorator
+
+def page_args():
+    """Keyset cursor and page size from ?after_id= / ?before_id= / ?limit=."""
+    return {"after_id": request.args.get("after_id", type=int),
+            "before_id": request.args.get("before_id", type=int),
+            "limit": request.args.get("limit", type=int)}
+
+def directory_args(role=None):
+    """Admin directory filters from ?role= (customer/agent/admin), ?status= (pending/approved) and ?q= (username prefix)."""
+    if role is None and request.args.get("role") in ("customer", "agent", "admin"):
+        role = request.args["role"]
+    status = request.args.get("status")
+    return {"role": role, "approved": {"pending": False, "approved": True}.get(status),
+            "prefix": request.args.get("q", "").strip() or None}
+
+def trip_page():
+    """Keyset page of trips from ?after_id= / ?before_id= / ?limit= query args."""
+    return trip_svc.page(**page_args())
+
+@route("/")
+@cached_page(lambda: ["index"])
 def index():
-    trips = trip_svc.list()
-    return render_template("index.html", trips=trips)
+    page = trip_page()
+    return render_template("index.html", trips=page.items, page=page)
+
+# Search
+SEARCH_PAGE_SIZE = 24
+
+def search_args():
+    return {"q": request.args.get("q", "").strip(),
+            "min_price": request.args.get("min_price", type=float),
+            "max_price": request.args.get("max_price", type=float),
+            "date_from": request.args.get("date_from", "").strip() or None,
+            "date_to": request.args.get("date_to", "").strip() or None,
+            "offset": max(request.args.get("offset", 0, type=int), 0)}
+
+@route("/search")
+def search():
+    args = search_args()
+    trips = search_svc.search(limit=SEARCH_PAGE_SIZE, **args)
+    # only non-empty values go back into the links
+    current = {k: v for k, v in args.items() if v not in (None, "")}
+    current.setdefault("offset", 0)
+    return render_template("search.html", trips=trips, search=current, limit=SEARCH_PAGE_SIZE)
 
 # Auth
-@app.route("/signup", methods=["GET", "POST"])
+@route("/signup", methods=["GET", "POST"])
 def signup():
     if request.method == "POST":
         username = request.form.get("username", "").strip()
@@ -69,7 +241,7 @@ def signup():
         return redirect(url_for("index"))
     return render_template("signup_customer.html")
 
-@app.route("/agent/signup", methods=["GET", "POST"])
+@route("/agent/signup", methods=["GET", "POST"])
 def agent_signup():
     if request.method == "POST":
         username = request.form.get("username", "").strip()
@@ -85,7 +257,7 @@ def agent_signup():
         return redirect(url_for("index"))
     return render_template("signup_agent.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form.get("username", "").strip()
@@ -102,14 +274,14 @@ def login():
         flash("Invalid credentials.")
     return render_template("login.html")
 
-@app.route("/logout")
+@route("/logout")
 def logout():
     session.pop("user_id", None)
     flash("Signed out.")
     return redirect(url_for("index"))
 
 # Trips (agent/admin only to create/edit/delete)
-@app.route("/trip/add", methods=["GET", "POST"])
+@route("/trip/add", methods=["GET", "POST"])
 @require_role(["agent", "admin"])
 def add_trip():
     if request.method == "POST":
@@ -118,7 +290,8 @@ def add_trip():
             "destination": request.form.get("destination", "").strip(),
             "date": request.form.get("date", "").strip(),
             "description": request.form.get("description", "").strip(),
-            "price": float(request.form.get("price")) if request.form.get("price") else None
+            "price": float(request.form.get("price")) if request.form.get("price") else None,
+            "capacity": int(request.form.get("capacity")) if request.form.get("capacity") else None
         }
         if not data["title"]:
             flash("Title required.")
@@ -128,7 +301,8 @@ def add_trip():
         return redirect(url_for("view_trip", id=trip.id))
     return render_template("add_trip.html", trip=None)
 
-@app.route("/trip/<int:id>")
+@route("/trip/<int:id>")
+@cached_page(lambda id: [f"trip:{id}"])
 def view_trip(id):
     trip = trip_svc.get(id)
     if not trip:
@@ -138,7 +312,7 @@ def view_trip(id):
     expenses = expense_svc.list_for_trip(id)
     return render_template("view_trip.html", trip=trip, bookings=bookings, expenses=expenses)
 
-@app.route("/trip/<int:id>/edit", methods=["GET", "POST"])
+@route("/trip/<int:id>/edit", methods=["GET", "POST"])
 @require_role(["agent", "admin"])
 def edit_trip(id):
     trip = trip_svc.get(id)
@@ -151,14 +325,15 @@ def edit_trip(id):
             "destination": request.form.get("destination", trip.destination).strip(),
             "date": request.form.get("date", trip.date).strip(),
             "description": request.form.get("description", trip.description).strip(),
-            "price": float(request.form.get("price")) if request.form.get("price") else None
+            "price": float(request.form.get("price")) if request.form.get("price") else None,
+            "capacity": int(request.form.get("capacity")) if request.form.get("capacity") else None
         }
         trip_svc.update(id, **data)
         flash("Trip updated.")
         return redirect(url_for("view_trip", id=id))
     return render_template("add_trip.html", trip=trip)
 
-@app.route("/trip/<int:id>/delete", methods=["POST"])
+@route("/trip/<int:id>/delete", methods=["POST"])
 @require_role(["agent", "admin"])
 def delete_trip(id):
     trip_svc.delete(id)
@@ -166,9 +341,9 @@ def delete_trip(id):
     return redirect(url_for("index"))
 
 # Bookings listing (role-aware)
-@app.route("/bookings")
+@route("/bookings")
 def all_bookings():
-    user = session.get("user_id") and auth_svc.get_user_by_id(session.get("user_id"))
+    user = get_current_user()
     if not user:
         flash("Login required to view bookings.")
         return redirect(url_for("login"))
@@ -179,7 +354,7 @@ def all_bookings():
     return render_template("bookings_list.html", bookings=bookings)
 
 # Booking flow: modal posts to checkout, then complete
-@app.route("/booking/checkout", methods=["POST"])
+@route("/booking/checkout", methods=["POST"])
 def booking_checkout():
     trip_id = request.form.get("trip_id")
     if not trip_id:
@@ -195,31 +370,48 @@ def booking_checkout():
         flash("Trip not found.")
         return redirect(url_for("index"))
     customer_name = request.form.get("customer_name", "").strip() or "Guest"
-    seats = int(request.form.get("seats") or 1)
+    seats = request.form.get("seats", 1, type=int)
+    if not seats or seats < 1:
+        flash("Invalid number of seats.")
+        return redirect(url_for("add_booking_page", trip_id=trip_id))
     contact = request.form.get("contact", "").strip()
-    # store pending booking in session for payment step
-    session["pending_booking"] = {"trip_id": trip_id, "customer_name": customer_name, "seats": seats, "contact": contact}
-    return render_template("payment.html", trip=trip, booking=session["pending_booking"])
-
-@app.route("/booking/complete", methods=["POST"])
+    # release a hold left by an earlier, abandoned checkout in this session
+    previous = checkout_store.pop(session.pop("checkout_id", None))
+    if previous and previous.get("hold_id"):
+        booking_svc.cancel_hold(previous["hold_id"])
+    hold = booking_svc.reserve(trip_id, seats)
+    if not hold:
+        flash("Sorry, not enough seats left on this trip.")
+        return redirect(url_for("view_trip", id=trip_id))
+    # keep the pending booking server-side for the payment step; the cookie only gets its id
+    pending = {"trip_id": trip_id, "customer_name": customer_name, "seats": seats, "contact": contact,
+               "hold_id": hold.id}
+    session["checkout_id"] = checkout_store.start(pending)
+    return render_template("payment.html", trip=trip, booking=pending, hold=hold)
+
+@route("/booking/complete", methods=["POST"])
 def booking_complete():
     # CSRFProtect enforces token automatically for POST requests when enabled.
-    pending = session.pop("pending_booking", None)
+    pending = checkout_store.pop(session.pop("checkout_id", None))
     if not pending:
         flash("No pending booking.")
         return redirect(url_for("index"))
     user_id = session.get("user_id")
-    booking = booking_svc.create(trip_id=pending["trip_id"],
-                                 user_id=user_id,
-                                 customer_name=pending["customer_name"],
-                                 seats=pending["seats"],
-                                 contact=pending["contact"])
+    booking = booking_svc.confirm(pending.get("hold_id"),
+                                  trip_id=pending["trip_id"],
+                                  seats=pending["seats"],
+                                  user_id=user_id,
+                                  customer_name=pending["customer_name"],
+                                  contact=pending["contact"])
+    if not booking:
+        flash("Your seat reservation expired and the trip no longer has enough seats.")
+        return redirect(url_for("view_trip", id=pending["trip_id"]))
     # render confirmation page with booking and trip info
     trip = trip_svc.get(booking.trip_id)
     return render_template("booking_confirmation.html", booking=booking, trip=trip)
 
 # Classic add-booking page (optional) - kept but unique name
-@app.route("/trip/<int:trip_id>/booking/add", methods=["GET"], endpoint="add_booking_page")
+@route("/trip/<int:trip_id>/booking/add", methods=["GET"], endpoint="add_booking_page")
 def add_booking_page(trip_id):
     trip = trip_svc.get(trip_id)
     if not trip:
@@ -227,7 +419,7 @@ def add_booking_page(trip_id):
         return redirect(url_for("index"))
     return render_template("add_booking.html", trip=trip, booking=None)
 
-@app.route("/booking/<int:id>")
+@route("/booking/<int:id>")
 def view_booking(id):
     booking = booking_svc.get(id)
     if not booking:
@@ -235,7 +427,7 @@ def view_booking(id):
         return redirect(url_for("index"))
     return render_template("view_booking.html", booking=booking, expenses=expense_svc.list_for_booking(id))
 
-@app.route("/booking/<int:id>/edit", methods=["GET", "POST"])
+@route("/booking/<int:id>/edit", methods=["GET", "POST"])
 @require_role(["agent", "admin"])
 def edit_booking(id):
     booking = booking_svc.get(id)
@@ -248,12 +440,14 @@ def edit_booking(id):
             "seats": int(request.form.get("seats") or booking.seats),
             "contact": request.form.get("contact", booking.contact).strip()
         }
-        booking_svc.update(id, **data)
+        if not booking_svc.update(id, **data):
+            flash("Not enough seats left on this trip.")
+            return redirect(url_for("edit_booking", id=id))
         flash("Booking updated.")
         return redirect(url_for("view_booking", id=id))
     return render_template("add_booking.html", trip=booking.trip, booking=booking)
 
-@app.route("/booking/<int:id>/delete", methods=["POST"])
+@route("/booking/<int:id>/delete", methods=["POST"])
 @require_role(["agent", "admin"])
 def delete_booking(id):
     b = booking_svc.get(id)
@@ -262,7 +456,7 @@ def delete_booking(id):
     flash("Booking deleted.")
     return redirect(url_for("bookings_for_trip", trip_id=trip_id) if trip_id else url_for("all_bookings"))
 
-@app.route("/trip/<int:trip_id>/bookings")
+@route("/trip/<int:trip_id>/bookings")
 @require_role(["agent", "admin"])
 def bookings_for_trip(trip_id):
     trip = trip_svc.get(trip_id)
@@ -273,91 +467,287 @@ def bookings_for_trip(trip_id):
     return render_template("bookings.html", trip=trip, bookings=bookings)
 
 # Admin
-@app.route("/admin")
+@route("/admin")
 @require_role(["admin"])
 def admin():
-    trips = trip_svc.list()
-    pending_agents = auth_svc.list_pending_agents()
-    return render_template("admin.html", trips=trips, pending_agents=pending_agents)
+    trip_count = trip_svc.count()
+    return render_template("admin.html", trip_count=trip_count, user_counts=auth_svc.directory_counts(),
+                           totals=stats_svc.totals(),
+                           cache_stats=page_cache.stats(), checkout_stats=checkout_store.stats())
+
+@route("/admin/cache")
+@require_role(["admin"])
+def admin_cache_stats():
+    return jsonify(page_cache.stats())
 
-@app.route("/customer")
+@route("/admin/checkouts")
+@require_role(["admin"])
+def admin_checkout_stats():
+    return jsonify(checkout_store.stats())
+
+@route("/metrics")
+@require_role(["admin"])
+def metrics():
+    profiler = current_app.extensions.get("profiler")
+    if profiler is None and writer.coordinator is None:
+        abort(404)
+    collectors = list(profiler.collectors) if profiler else []
+    cache = page_cache.stats()
+    extra = [*profiling.gauge("trip_page_cache_hits", "Rendered-page cache hits since start.", cache["hits"]),
+             *profiling.gauge("trip_page_cache_misses", "Rendered-page cache misses since start.", cache["misses"]),
+             *profiling.gauge("trip_db_pool_checked_out", "Pooled connections currently in use.",
+                              database.get_engine().pool.checkedout()),
+             *profiling.gauge("trip_checkouts_live", "Checkouts started and not yet completed or expired.",
+                              checkout_store.backend.live())]
+    if writer.coordinator:
+        collectors.extend(writer.coordinator.collectors())
+        extra.extend(profiling.gauge("trip_write_queue_depth", "Writes waiting for the writer thread.",
+                                     writer.coordinator.depth))
+    return Response(profiling.render(collectors, extra), mimetype="text/plain; version=0.0.4")
+
+@route("/admin/slow-queries")
+@require_role(["admin"])
+def admin_slow_queries():
+    profiler = current_app.extensions.get("profiler")
+    if profiler is None:
+        abort(404)
+    return jsonify(list(profiler.slow_queries))
+
+def report_args():
+    """Validated ?from=YYYY-MM-DD&to=YYYY-MM-DD&sort=&limit=&offset= for the reports views."""
+    start = reports.parse_day(request.args.get("from"))
+    end = reports.parse_day(request.args.get("to"))
+    sort = request.args.get("sort", "margin")
+    if sort not in reports.ReportService.SORTS:
+        sort = "margin"
+    return {"start": start, "end": end, "sort": sort,
+            "limit": request.args.get("limit", 100, type=int),
+            "offset": request.args.get("offset", 0, type=int)}
+
+@route("/admin/reports")
+@require_role(["admin"])
+def admin_reports():
+    try:
+        args = report_args()
+    except ValueError:
+        flash("Dates must be YYYY-MM-DD.")
+        return redirect(url_for("admin_reports"))
+    rows = report_svc.trip_profitability(**args)
+    totals = report_svc.totals(args["start"], args["end"])
+    return render_template("admin_reports.html", rows=rows, totals=totals, args=args)
+
+@route("/api/reports/trips")
+@require_role(["admin"])
+def api_trip_reports():
+    try:
+        args = report_args()
+    except ValueError:
+        return jsonify({"error": "dates must be YYYY-MM-DD"}), 400
+    rows = report_svc.trip_profitability(**args)
+    return jsonify({"items": [r.to_dict() for r in rows],
+                    "totals": report_svc.totals(args["start"], args["end"])})
+
+@route("/customer")
 @require_role(["customer"])
 def customer():
     """Customer area: show current customer's bookings."""
-    user_id = session.get("user_id")
-    if not user_id:
-        flash("Please log in.")
-        return redirect(url_for("login"))
-    user = auth_svc.get_user_by_id(user_id)
+    user = get_current_user()
     if not user or user.role != "customer":
         flash("Customer access only.")
         return redirect(url_for("index"))
     bookings = booking_svc.list_for_user(user.id)
     return render_template("customer.html", bookings=bookings, current_user=user)
 
-@app.route("/admin/users")
+@route("/admin/users")
 @require_role(["admin"])
 def admin_users():
-    users = auth_svc.list_users()
-    return render_template("admin_users.html", users=users)
+    args = directory_args()
+    page = auth_svc.directory(**args, **page_args())
+    return render_template("admin_users.html", users=page.items, page=page, filters=args,
+                           counts=auth_svc.directory_counts(args["prefix"]))
 
-@app.route("/admin/agents")
+@route("/admin/agents")
 @require_role(["admin"])
 def admin_agents():
-    agents = auth_svc.list_agents()
-    return render_template("admin_agents.html", agents=agents)
+    args = directory_args(role="agent")
+    page = auth_svc.directory(**args, **page_args())
+    return render_template("admin_agents.html", agents=page.items, page=page, filters=args,
+                           counts=auth_svc.directory_counts(args["prefix"]))
 
-@app.route("/admin/agent/<int:agent_id>/approve", methods=["POST"])
+@route("/admin/agents/bulk", methods=["POST"])
+@require_role(["admin"])
+def bulk_agents():
+    ids = [int(i) for i in request.form.getlist("agent_id") if i.isdigit()]
+    action = request.form.get("action")
+    if action == "approve":
+        flash(f"{auth_svc.approve_agents(ids)} agent(s) approved.")
+    elif action == "reject":
+        flash(f"{auth_svc.reject_agents(ids)} agent request(s) rejected and removed.")
+    else:
+        flash("Choose approve or reject.")
+    return redirect(url_for("admin_agents", **{k: v for k, v in request.args.items() if k in ("status", "q")}))
+
+@route("/admin/agent/<int:agent_id>/approve", methods=["POST"])
 @require_role(["admin"])
 def approve_agent(agent_id):
+    # the notification email is queued in the same transaction and sent by the outbox worker
     ok = auth_svc.approve_agent(agent_id)
     if ok:
-        user = auth_svc.get_user_by_id(agent_id)
-        try:
-            notifications.notify_agent_approval(user, approved=True)
-        except Exception:
-            pass
         flash("Agent approved.")
     else:
         flash("Could not approve agent.")
     return redirect(url_for("admin_agents"))
 
-@app.route("/admin/agent/<int:agent_id>/reject", methods=["POST"])
+@route("/admin/agent/<int:agent_id>/reject", methods=["POST"])
 @require_role(["admin"])
 def reject_agent(agent_id):
-    u = auth_svc.get_user_by_id(agent_id)
     ok = auth_svc.reject_agent(agent_id)
     if ok:
-        try:
-            notifications.notify_agent_approval(u, approved=False)
-        except Exception:
-            pass
         flash("Agent request rejected and account removed.")
     else:
         flash("Could not reject agent.")
     return redirect(url_for("admin_agents"))
 
+# Batch JSON writes for integrations (see batch.py). Authenticated either by an approved
+# agent/admin session (send the CSRF token as X-CSRFToken) or, for machine clients,
+# by "Authorization: Bearer $API_TOKEN" when API_TOKEN is set.
+def api_token_ok() -> bool:
+    token = os.environ.get("API_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(auth.encode(), f"Bearer {token}".encode())
+
+@route("/api/batch/<entity>", methods=["POST"])
+@csrf.exempt
+def api_batch(entity):
+    if entity not in batch.SERVICES:
+        abort(404)
+    if not api_token_ok():
+        user = get_current_user()
+        if not user:
+            return jsonify({"error": "login or API token required"}), 401
+        if user.role not in ("agent", "admin") or (user.role == "agent" and not user.agent_approved):
+            return jsonify({"error": "forbidden"}), 403
+        csrf.protect()
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({"error": "expected a JSON body"}), 400
+    try:
+        operations, atomic = batch.parse(payload)
+    except batch.BatchError as e:
+        return jsonify({"error": str(e)}), e.status
+    result = batch.run(entity, operations, atomic=atomic)
+    return jsonify(result), 200 if result["committed"] else 422
+
+# Bulk import/export (streaming; see bulk.py)
+@route("/admin/import/<entity>", methods=["POST"])
+@require_role(["agent", "admin"])
+def bulk_import(entity):
+    if entity not in bulk.ENTITIES:
+        abort(404)
+    upload = request.files.get("file")
+    if upload:
+        fmt = request.form.get("format") or bulk.guess_format(upload.filename)
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8", newline="")
+    else:
+        fmt = request.args.get("format") or ("ndjson" if "ndjson" in (request.mimetype or "") else "csv")
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        result = bulk.import_rows(entity, bulk.read_rows(stream, fmt))
+    except bulk.BulkError as e:
+        # rows before an unreadable part of the input are already committed; say how many
+        partial = e.result.to_dict() if e.result else {}
+        return jsonify({"error": str(e), **partial}), 400
+    if upload and request.accept_mimetypes.accept_html:
+        flash(f"Imported {result.inserted} {entity}; {result.rejected} row(s) rejected.")
+        return redirect(url_for("admin"))
+    return jsonify(result.to_dict())
+
+@route("/admin/export/<entity>.<fmt>")
+@require_role(["agent", "admin"])
+def bulk_export(entity, fmt):
+    if entity not in bulk.ENTITIES or fmt not in ("csv", "ndjson"):
+        abort(404)
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(bulk.export_rows(entity, fmt)), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={entity}.{fmt}"})
+
 # Simple JSON API endpoints
-@app.route("/api/trips")
+def catalogue_validators(*parts):
+    """ETag/Last-Modified for an API response derived from the catalogue version stamp.
+    Returns (etag, last_modified, not_modified) without touching any trip rows."""
+    version, updated_at = trip_svc.catalogue_version()
+    etag = "-".join(str(p) for p in ("v%d" % version,) + parts)
+    if updated_at:
+        updated_at = updated_at.replace(microsecond=0)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = bool(updated_at and request.if_modified_since
+                            and updated_at <= request.if_modified_since.replace(tzinfo=None))
+    return etag, updated_at, not_modified
+
+def with_validators(resp, etag, last_modified):
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+def wants_ndjson():
+    return (request.args.get("format") == "ndjson"
+            or request.accept_mimetypes.best == "application/x-ndjson")
+
+@route("/api/trips")
 def api_trips():
-    items = [t.to_dict() for t in trip_svc.list()]
-    return jsonify(items)
-
-@app.route("/api/trip/<int:id>")
+    # the format can come from the Accept header, so it is part of the ETag and caches must key on Accept
+    fmt = "ndjson" if wants_ndjson() else "json"
+    etag, last_modified, not_modified = catalogue_validators("trips", fmt, request.query_string.decode() or "all")
+    if not_modified:
+        resp = Response(status=304)
+    elif fmt == "ndjson":
+        # whole catalogue as one JSON object per line, read and sent a chunk at a time
+        resp = Response(stream_with_context(bulk.export_rows("trips", "ndjson")), mimetype="application/x-ndjson")
+    else:
+        page = trip_page()
+        resp = jsonify({"items": [t.to_dict() for t in page.items],
+                        "next_cursor": page.next_cursor,
+                        "prev_cursor": page.prev_cursor})
+    resp.vary.add("Accept")
+    return with_validators(resp, etag, last_modified)
+
+@route("/api/trip/<int:id>")
 def api_trip(id):
+    etag, last_modified, not_modified = catalogue_validators("trip", id)
+    if not_modified:
+        return with_validators(Response(status=304), etag, last_modified)
     t = trip_svc.get(id)
     if not t:
         return jsonify({"error": "not found"}), 404
-    return jsonify(t.to_dict())
+    return with_validators(jsonify(t.to_dict()), etag, last_modified)
+
+@route("/api/bookings")
+def api_bookings():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "login required"}), 401
+    return jsonify({"items": [b.to_dict() for b in booking_svc.list_for_user(user.id)]})
+
+@route("/api/search")
+def api_search():
+    args = search_args()
+    limit = request.args.get("limit", SEARCH_PAGE_SIZE, type=int)
+    trips = search_svc.search(limit=limit, **args)
+    return jsonify({"items": [t.to_dict() for t in trips], "offset": args["offset"]})
 
-@app.route("/agent")
+@route("/agent")
 @require_role(["agent"])
 def agent():
     """Agent dashboard — approved agents only (decorator enforces approval)."""
-    trips = trip_svc.list()
-    return render_template("agent.html", trips=trips)
+    page = trip_page()
+    return render_template("agent.html", trips=page.items, page=page,
+                           stats=stats_svc.for_trips(t.id for t in page.items))
 
-@app.route("/agent/onboard/<token>", methods=["GET", "POST"])
+@route("/agent/onboard/<token>", methods=["GET", "POST"])
 def agent_onboard(token):
     """Agent onboarding page reachable only with the secret onboarding token in the URL."""
     expected = os.environ.get("ONBOARD_TOKEN", "onboard-secret")
@@ -380,4 +770,5 @@ def agent_onboard(token):
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_tables()
+    create_app().run(debug=True)
@@ -0,0 +1,196 @@
+"""Async, read-only variant of the JSON API for ASGI servers.
+
+Serves the polling endpoints without holding a worker thread per request.
+While a query waits on SQLite, the event loop keeps serving other
+connections.
+
+    GET /api/trips          keyset page (?after_id= / ?before_id= / ?limit=)
+    GET /api/trip/<id>      one trip
+    GET /api/bookings       the logged-in user's bookings (Flask session cookie)
+
+Responses match the Flask routes in app.py, including the ETag and
+Last-Modified validators and 304s. The ?format=ndjson export stays on Flask.
+Queries go through an async SQLAlchemy engine on aiosqlite, which opens
+query_only connections with the storage profile from database.py. Each
+request runs the same models and service queries as the Flask app, via
+AsyncSession.run_sync, so both paths return the same rows.
+
+    pip install "sqlalchemy[asyncio]" aiosqlite uvicorn
+    uvicorn asgi_api:app --port 8001
+
+Run it next to the Flask app and send GET /api/* to it from the proxy.
+Other paths get a 404. ASGI_POOL_SIZE sets its connection pool (default
+DB_READ_POOL_SIZE). It needs SECRET_KEY set to the Flask app's value to read
+the session cookie.
+"""
+import json
+import os
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+import models  # noqa: F401  (register tables on Base.metadata)
+from database import DATABASE_URL, MAX_OVERFLOW, POOL_TIMEOUT, READ_POOL_SIZE, storage_profile
+from services import BookingService, TripService
+
+SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-this")
+SESSION_COOKIE = "session"
+SESSION_MAX_AGE = timedelta(days=31)  # Flask's default permanent_session_lifetime
+POOL_SIZE = int(os.environ.get("ASGI_POOL_SIZE", str(READ_POOL_SIZE)))
+
+def make_async_engine(url: str = DATABASE_URL, profile=storage_profile, pool_size: int = POOL_SIZE):
+    """Read-only aiosqlite engine configured like database.read_engine."""
+    url = make_url(url).set(drivername="sqlite+aiosqlite")
+    eng = create_async_engine(url, pool_size=pool_size, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                              pool_pre_ping=True)
+
+    @event.listens_for(eng.sync_engine, "connect")
+    def _configure(dbapi_conn, record):
+        if profile is not None:
+            profile.apply(dbapi_conn, readonly=True)
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+    return eng
+
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+def session_serializer(secret_key: str = SECRET_KEY) -> URLSafeTimedSerializer:
+    """The signer Flask uses for its cookie session, so both apps read the same cookie."""
+    iface = SecureCookieSessionInterface
+    return URLSafeTimedSerializer(secret_key, salt=iface.salt, serializer=iface.serializer,
+                                  signer_kwargs={"key_derivation": iface.key_derivation,
+                                                 "digest_method": iface.digest_method})
+
+_serializer = session_serializer()
+
+class Request:
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope.get("query_string", b"").decode("latin-1")
+        self.args = {k: v[0] for k, v in parse_qs(self.query_string).items()}
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+    def int_arg(self, name):
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return None
+
+    def cookie(self, name):
+        for part in self.headers.get("cookie", "").split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == name:
+                return value
+        return None
+
+    def session(self) -> dict:
+        value = self.cookie(SESSION_COOKIE)
+        if not value:
+            return {}
+        try:
+            return _serializer.loads(value, max_age=int(SESSION_MAX_AGE.total_seconds()))
+        except BadSignature:
+            return {}
+
+def not_modified(request: Request, etag: str, updated_at) -> bool:
+    """Same rules as app.catalogue_validators: If-None-Match wins over If-Modified-Since."""
+    if "if-none-match" in request.headers:
+        return parse_etags(request.headers["if-none-match"]).contains(etag)
+    since = parse_date(request.headers.get("if-modified-since"))
+    return bool(updated_at and since and updated_at <= since.replace(tzinfo=None))
+
+async def send_json(send, status: int, body=None, headers=(), head: bool = False):
+    payload = b"" if body is None else json.dumps(body).encode()
+    raw_headers = [(b"content-length", str(len(payload)).encode())]
+    if body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    raw_headers += [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": b"" if head else payload})
+
+def _validators(etag: str, updated_at):
+    headers = [("etag", quote_etag(etag)), ("cache-control", "no-cache")]
+    if updated_at:
+        headers.append(("last-modified", http_date(updated_at)))
+    return headers
+
+# Handlers run on the sync session inside AsyncSession.run_sync and return (status, body, headers).
+
+def _catalogue(db, request, *parts):
+    version, updated_at = TripService(db).catalogue_version()
+    etag = "-".join(str(p) for p in ("v%d" % version,) + parts)
+    if updated_at:
+        updated_at = updated_at.replace(microsecond=0)
+    return etag, updated_at, not_modified(request, etag, updated_at)
+
+def trips(db, request):
+    # JSON only; "json" keeps the ETag equal to the Flask route's for the same response
+    etag, updated_at, fresh = _catalogue(db, request, "trips", "json", request.query_string or "all")
+    headers = _validators(etag, updated_at) + [("vary", "Accept")]  # as the Flask route, which also serves NDJSON
+    if fresh:
+        return 304, None, headers
+    page = TripService(db).page(after_id=request.int_arg("after_id"), before_id=request.int_arg("before_id"),
+                                limit=request.int_arg("limit"))
+    return 200, {"items": [t.to_dict() for t in page.items], "next_cursor": page.next_cursor,
+                 "prev_cursor": page.prev_cursor}, headers
+
+def trip(db, request, trip_id):
+    etag, updated_at, fresh = _catalogue(db, request, "trip", trip_id)
+    if fresh:
+        return 304, None, _validators(etag, updated_at)
+    t = TripService(db).get(trip_id)
+    if not t:
+        return 404, {"error": "not found"}, []
+    return 200, t.to_dict(), _validators(etag, updated_at)
+
+def bookings(db, request):
+    user_id = request.session().get("user_id")
+    if not user_id:
+        return 401, {"error": "login required"}, []
+    return 200, {"items": [b.to_dict() for b in BookingService(db).list_for_user(user_id)]}, []
+
+def route(path: str):
+    """(handler, extra args) for a path, or (None, ()) if this app doesn't serve it."""
+    if path == "/api/trips":
+        return trips, ()
+    if path == "/api/bookings":
+        return bookings, ()
+    prefix = "/api/trip/"
+    if path.startswith(prefix) and path[len(prefix):].isdigit():
+        return trip, (int(path[len(prefix):]),)
+    return None, ()
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    request = Request(scope)
+    handler, args = route(request.path)
+    if handler is None:
+        return await send_json(send, 404, {"error": "not found"})
+    if request.method not in ("GET", "HEAD"):
+        return await send_json(send, 405, {"error": "method not allowed"}, [("allow", "GET, HEAD")])
+    async with AsyncSessionLocal() as db:
+        status, body, headers = await db.run_sync(handler, request, *args)
+    await send_json(send, status, body, headers, head=request.method == "HEAD")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", "8001")))
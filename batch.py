@@ -0,0 +1,177 @@
+"""Batch JSON writes for integrations: many create/update/delete operations per request.
+
+A batch targets one entity (trips, bookings or expenses) and runs in one
+transaction on its own session. Each operation runs in a savepoint through the
+usual service method, so seat inventory, trip_stats, search indexing, ETags and
+page-cache invalidation behave exactly as for the HTML forms (the catalogue
+version behind the ETags is bumped once per batch rather than per operation). An operation
+that fails validation (or finds no record, or no seats) is rolled back to its
+savepoint and reported; the rest commit together. With atomic=True any
+failure rolls back the whole batch.
+
+    [{"op": "create", "data": {"title": "Lisbon", "price": 199}},
+     {"op": "update", "id": 42, "data": {"price": 249}},
+     {"op": "delete", "id": 7}]
+
+Fields are validated with the same rules as bulk.py imports. Records touched by
+updates and deletes are loaded with one query per chunk before the operations run.
+"""
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from bulk import ENTITIES
+from models import Booking, Trip
+from services import BookingService, ExpenseService, TripService, bump_catalogue_version
+from writer import BatchSession
+
+MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", "5000"))
+PREFETCH_CHUNK = 500
+
+# fields an update may change; bookings keep their trip and user (seats move through inventory)
+UPDATABLE = {
+    "trips": set(ENTITIES["trips"].fields),
+    "bookings": {"customer_name", "seats", "contact"},
+    "expenses": set(ENTITIES["expenses"].fields),
+}
+SERVICES = {"trips": TripService, "bookings": BookingService, "expenses": ExpenseService}
+
+class BatchError(Exception):
+    """The request as a whole is malformed (not an item-level error)."""
+    status = 400
+
+class BatchTooLarge(BatchError):
+    status = 413
+
+class ItemError(Exception):
+    pass
+
+Session = sessionmaker(class_=BatchSession, autoflush=False, expire_on_commit=False)
+
+def clean(name: str, data, partial: bool = False) -> dict:
+    """Validate create data (every field) or update data (only the given, updatable fields)."""
+    if not isinstance(data, dict):
+        raise ItemError("data must be an object")
+    fields = ENTITIES[name].fields
+    if partial:
+        unknown = set(data) - UPDATABLE[name]
+        if unknown:
+            raise ItemError(f"cannot update: {', '.join(sorted(unknown))}")
+        if not data:
+            raise ItemError("nothing to update")
+    else:
+        unknown = set(data) - set(fields)
+        if unknown:
+            raise ItemError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    row = {}
+    for field, validate in fields.items():
+        if partial and field not in data:
+            continue
+        try:
+            row[field] = validate(data.get(field))
+        except (TypeError, ValueError) as e:
+            raise ItemError(f"{field}: {e}")
+    return row
+
+def parse(payload) -> Tuple[List[dict], bool]:
+    """(operations, atomic) from a JSON body: a list of operations or {"operations": [...], "atomic": bool}."""
+    atomic = False
+    if isinstance(payload, dict):
+        atomic = bool(payload.get("atomic", False))
+        payload = payload.get("operations")
+    if not isinstance(payload, list):
+        raise BatchError("expected a list of operations")
+    if len(payload) > MAX_OPERATIONS:
+        raise BatchTooLarge(f"at most {MAX_OPERATIONS} operations per batch")
+    return payload, atomic
+
+def _prefetch(db, model, ids: Iterable[int]):
+    """Load the records the batch will touch into the session, a chunk per query."""
+    ids = sorted({i for i in ids if isinstance(i, int)})
+    for start in range(0, len(ids), PREFETCH_CHUNK):
+        db.query(model).filter(model.id.in_(ids[start:start + PREFETCH_CHUNK])).all()
+
+def _apply(svc, name: str, op: dict):
+    kind = op.get("op")
+    if kind == "create":
+        data = clean(name, op.get("data"))
+        if name == "bookings":
+            record = svc.create(**data)
+            if record is None:
+                raise ItemError(f"trip_id {data['trip_id']}: unknown trip or not enough seats")
+            return record.id
+        if name == "expenses":
+            _check_references(svc.db, data)
+        return svc.create(**data).id
+    record_id = op.get("id")
+    if not isinstance(record_id, int):
+        raise ItemError("id required")
+    if kind == "update":
+        data = clean(name, op.get("data"), partial=True)
+        if name == "trips" and data.get("capacity") is not None:
+            trip = svc.get(record_id)
+            if trip and data["capacity"] < (trip.seats_taken or 0):
+                raise ItemError(f"capacity {data['capacity']} is below the {trip.seats_taken} seats already taken")
+        if name == "expenses":
+            _check_references(svc.db, data)
+        if svc.update(record_id, **data) is None:
+            if name == "bookings" and svc.get(record_id) is not None:
+                raise ItemError("not enough seats left on this trip")
+            raise ItemError("not found")
+        return record_id
+    if kind == "delete":
+        if not svc.delete(record_id):
+            raise ItemError("not found")
+        return record_id
+    raise ItemError("op must be create, update or delete")
+
+def _check_references(db, data: dict):
+    if data.get("trip_id") is not None and db.get(Trip, data["trip_id"]) is None:
+        raise ItemError(f"trip_id {data['trip_id']}: unknown trip")
+    if data.get("booking_id") is not None and db.get(Booking, data["booking_id"]) is None:
+        raise ItemError(f"booking_id {data['booking_id']}: unknown booking")
+
+def run(name: str, operations: List[dict], atomic: bool = False, session_factory=Session) -> dict:
+    """Apply the operations in one transaction and return per-item results."""
+    if name not in SERVICES:
+        raise BatchError(f"unknown entity: {name}")
+    results: List[Dict] = []
+    failed = 0
+    db = session_factory()
+    db.info["catalogue_changed"] = False  # one catalogue-version bump for the whole batch
+    try:
+        svc = SERVICES[name](db)
+        model = ENTITIES[name].model
+        ops = [op if isinstance(op, dict) else {} for op in operations]
+        _prefetch(db, model, (op.get("id") for op in ops if op.get("op") in ("update", "delete")))
+        if name == "expenses":
+            refs = [op.get("data") or {} for op in ops if isinstance(op.get("data"), dict)]
+            _prefetch(db, Trip, (r.get("trip_id") for r in refs))
+            _prefetch(db, Booking, (r.get("booking_id") for r in refs))
+        for index, op in enumerate(ops):
+            result = {"index": index, "op": op.get("op")}
+            try:
+                db.info["savepoint"] = db.begin_nested()
+                result["id"] = _apply(svc, name, op)
+                db.info.pop("savepoint").commit()
+                result["status"] = "ok"
+            except (ItemError, SQLAlchemyError) as e:
+                savepoint = db.info.pop("savepoint", None)
+                if savepoint is not None and savepoint.is_active:
+                    savepoint.rollback()
+                failed += 1
+                result.update(status="error", error=str(e) if isinstance(e, ItemError) else "database error")
+            results.append(result)
+        committed = not (atomic and failed)
+        if committed:
+            if db.info.pop("catalogue_changed"):
+                bump_catalogue_version(db)
+            db.commit()
+        else:
+            db.rollback()
+    finally:
+        db.close()
+    return {"entity": name, "committed": committed, "ok": len(results) - failed if committed else 0,
+            "failed": failed, "results": results}
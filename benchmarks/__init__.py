@@ -0,0 +1,4 @@
+"""Standalone performance scripts. Run from the project root, e.g.
+
+    python -m benchmarks.sessions
+"""
@@ -0,0 +1,204 @@
+"""Concurrent-connection capacity: Flask API routes vs. the async ASGI read API.
+
+Both servers run in their own process against one generated database. The
+Flask app runs on a WSGI server with a fixed pool of worker threads
+(--threads), like a threaded production worker. asgi_api runs on uvicorn.
+The same asyncio client then opens more and more concurrent connections
+(--connections, repeatable). Each connection polls /api/trips,
+/api/trip/<id> and /api/bookings as a logged-in customer for --seconds.
+Every setting reports req/s, p50/p95/p99 latency and failed requests (5xx,
+resets, or no answer within --timeout).
+
+    python -m benchmarks.asgi --connections 16 --connections 128 --connections 512
+
+By default every request opens a new connection. With --keepalive the
+clients reuse their connection, but only uvicorn allows that: werkzeug's
+server answers every request with "Connection: close".
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def serve(args):
+    if args.role == "flask":
+        from concurrent.futures import ThreadPoolExecutor
+        from werkzeug.serving import BaseWSGIServer
+        from app import app
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        class PooledWSGIServer(BaseWSGIServer):
+            """Connections are handled on a fixed pool of threads; extra ones wait for a free thread."""
+            pool = ThreadPoolExecutor(args.threads)
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self._handle, request, client_address)
+
+            def _handle(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        PooledWSGIServer("127.0.0.1", args.port, app).serve_forever()
+    else:
+        import uvicorn
+        import asgi_api
+
+        uvicorn.run(asgi_api.app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+def setup(args):
+    """Generate the dataset; print the id and session cookie of a customer with bookings."""
+    import generate_data
+    from sqlalchemy import func
+    from asgi_api import session_serializer
+    from database import create_tables, db_session
+    from models import Booking
+
+    create_tables()
+    generate_data.generate(users=1000, trips=args.trips, bookings_per_trip=5, expenses_per_trip=1)
+    user_id = (db_session.query(Booking.user_id).filter(Booking.user_id.isnot(None)).group_by(Booking.user_id)
+               .order_by(func.count().desc()).limit(1).scalar())
+    db_session.remove()
+    print(session_serializer().dumps({"user_id": user_id}))
+
+async def fetch(reader, writer, path, cookie, keepalive):
+    headers = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: session={cookie}\r\n"
+    if not keepalive:
+        headers += "Connection: close\r\n"
+    writer.write((headers + "\r\n").encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, reusable = 0, keepalive
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection" and value.strip().lower() == "close":
+            reusable = False
+    await reader.readexactly(length)
+    return status, reusable
+
+async def client(port, paths, cookie, deadline, timeout, keepalive, latencies, failures):
+    rnd = random.Random()
+    conn = None
+    while time.monotonic() < deadline:
+        path = rnd.choice(paths)()
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+            status, reusable = await asyncio.wait_for(fetch(*conn, path, cookie, keepalive), timeout)
+            if status >= 500:
+                failures.append(status)
+            else:
+                latencies.append(time.perf_counter() - start)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            failures.append(None)
+            if conn is not None:
+                conn[1].close()
+            conn = None
+            continue
+        if not reusable:
+            conn[1].close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+async def load(port, connections, args, cookie):
+    paths = [lambda: "/api/trips?limit=24&after_id=%d" % random.randint(2, args.trips),
+             lambda: "/api/trip/%d" % random.randint(1, args.trips),
+             lambda: "/api/bookings"]
+    latencies, failures = [], []
+    deadline = time.monotonic() + args.seconds
+    await asyncio.gather(*[client(port, paths, cookie, deadline, args.timeout, args.keepalive, latencies, failures)
+                           for _ in range(connections)])
+    latencies.sort()
+    return (len(latencies) / args.seconds, *(percentile(latencies, p) * 1000 for p in (50, 95, 99)), len(failures))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(port, proc, seconds=30):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--connections", type=int, action="append", help="concurrent clients (repeatable; default 16, 64, 256)")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--threads", type=int, default=16, help="Flask worker threads")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds before a request counts as failed")
+    parser.add_argument("--keepalive", action="store_true", help="reuse one connection per client")
+    parser.add_argument("--server", action="append", choices=["flask", "asgi"], help="servers to compare (default both)")
+    parser.add_argument("--role", choices=["setup", "flask", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role == "setup":
+        return setup(args)
+    if args.role:
+        return serve(args)
+
+    env = {**os.environ, "PAGE_CACHE": "off", "OUTBOX_WORKER": "off",
+           "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tripbench-'), 'bench.db')}"}
+    base = [sys.executable, "-m", "benchmarks.asgi", "--trips", str(args.trips), "--threads", str(args.threads)]
+    cookie = subprocess.run(base + ["--role", "setup"], env=env, check=True, capture_output=True,
+                            text=True).stdout.strip().splitlines()[-1]
+    # the client's own sockets count against the open-file limit too
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    print(f"{os.cpu_count()} CPU(s), {args.trips} trips, Flask on {args.threads} threads, "
+          f"{'keep-alive' if args.keepalive else 'one connection per request'}, {args.seconds:.0f}s per run")
+    print(f"{'server':<7} {'conns':>6} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'failed':>7}")
+    for role in args.server or ["flask", "asgi"]:
+        port = free_port()
+        proc = subprocess.Popen(base + ["--role", role, "--port", str(port)], env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port, proc)
+            asyncio.run(load(port, 4, argparse.Namespace(**{**vars(args), "seconds": 1}), cookie))  # warm up
+            for connections in args.connections or [16, 64, 256]:
+                rate, p50, p95, p99, failed = asyncio.run(load(port, connections, args, cookie))
+                print(f"{role:<7} {connections:>6} {rate:>8.1f} {p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms {failed:>7}")
+        finally:
+            proc.terminate()
+            proc.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
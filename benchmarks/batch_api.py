@@ -0,0 +1,95 @@
+"""Operations/sec through POST /api/batch/<entity> at growing batch sizes.
+
+Each run sends --ops operations as batches of the given size (a size of 1 is
+one record per request, like the form handlers). It reports ops/s and the
+p50/p95 time per request. Operations are a mix of creates, updates and
+deletes for trips, bookings and expenses, sent with the API token via the
+Flask test client.
+
+    python -m benchmarks.batch_api --ops 5000 --size 1 --size 100 --size 1000 --size 5000
+"""
+import argparse
+import json
+import os
+import random
+
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+os.environ["OUTBOX_WORKER"] = "off"
+os.environ["PAGE_CACHE"] = "off"
+os.environ["API_TOKEN"] = "bench-token"
+
+import batch  # noqa: E402
+import generate_data  # noqa: E402
+from app import app  # noqa: E402
+from benchmarks.asgi import percentile  # noqa: E402
+from database import create_tables, engine  # noqa: E402
+import trip_stats  # noqa: E402
+
+HEADERS = {"Authorization": "Bearer bench-token"}
+
+def operations(entity: str, n: int, trips: int, rnd: random.Random):
+    """n operations for entity: ~70% creates, 20% updates, 10% deletes of existing rows."""
+    ops = []
+    for i in range(n):
+        roll = rnd.random()
+        trip_id = rnd.randint(1, trips)
+        if roll < 0.7:
+            data = {
+                "trips": {"title": f"Channel trip {i}", "destination": "Lisbon", "price": 150 + i % 50},
+                "bookings": {"trip_id": trip_id, "customer_name": "Channel Guest", "seats": 1},
+                "expenses": {"trip_id": trip_id, "title": "Transfer", "amount": 12.5},
+            }[entity]
+            ops.append({"op": "create", "data": data})
+        elif roll < 0.9:
+            data = {"trips": {"price": 175}, "bookings": {"contact": "guest@example.com"},
+                    "expenses": {"amount": 20}}[entity]
+            ops.append({"op": "update", "id": rnd.randint(1, trips), "data": data})
+        else:
+            ops.append({"op": "delete", "id": rnd.randint(1, trips * 2)})
+    return ops
+
+def run(client, entity: str, ops, size: int):
+    latencies, failed = [], 0
+    for start in range(0, len(ops), size):
+        body = json.dumps(ops[start:start + size])
+        response, elapsed = timed(client.post, f"/api/batch/{entity}", data=body,
+                                  content_type="application/json", headers=HEADERS)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+        failed += response.get_json()["failed"]
+        latencies.append(elapsed)
+    return latencies, failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=5000, help="operations per entity and batch size")
+    parser.add_argument("--size", type=int, action="append", help="batch size (repeatable; default 1, 100, 1000, 5000)")
+    parser.add_argument("--entity", action="append", choices=sorted(batch.SERVICES),
+                        help="entities to benchmark (default all)")
+    args = parser.parse_args()
+
+    create_tables()
+    generate_data.generate(users=200, trips=args.trips, bookings_per_trip=2, expenses_per_trip=1)
+    client = app.test_client()
+    rnd = random.Random(42)
+
+    print(f"{args.trips} trips, {args.ops} operations per run (max {batch.MAX_OPERATIONS} per request)")
+    print(f"{'entity':<9} {'size':>6} {'requests':>9} {'ops/s':>9} {'p50':>10} {'p95':>10} {'failed':>7}")
+    for entity in args.entity or ["trips", "bookings", "expenses"]:
+        for size in args.size or [1, 100, 1000, 5000]:
+            ops = operations(entity, args.ops, args.trips, rnd)
+            latencies, failed = run(client, entity, ops, size)
+            total = sum(latencies)
+            latencies.sort()
+            print(f"{entity:<9} {size:>6} {len(latencies):>9} {len(ops) / total:>9,.0f} "
+                  f"{percentile(latencies, 50) * 1000:>8.1f}ms {percentile(latencies, 95) * 1000:>8.1f}ms {failed:>7}")
+
+    with engine.begin() as conn:
+        drifted = trip_stats.check(conn)
+    print(f"trip_stats drift after the runs: {len(drifted)} trip(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Rows/sec for streaming bulk import and export (default: a 1M-row trips CSV)."""
+import argparse
+import csv
+import os
+
+from benchmarks.common import use_temp_database, timed
+
+db_path = use_temp_database()
+
+import bulk  # noqa: E402
+from database import create_tables  # noqa: E402
+
+def write_trips_csv(path: str, rows: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "destination", "date", "description", "price", "capacity"])
+        for i in range(rows):
+            writer.writerow([f"Supplier trip {i}", f"City {i % 500}", "2026-07-01",
+                             "Imported from supplier feed.", f"{100 + i % 900}.00", 40])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    create_tables()
+    src = os.path.join(os.path.dirname(db_path), "trips.csv")
+    _, elapsed = timed(write_trips_csv, src, args.rows)
+    print(f"generated {args.rows} rows in {elapsed:.1f}s")
+
+    with open(src, newline="", encoding="utf-8") as f:
+        result, elapsed = timed(bulk.import_rows, "trips", bulk.read_rows(f, "csv"), args.chunk_size)
+    print(f"import: {result.inserted} rows, {result.rejected} rejected, {elapsed:.1f}s, "
+          f"{result.inserted / elapsed:,.0f} rows/sec")
+
+    def export():
+        n = 0
+        for piece in bulk.export_rows("trips", "ndjson", args.chunk_size):
+            n += piece.count("\n")
+        return n
+
+    n, elapsed = timed(export)
+    print(f"export: {n} rows, {elapsed:.1f}s, {n / elapsed:,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
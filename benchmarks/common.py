@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+def use_temp_database(name: str = "bench.db") -> str:
+    """Point DATABASE_URL at a throwaway SQLite file. Must run before importing database/app."""
+    # a spawned password-hashing worker re-importing the benchmark (spawn names the process before
+    # it imports the main module; parent_process() is only set after): keep the parent's database
+    if (multiprocessing.current_process().name != "MainProcess"
+            and os.environ.get("DATABASE_URL", "").startswith("sqlite:///")):
+        return os.environ["DATABASE_URL"][len("sqlite:///"):]
+    path = os.path.join(tempfile.mkdtemp(prefix="tripbench-"), name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,268 @@
+"""End-to-end HTTP benchmark: drive the Flask app through realistic scenarios.
+
+Each scenario runs for a fixed number of iterations (optionally on several
+worker threads) and reports p50/p95/p99 latency, requests/sec and SQL
+statements per request. Results are written as JSON; pass --compare with an
+earlier file to print the deltas and exit non-zero on a p95 regression.
+
+    python -m benchmarks.e2e
+    python -m benchmarks.e2e --server --concurrency 8 --output after.json --compare before.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+# confirmation emails would otherwise be retried against a non-existent SMTP server
+os.environ.setdefault("OUTBOX_WORKER", "off")
+
+import generate_data  # noqa: E402
+from app import create_app  # noqa: E402
+from database import QueryCounter, db_session  # noqa: E402
+from services import AuthService  # noqa: E402
+
+app = create_app({"MIGRATE_ON_START": True})
+
+ACCOUNTS = {"admin": ("password", "admin"), "jane": ("secret", "customer"), "agentjohn": ("agentpass", "agent")}
+
+class TestClientDriver:
+    """In-process requests through Flask's test client (no sockets, no server threads)."""
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        resp = self.client.open(path, method=method, data=data, headers=headers or {})
+        return resp.status_code, resp.headers, resp.get_data()
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HTTPDriver:
+    """Real HTTP against a local WSGI server; keeps its own cookie jar like a browser."""
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(req) as resp:
+                return resp.status, resp.headers, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+def start_server():
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+# --- scenarios: each iteration is one user's short visit. A scenario yields steps as
+# (label, method, path, data, headers) and is sent back each (status, headers, body).
+
+def browse(rnd, ctx):
+    yield "index", "GET", "/", None, None
+    yield "index page 2", "GET", f"/?after_id={rnd.randint(1, ctx['trips'])}", None, None
+    for _ in range(3):
+        yield "view trip", "GET", f"/trip/{rnd.randint(1, ctx['trips'])}", None, None
+
+def login(rnd, ctx):
+    yield "login", "POST", "/login", {"username": "jane", "password": "secret"}, None
+    yield "logout", "GET", "/logout", None, None
+
+def checkout(rnd, ctx):
+    trip_id = rnd.randint(1, ctx["trips"])
+    yield "view trip", "GET", f"/trip/{trip_id}", None, None
+    yield "checkout", "POST", "/booking/checkout", {"trip_id": trip_id, "customer_name": "Bench Guest",
+                                                    "seats": 1, "contact": "bench@example.com"}, None
+    yield "complete", "POST", "/booking/complete", {}, None
+
+def agent_edit(rnd, ctx):
+    trip_id = rnd.randint(1, ctx["trips"])
+    yield "edit form", "GET", f"/trip/{trip_id}/edit", None, None
+    # the real form posts every field back; leaving capacity out would clear it
+    _, _, body = yield "api trip", "GET", f"/api/trip/{trip_id}", None, None
+    trip = json.loads(body)
+    form = {k: "" if trip[k] is None else trip[k] for k in ("title", "destination", "date", "description", "capacity")}
+    form["price"] = f"{rnd.uniform(80, 3000):.2f}"
+    yield "edit save", "POST", f"/trip/{trip_id}/edit", form, None
+    yield "agent dashboard", "GET", "/agent", None, None
+
+def api_poll(rnd, ctx):
+    etag = ctx.get("etag")
+    yield "api trips", "GET", "/api/trips", None, {"If-None-Match": etag} if etag else None
+    yield "api trip", "GET", f"/api/trip/{rnd.randint(1, ctx['trips'])}", None, None
+
+# name -> (scenario, account to log in as first)
+SCENARIOS = {
+    "browse": (browse, None),
+    "login": (login, None),
+    "checkout": (checkout, "jane"),
+    "agent_edit": (agent_edit, "agentjohn"),
+    "api_poll": (api_poll, None),
+}
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {"count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2)}
+
+def run_scenario(name, make_driver, iterations, concurrency, ctx, seed):
+    scenario, account = SCENARIOS[name]
+    latencies, by_step, errors = [], {}, []
+    lock = threading.Lock()
+
+    def worker(n, count):
+        rnd = random.Random(seed + n)
+        driver = make_driver()
+        if account:
+            driver.request("POST", "/login", {"username": account, "password": ACCOUNTS[account][0]})
+        if name == "api_poll":
+            _, headers, _ = driver.request("GET", "/api/trips")
+            ctx["etag"] = headers.get("ETag")
+        for _ in range(count):
+            steps, response = scenario(rnd, ctx), None
+            while True:
+                try:
+                    label, method, path, data, headers = steps.send(response)
+                except StopIteration:
+                    break
+                start = time.perf_counter()
+                response = driver.request(method, path, data, headers)
+                elapsed = time.perf_counter() - start
+                status = response[0]
+                with lock:
+                    latencies.append(elapsed)
+                    by_step.setdefault(label, []).append(elapsed)
+                    if status >= 500:
+                        errors.append(f"{status} {method} {path}")
+
+    per_worker = [iterations // concurrency + (1 if i < iterations % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, c)) for i, c in enumerate(per_worker)]
+    # the counter listens on the shared engine, so it also sees statements issued by server threads
+    with QueryCounter() as qc:
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    result = summarize(latencies)
+    result.update(
+        requests_per_sec=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        # includes the login/ETag warm-up requests, which are few next to the timed ones
+        sql_per_request=round(qc.count / len(latencies), 2) if latencies else 0.0,
+        errors=len(errors),
+        steps={label: summarize(values) for label, values in by_step.items()},
+    )
+    if errors:
+        result["error_samples"] = errors[:5]
+    return result
+
+def seed_database(trips):
+    auth = AuthService()
+    for username, (password, role) in ACCOUNTS.items():
+        auth.create_user(username, password, role=role, agent_approved=True)
+    db_session.remove()
+    generate_data.generate(users=1000, trips=trips, bookings_per_trip=5, expenses_per_trip=2)
+
+def compare(current, options, baseline_path, threshold):
+    """Print per-scenario deltas against an earlier result file; True if any p95 regressed past threshold."""
+    with open(baseline_path) as f:
+        previous = json.load(f)
+    baseline = previous["scenarios"]
+    regressed = False
+    print(f"\ncompared with {baseline_path}:")
+    differing = sorted(k for k in options if k != "scenario" and previous["options"].get(k) != options[k])
+    if differing:
+        print(f"(note: run options differ: {', '.join(differing)})")
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        delta = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        flag = "  <-- regression" if delta > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{name:<12} p95 {before['p95_ms']:>8.2f} -> {now['p95_ms']:>8.2f} ms ({delta:+.0%})  "
+              f"req/s {before['requests_per_sec']:>8.1f} -> {now['requests_per_sec']:>8.1f}  "
+              f"sql/req {before['sql_per_request']:>5.2f} -> {now['sql_per_request']:>5.2f}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000, help="dataset size (trips); bookings/expenses scale with it")
+    parser.add_argument("--iterations", type=int, default=200, help="visits per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="worker threads per scenario")
+    parser.add_argument("--server", action="store_true", help="go through a real threaded WSGI server on localhost")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    seed_database(args.trips)
+    server = None
+    if args.server:
+        server, base_url = start_server()
+        make_driver = lambda: HTTPDriver(base_url)  # noqa: E731
+    else:
+        make_driver = TestClientDriver
+
+    ctx = {"trips": args.trips}
+    results = {}
+    print(f"{'scenario':<12} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'5xx':>5}")
+    try:
+        for name in args.scenario or SCENARIOS:
+            r = results[name] = run_scenario(name, make_driver, args.iterations, args.concurrency, ctx, args.seed)
+            print(f"{name:<12} {r['count']:>8} {r['requests_per_sec']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f} {r['sql_per_request']:>8.2f} {r['errors']:>5}")
+    finally:
+        if server:
+            server.shutdown()
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results",
+                                         f"e2e-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    options = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    with open(output, "w") as f:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(),
+                   "options": options,
+                   "scenarios": results}, f, indent=2)
+    print(f"results written to {output}")
+
+    failed = any(r["errors"] for r in results.values())
+    if args.compare and compare(results, options, args.compare, args.threshold):
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Latency of POST /login under concurrent logins, for each password-hashing pool.
+
+N threads log in over and over through the Flask test client, each as its own
+user, for --seconds. Reports logins/sec and per-login p50/p95. This covers the
+whole request: the user lookup, the hash check on the pool (passwords.py),
+the session cookie and the redirect.
+
+    python -m benchmarks.logins --concurrency 1 --concurrency 8 --pool thread --pool process
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from benchmarks.common import use_temp_database
+
+def run(app, users: int, seconds: float):
+    latencies, lock = [], threading.Lock()
+    stop = threading.Event()
+
+    def login_loop(i: int):
+        client = app.test_client()
+        mine = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            resp = client.post("/login", data={"username": f"login{i}", "password": "secret"})
+            mine.append(time.perf_counter() - start)
+            if resp.status_code != 302:
+                raise RuntimeError(f"login{i}: {resp.status_code}")
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return (len(latencies) / seconds, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, action="append", help="login threads (repeatable; default 1, 8)")
+    parser.add_argument("--pool", action="append", choices=["thread", "process", "inline"],
+                        help="hashing pools to compare (repeatable; default thread, process)")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    # imported here: the process pool's spawned workers re-import this module
+    use_temp_database()
+    os.environ["OUTBOX_WORKER"] = "off"
+    os.environ["PAGE_CACHE"] = "off"
+    from app import create_app
+    from database import create_tables, db_session
+    from passwords import hasher
+    from services import AuthService
+
+    create_tables()
+    concurrency = args.concurrency or [1, 8]
+    auth = AuthService()
+    for i in range(max(concurrency)):
+        auth.create_user(f"login{i}", "secret")
+    db_session.remove()
+    app = create_app({"WTF_CSRF_ENABLED": False})
+
+    print(f"{os.cpu_count()} CPU(s), hashing method {hasher.method}, pool size {hasher.workers}")
+    print(f"{'pool':<8} {'threads':>7} {'logins/s':>9} {'p50':>10} {'p95':>10}")
+    for pool in args.pool or ["thread", "process"]:
+        # reconfigure the app's hasher in place; its pool starts again on first use
+        hasher.shutdown()
+        hasher.pool = pool
+        hasher.verify(hasher.hash("warm-up"), "warm-up")
+        for users in concurrency:
+            rate, p50, p95 = run(app, users, args.seconds)
+            print(f"{pool:<8} {users:>7} {rate:>9.1f} {p50:>8.1f}ms {p95:>8.1f}ms")
+    hasher.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Password verification throughput (logins/sec, per core) for each hashing setting and pool.
+
+A storm of concurrent "logins" verifies a stored hash for a fixed time while a
+probe thread does ~1 ms of pure-Python work in a loop. The probe's p95 shows
+how much the storm slows everything else in the worker.
+
+    python -m benchmarks.passwords --method scrypt --method pbkdf2:sha256:600000 --storm 16
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from passwords import PasswordHasher
+
+DEFAULT_METHODS = ["scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:600000"]
+
+def probe_work():
+    return sum(i * i for i in range(20000))
+
+def run(method, pool, workers, storm, seconds):
+    hasher = PasswordHasher(method=method, pool=pool, workers=workers, max_pending=storm)
+    stored = hasher.hash("secret")
+    hasher.verify(stored, "secret")  # start the pool before timing
+    stop = threading.Event()
+    logins, probes = [0], []
+
+    def login_loop():
+        while not stop.is_set():
+            if hasher.verify(stored, "secret"):
+                logins[0] += 1
+
+    def probe_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            probe_work()
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(storm)] + [threading.Thread(target=probe_loop)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    hasher.shutdown()
+    probes.sort()
+    cores = min(storm if pool == "inline" else workers, os.cpu_count() or 1)
+    rate = logins[0] / seconds
+    return rate, rate / cores, probes[int(len(probes) * 0.95)] * 1000 if probes else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", action="append", help=f"werkzeug method (repeatable; default {DEFAULT_METHODS})")
+    parser.add_argument("--pool", action="append", choices=["inline", "thread", "process"],
+                        help="pools to compare (repeatable; default all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pool size")
+    parser.add_argument("--storm", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    probe_baseline = min(timed_probe() for _ in range(20)) * 1000
+    print(f"{os.cpu_count()} CPU(s), pool size {args.workers}, {args.storm} concurrent logins, "
+          f"probe alone {probe_baseline:.2f} ms")
+    print(f"{'method':<24} {'pool':<8} {'logins/s':>9} {'per core':>9} {'probe p95':>10}")
+    for method in args.method or DEFAULT_METHODS:
+        for pool in args.pool or ["inline", "thread", "process"]:
+            rate, per_core, probe_p95 = run(method, pool, args.workers, args.storm, args.seconds)
+            print(f"{method:<24} {pool:<8} {rate:>9.1f} {per_core:>9.1f} {probe_p95:>8.2f}ms")
+    return 0
+
+def timed_probe():
+    start = time.perf_counter()
+    probe_work()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    sys.exit(main())
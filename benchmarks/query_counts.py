@@ -0,0 +1,39 @@
+"""SQL statements per endpoint, measured on a small and a 10x larger dataset.
+
+Exits non-zero if any endpoint issues more statements on the larger dataset,
+which is how an N+1 lazy-load regression shows up. The page cache is off so
+cached pages are measured by the queries that build them, not as cache hits.
+"""
+import os
+import sys
+
+from benchmarks.common import use_temp_database
+
+use_temp_database()
+os.environ["OUTBOX_WORKER"] = "off"
+os.environ["PAGE_CACHE"] = "off"
+
+from app import create_app  # noqa: E402
+from benchmarks.statement_counts import endpoints, measure, seed  # noqa: E402
+
+app = create_app({"MIGRATE_ON_START": True})
+
+def main():
+    app.config["WTF_CSRF_ENABLED"] = False
+    paths = endpoints(*seed(trips=3, bookings_per_trip=2))
+    small = measure(app, paths)
+    seed(trips=27, bookings_per_trip=5)
+    large = measure(app, paths)
+
+    failed = False
+    print(f"{'user':<8} {'path':<20} {'status':>6} {'small':>6} {'large':>6}")
+    for key in paths:
+        status, n_small = small[key]
+        _, n_large = large[key]
+        flag = "  <-- grows with data" if n_large > n_small else ""
+        failed = failed or bool(flag)
+        print(f"{key[0] or '-':<8} {key[1]:<20} {status:>6} {n_small:>6} {n_large:>6}{flag}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Per-trip profitability report on a large seeded database: set-based SQL vs. the old per-row Python walk."""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+
+import generate_data  # noqa: E402
+from database import create_tables, db_session  # noqa: E402
+from reports import ReportService  # noqa: E402
+from services import TripService, ExpenseService  # noqa: E402
+
+def python_walk(limit_trips: int):
+    """What view_trip-style code did: load each trip's bookings and expenses and add them up."""
+    trip_svc, expense_svc = TripService(), ExpenseService()
+    out = []
+    for trip in trip_svc.page(limit=limit_trips).items:
+        revenue = sum(b.total_cost_hint(trip.price) or 0 for b in trip.bookings)
+        spent = sum(e.amount for e in expense_svc.list_for_trip(trip.id))
+        out.append((trip.id, revenue, spent, revenue - spent))
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=20_000)
+    parser.add_argument("--bookings-per-trip", type=float, default=25)
+    parser.add_argument("--expenses-per-trip", type=float, default=10)
+    args = parser.parse_args()
+
+    create_tables()
+    counts, elapsed = timed(generate_data.generate, users=1000, trips=args.trips,
+                            bookings_per_trip=args.bookings_per_trip, expenses_per_trip=args.expenses_per_trip)
+    print(f"seeded {counts['trips']} trips, {counts['bookings']} bookings, {counts['expenses']} expenses "
+          f"in {elapsed:.1f}s")
+    db_session.remove()
+
+    svc = ReportService()
+    rows, elapsed = timed(svc.trip_profitability, limit=100)
+    print(f"SQL report, all-time, top 100 of {args.trips} trips: {elapsed * 1000:.0f} ms")
+    totals, elapsed = timed(svc.totals)
+    print(f"SQL totals, all-time: {elapsed * 1000:.0f} ms  (revenue {totals['revenue']:,.2f})")
+    end = generate_data.EPOCH.date()
+    _, elapsed = timed(svc.trip_profitability, start=end - timedelta(days=30), end=end, limit=100)
+    print(f"SQL report, last 30 days of data: {elapsed * 1000:.0f} ms")
+    db_session.remove()
+
+    _, elapsed = timed(python_walk, 100)
+    print(f"Python walk over just 100 trips: {elapsed * 1000:.0f} ms "
+          f"(~{elapsed * args.trips / 100:.1f}s extrapolated to every trip)")
+
+if __name__ == "__main__":
+    main()
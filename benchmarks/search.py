@@ -0,0 +1,64 @@
+"""Full-text search latency on a large synthetic catalogue (default 500k trips)."""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+
+import bulk  # noqa: E402
+from database import create_tables, db_session  # noqa: E402
+from services import SearchService  # noqa: E402
+
+PLACES = ["Bali", "Lisbon", "Reykjavik", "Kyoto", "Nairobi", "Chamonix", "Lima", "Hanoi", "Cusco", "Seville",
+          "Porto", "Oslo", "Tromso", "Marrakesh", "Cairo", "Sydney", "Queenstown", "Banff", "Havana", "Tbilisi"]
+THEMES = ["Weekend", "City Break", "Adventure", "Safari", "Ski Week", "Road Trip", "Food Tour", "Wellness Retreat",
+          "Island Hopping", "Hiking", "Photography", "Wine Tasting", "Cultural Tour", "Family Holiday"]
+WORDS = ["beach", "temples", "glaciers", "markets", "trams", "vineyards", "mountains", "hot springs", "museums",
+         "street food", "sunsets", "wildlife", "old town", "boat trip", "guided walks", "local guides"]
+
+QUERIES = [
+    {"q": "bali"}, {"q": "lis"}, {"q": "kyoto temples"}, {"q": "ski"}, {"q": "food tour porto"},
+    {"q": "safari", "max_price": 900}, {"q": "hiking", "date_from": "2026-06-01", "date_to": "2026-08-31"},
+    {"q": "wine", "min_price": 500, "max_price": 1500}, {"q": "hot springs reykjavik"}, {"q": "photo"},
+]
+
+def generate(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    for i in range(n):
+        place = rnd.choice(PLACES)
+        yield {
+            "title": f"{rnd.choice(THEMES)} {place} #{i}",
+            "destination": place,
+            "date": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "description": " ".join(rnd.sample(WORDS, 4)),
+            "price": round(rnd.uniform(80, 3000), 2),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    create_tables()
+    result, elapsed = timed(bulk.import_rows, "trips", generate(args.trips))
+    print(f"loaded {result.inserted} trips (with FTS index) in {elapsed:.1f}s")
+
+    svc = SearchService()
+    print(f"{'query':<60} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = svc.search(limit=24, **query)
+            samples.append((time.perf_counter() - start) * 1000)
+            db_session.remove()
+        samples.sort()
+        p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+        print(f"{str(query):<60} {len(hits):>5} {statistics.median(samples):>8.2f} {p95:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Concurrent checkout stress test: many threads race reserve() -> confirm() on one trip.
+
+Verifies that confirmed seats never exceed capacity and that trips.seats_taken
+matches the bookings table, then reports bookings/sec.
+"""
+import argparse
+import sys
+import threading
+
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database import create_tables, db_session  # noqa: E402
+from models import Booking, Trip  # noqa: E402
+from services import TripService, BookingService  # noqa: E402
+
+def worker(trip_id: int, attempts: int, seats: int, stats: dict, lock: threading.Lock):
+    svc = BookingService()
+    ok = sold_out = errors = 0
+    for i in range(attempts):
+        try:
+            hold = svc.reserve(trip_id, seats)
+            if not hold:
+                sold_out += 1
+                continue
+            if svc.confirm(hold.id, trip_id=trip_id, seats=seats, customer_name=f"Racer {i}"):
+                ok += 1
+        except OperationalError:
+            db_session.rollback()
+            errors += 1
+    db_session.remove()
+    with lock:
+        stats["ok"] += ok
+        stats["sold_out"] += sold_out
+        stats["errors"] += errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--capacity", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="checkouts per thread")
+    parser.add_argument("--seats", type=int, default=1, help="seats per checkout")
+    args = parser.parse_args()
+
+    create_tables()
+    trip_id = TripService().create(title="Flash sale", price=99.0, capacity=args.capacity).id
+    db_session.remove()
+
+    stats = {"ok": 0, "sold_out": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(trip_id, args.attempts, args.seats, stats, lock))
+               for _ in range(args.threads)]
+
+    def go():
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    _, elapsed = timed(go)
+
+    db = db_session()
+    booked = db.query(func.coalesce(func.sum(Booking.seats), 0)).filter(Booking.trip_id == trip_id).scalar()
+    taken = db.query(Trip.seats_taken).filter(Trip.id == trip_id).scalar()
+    oversold = max(booked - args.capacity, 0)
+    print(f"threads={args.threads} attempts={args.threads * args.attempts} capacity={args.capacity}")
+    print(f"bookings={stats['ok']} sold_out={stats['sold_out']} lock_errors={stats['errors']}")
+    print(f"seats booked={booked} seats_taken={taken} oversold={oversold}")
+    print(f"{stats['ok'] / elapsed:.1f} bookings/sec")
+    return 1 if oversold or booked != taken else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Throughput of the Flask app with request-scoped sessions under 1, 4 and 16 worker threads."""
+import argparse
+import threading
+
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+
+from app import create_app  # noqa: E402
+from database import db_session  # noqa: E402
+from services import TripService  # noqa: E402
+
+app = create_app({"MIGRATE_ON_START": True})
+
+PATHS = ["/", "/api/trips", "/api/trip/1"]
+
+def seed(trips: int):
+    svc = TripService()
+    for i in range(trips):
+        svc.create(title=f"Bench trip {i}", destination="Nowhere", date="2026-01-01",
+                   description="benchmark", price=100.0 + i)
+    db_session.remove()
+
+def worker(requests: int, errors: list):
+    client = app.test_client()
+    for i in range(requests):
+        resp = client.get(PATHS[i % len(PATHS)])
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+def run(threads: int, requests: int):
+    errors = []
+    pool = [threading.Thread(target=worker, args=(requests, errors)) for _ in range(threads)]
+
+    def go():
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+
+    _, elapsed = timed(go)
+    total = threads * requests
+    print(f"threads={threads:<3} requests={total:<6} {total / elapsed:8.1f} req/s  errors={len(errors)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+    parser.add_argument("--threads", type=int, nargs="*", default=[1, 4, 16])
+    args = parser.parse_args()
+    app.config["WTF_CSRF_ENABLED"] = False
+    seed(args.trips)
+    for n in args.threads:
+        run(n, args.requests)
+
+if __name__ == "__main__":
+    main()
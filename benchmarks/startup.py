@@ -0,0 +1,98 @@
+"""Import time and cold start of the web app, with and without schema setup at startup.
+
+Every run starts fresh Python processes against one generated database. Each
+process times `import app`, create_app() and its first request (GET
+/api/trips through the test client). The parent also times the whole process,
+interpreter start-up included. "lazy" is the default configuration; "migrate"
+sets MIGRATE_ON_START, which repeats the schema checks every worker used to
+run at import. --workers N starts N processes at once, like an autoscaling
+event; the slowest one is what counts.
+
+    python -m benchmarks.startup --runs 10 --workers 1 --workers 8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("lazy", "migrate")
+
+def child(args):
+    start = time.perf_counter()
+    import flask  # noqa: F401
+    import sqlalchemy.orm  # noqa: F401
+    libraries = time.perf_counter()
+    import app as appmod
+    imported = time.perf_counter()
+    app = appmod.create_app({"MIGRATE_ON_START": args.role == "migrate"})
+    created = time.perf_counter()
+    status = app.test_client().get("/api/trips").status_code
+    served = time.perf_counter()
+    if status != 200:
+        raise SystemExit(f"first request returned {status}")
+    print(json.dumps({"libraries": libraries - start, "import": imported - libraries,
+                      "create_app": created - imported, "first_request": served - created}))
+
+def setup(args):
+    import generate_data
+    from database import create_tables
+
+    create_tables()
+    generate_data.generate(users=100, trips=args.trips, bookings_per_trip=2, expenses_per_trip=1)
+
+def launch(mode, workers, env):
+    """Start `workers` processes at once; return (their timings, wall time of each process)."""
+    cmd = [sys.executable, "-m", "benchmarks.startup", "--role", mode]
+    started = time.perf_counter()
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    timings, walls = [], []
+    for proc in procs:
+        out, _ = proc.communicate()
+        walls.append(time.perf_counter() - started)
+        if proc.returncode:
+            raise RuntimeError(f"{mode} worker exited with {proc.returncode}")
+        timings.append(json.loads(out.strip().splitlines()[-1]))
+    return timings, walls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=10, help="launches per mode and worker count")
+    parser.add_argument("--workers", type=int, action="append", help="processes started together (repeatable; default 1, 8)")
+    parser.add_argument("--role", choices=("setup",) + MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role == "setup":
+        return setup(args)
+    if args.role:
+        return child(args)
+
+    env = {**os.environ, "OUTBOX_WORKER": "off", "PAGE_CACHE": "off",
+           "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tripbench-'), 'bench.db')}"}
+    subprocess.run([sys.executable, "-m", "benchmarks.startup", "--role", "setup", "--trips", str(args.trips)],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+    print(f"{os.cpu_count()} CPU(s), {args.trips} trips, median of {args.runs} launches (ms)")
+    print(f"{'mode':<8} {'workers':>7} {'libs':>7} {'import':>7} {'create':>7} {'first':>7} {'process':>8} {'slowest':>8}")
+    for workers in args.workers or [1, 8]:
+        for mode in MODES:
+            phases = {"libraries": [], "import": [], "create_app": [], "first_request": []}
+            walls, slowest = [], []
+            for _ in range(args.runs):
+                timings, wall = launch(mode, workers, env)
+                for t in timings:
+                    for name in phases:
+                        phases[name].append(t[name])
+                walls.extend(wall)
+                slowest.append(max(wall))
+            ms = {name: statistics.median(values) * 1000 for name, values in phases.items()}
+            print(f"{mode:<8} {workers:>7} {ms['libraries']:>7.1f} {ms['import']:>7.1f} {ms['create_app']:>7.1f} "
+                  f"{ms['first_request']:>7.1f} {statistics.median(walls) * 1000:>8.1f} "
+                  f"{statistics.median(slowest) * 1000:>8.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Seed data and per-endpoint SQL statement counts, shared by benchmarks/query_counts.py and
+tests/test_query_counts.py. Importing this loads the app modules, so DATABASE_URL and
+PAGE_CACHE must be set first."""
+from database import QueryCounter, db_session
+from services import AuthService, BookingService, ExpenseService, TripService
+
+# username: (password, role)
+USERS = {"qc_admin": ("password", "admin"), "qc_jane": ("secret", "customer")}
+
+def seed(trips: int, bookings_per_trip: int):
+    """Add trips with bookings and expenses; returns (first trip id, first booking id).
+    Called repeatedly to grow the dataset between measurements."""
+    auth = AuthService()
+    users = {name: auth.authenticate(name, password) or auth.create_user(name, password, role=role, agent_approved=True)
+             for name, (password, role) in USERS.items()}
+    trip_svc, booking_svc, expense_svc = TripService(), BookingService(), ExpenseService()
+    first = None
+    for i in range(trips):
+        trip = trip_svc.create(title=f"Counted trip {i}", destination="Somewhere", date="2026-05-01",
+                               description="Seeded for query counting.", price=100.0)
+        for j in range(bookings_per_trip):
+            booking = booking_svc.create(trip_id=trip.id, user_id=users["qc_jane"].id, customer_name=f"Guest {j}",
+                                         seats=1, contact="guest@example.com")
+            expense_svc.create(trip_id=trip.id, booking_id=booking.id, title="Fee", amount=5.0)
+            first = first or (trip.id, booking.id)
+    db_session.remove()
+    return first
+
+def endpoints(trip_id: int, booking_id: int):
+    """(login as, path) for each measured page."""
+    return [
+        (None, "/"),
+        (None, f"/trip/{trip_id}"),
+        (None, "/api/trips"),
+        (None, f"/api/trip/{trip_id}"),
+        ("qc_admin", "/admin"),
+        ("qc_admin", "/bookings"),
+        ("qc_admin", f"/trip/{trip_id}/bookings"),
+        ("qc_admin", f"/booking/{booking_id}"),
+        ("qc_admin", "/admin/users"),
+        ("qc_admin", "/admin/agents"),
+        ("qc_jane", "/customer"),
+        ("qc_jane", "/bookings"),
+    ]
+
+def measure(app, paths) -> dict:
+    """{(login as, path): (status code, SQL statements)}; needs WTF_CSRF_ENABLED off to log in."""
+    counts, clients = {}, {}
+    for who, path in paths:
+        client = clients.get(who)
+        if client is None:
+            client = clients[who] = app.test_client()
+            if who:
+                client.post("/login", data={"username": who, "password": USERS[who][0]})
+        with QueryCounter() as qc:
+            resp = client.get(path)
+        counts[(who, path)] = (resp.status_code, qc.count)
+    return counts
@@ -0,0 +1,114 @@
+"""Mixed read/write throughput: SQLite defaults vs. the tuned storage profile.
+
+Reader processes browse trip pages and the JSON API while writer processes
+save trip edits as an agent, all against one database file for a fixed time —
+the way several app workers share trip.db. Each configuration gets a fresh
+database, and the page cache is off so every read reaches SQLite.
+
+    python -m benchmarks.storage --readers 4 --writers 2 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# name -> environment for every process in the run
+CONFIGS = {
+    "defaults": {"SQLITE_PROFILE": "off", "DB_READ_ENGINE": "off"},
+    "tuned": {"SQLITE_PROFILE": "tuned", "DB_READ_ENGINE": "on"},
+}
+
+def setup(args):
+    import generate_data
+    from database import create_tables, db_session
+    from services import AuthService
+
+    create_tables()
+    AuthService().create_user("agentjohn", "agentpass", role="agent", agent_approved=True)
+    db_session.remove()
+    generate_data.generate(users=100, trips=args.trips, bookings_per_trip=5, expenses_per_trip=2)
+
+def work(args):
+    from app import app
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    rnd, client = random.Random(args.worker), app.test_client()
+    if args.role == "writer":
+        client.post("/login", data={"username": "agentjohn", "password": "agentpass"})
+
+    def step():
+        trip_id = rnd.randint(1, args.trips)
+        if args.role == "writer":
+            return [client.post(f"/trip/{trip_id}/edit", data={"price": f"{rnd.uniform(80, 3000):.2f}"})]
+        return [client.get(path) for path in (f"/trip/{trip_id}", f"/api/trip/{trip_id}", f"/?after_id={trip_id}")]
+
+    latencies, errors = [], 0
+    time.sleep(max(0.0, args.start_at - time.time()))
+    deadline = args.start_at + args.seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        responses = step()
+        elapsed = (time.perf_counter() - start) / len(responses)
+        for resp in responses:
+            if resp.status_code >= 500:
+                errors += 1
+            else:
+                latencies.append(round(elapsed, 5))
+    print(json.dumps({"latencies": latencies, "errors": errors}))
+
+def run_config(args, env):
+    env = {**os.environ, **env, "PAGE_CACHE": "off", "OUTBOX_WORKER": "off",
+           "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tripbench-'), 'bench.db')}"}
+    base = [sys.executable, "-m", "benchmarks.storage", "--trips", str(args.trips), "--seconds", str(args.seconds)]
+    subprocess.run(base + ["--role", "setup"], env=env, check=True, capture_output=True)
+    # every worker waits for the same start time, after all of them have imported the app
+    start_at = str(time.time() + 5)
+    procs = [(role, subprocess.Popen(base + ["--role", role, "--worker", str(i), "--start-at", start_at],
+                                     env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True))
+             for i, role in enumerate(["reader"] * args.readers + ["writer"] * args.writers)]
+    results = {"reader": [], "writer": []}
+    errors = 0
+    for role, proc in procs:
+        out, _ = proc.communicate()
+        r = json.loads(out.strip().splitlines()[-1])
+        results[role].extend(r["latencies"])
+        errors += r["errors"]
+
+    def p95(values):
+        values = sorted(values)
+        return values[int(len(values) * 0.95)] * 1000 if values else 0.0
+
+    return (len(results["reader"]) / args.seconds, len(results["writer"]) / args.seconds,
+            p95(results["reader"]), p95(results["writer"]), errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--writers", type=int, default=2, help="writer processes")
+    parser.add_argument("--seconds", type=float, default=10)
+    # internal: how the parent starts its worker processes
+    parser.add_argument("--role", choices=["setup", "reader", "writer"], help=argparse.SUPPRESS)
+    parser.add_argument("--worker", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role == "setup":
+        setup(args)
+        return 0
+    if args.role:
+        work(args)
+        return 0
+
+    print(f"{args.readers} reader and {args.writers} writer processes, {args.seconds:g}s per configuration")
+    print(f"{'config':<10} {'reads/s':>9} {'writes/s':>9} {'read p95':>10} {'write p95':>10} {'5xx':>6}")
+    for name, env in CONFIGS.items():
+        reads, writes, read_p95, write_p95, errors = run_config(args, env)
+        print(f"{name:<10} {reads:>9.1f} {writes:>9.1f} {read_p95:>8.2f}ms {write_p95:>8.2f}ms {errors:>6}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
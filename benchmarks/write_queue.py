@@ -0,0 +1,97 @@
+"""Concurrent service writes with and without the single-writer commit queue.
+
+Worker threads create bookings and expenses through the services as fast as
+they can for a fixed time. Each configuration runs in its own process on a
+fresh database, since the queue is configured at import time.
+
+    python -m benchmarks.write_queue --threads 16 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+# name -> environment for the child process
+CONFIGS = {
+    "direct": {"WRITE_QUEUE": "off"},
+    "queue": {"WRITE_QUEUE": "on"},
+}
+
+def child(args):
+    from benchmarks.common import use_temp_database
+    use_temp_database()
+    os.environ["OUTBOX_WORKER"] = "off"
+
+    import generate_data
+    import writer
+    from database import create_tables, db_session
+    from services import BookingService, ExpenseService
+
+    create_tables()
+    generate_data.generate(users=100, trips=args.trips, bookings_per_trip=2, expenses_per_trip=1)
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def work(n):
+        rnd = random.Random(n)
+        bookings, expenses = BookingService(), ExpenseService()
+        while not stop.is_set():
+            trip_id = rnd.randint(1, args.trips)
+            start = time.perf_counter()
+            try:
+                if rnd.random() < 0.5:
+                    bookings.create(trip_id=trip_id, customer_name="Bench Guest", seats=1, contact="bench@example.com")
+                else:
+                    expenses.create(trip_id=trip_id, title="Supplier invoice", amount=round(rnd.uniform(5, 500), 2))
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            finally:
+                db_session.remove()  # as the app does when each request ends
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    print(json.dumps({"writes_per_sec": len(latencies) / args.seconds,
+                      "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+                      "errors": len(errors),
+                      "avg_batch": writer.coordinator.stats()["avg_batch"] if writer.coordinator else 1.0}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return 0
+
+    print(f"{args.threads} writer threads, {args.seconds:g}s per configuration")
+    print(f"{'config':<8} {'writes/s':>9} {'p95 ms':>9} {'errors':>7} {'avg batch':>10}")
+    for name, env in CONFIGS.items():
+        cmd = [sys.executable, "-m", "benchmarks.write_queue", "--child", "--trips", str(args.trips),
+               "--threads", str(args.threads), "--seconds", str(args.seconds)]
+        out = subprocess.run(cmd, env={**os.environ, **env}, capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{name:<8} {r['writes_per_sec']:>9.1f} {r['p95_ms']:>9.2f} {r['errors']:>7} {r['avg_batch']:>10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
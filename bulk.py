@@ -0,0 +1,342 @@
+"""Streaming bulk import/export of trips, bookings and expenses (CSV or NDJSON).
+
+Rows are read lazily, validated in chunks and inserted with one executemany per
+chunk, each chunk in its own transaction, so memory and lock time stay bounded
+whatever the file size. Exports page through the table by primary key.
+
+    python bulk.py import trips trips.csv
+    python bulk.py import bookings - --format ndjson < bookings.ndjson
+    python bulk.py export expenses --format csv > expenses.csv
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, insert, select, text
+
+import trip_stats
+from cache import page_cache
+from database import get_engine, get_read_engine, immediate
+from models import Trip, Booking, Expense
+from services import bump_catalogue_version, fts_index_after
+
+CHUNK_SIZE = 5000
+MAX_ERRORS = 100  # error details kept per import; the count is always exact
+
+class BulkError(Exception):
+    """Bad request: unknown entity or format, or input that stopped being readable part-way.
+    In the last case `result` holds what was committed before that point."""
+    def __init__(self, message: str, result: Optional["ImportResult"] = None):
+        super().__init__(message)
+        self.result = result
+
+class InvalidRow(NamedTuple):
+    """Stands in for an input row that could not be parsed; import_rows rejects it like an invalid row."""
+    error: str
+
+def _text(value, required=False, max_len=None):
+    value = (value or "").strip() if isinstance(value, str) or value is None else str(value)
+    if required and not value:
+        raise ValueError("required")
+    if max_len and len(value) > max_len:
+        raise ValueError(f"longer than {max_len} characters")
+    # blank optional text is stored as "", like the HTML forms do; templates don't expect None
+    return value
+
+def _int(value, required=False, minimum=None):
+    if value in (None, ""):
+        if required:
+            raise ValueError("required")
+        return None
+    value = int(value)
+    if minimum is not None and value < minimum:
+        raise ValueError(f"must be >= {minimum}")
+    return value
+
+def _float(value, required=False):
+    if value in (None, ""):
+        if required:
+            raise ValueError("required")
+        return None
+    return float(value)
+
+class Entity(NamedTuple):
+    model: type
+    # column -> validator(raw value) returning the cleaned value
+    fields: Dict[str, Callable]
+
+ENTITIES = {
+    "trips": Entity(Trip, {
+        "title": lambda v: _text(v, required=True, max_len=200),
+        "destination": lambda v: _text(v, max_len=200),
+        "date": lambda v: _text(v, max_len=50),
+        "description": _text,
+        "price": _float,
+        "capacity": lambda v: _int(v, minimum=0),
+    }),
+    "bookings": Entity(Booking, {
+        "trip_id": lambda v: _int(v, required=True),
+        "user_id": _int,
+        "customer_name": lambda v: _text(v, required=True, max_len=200),
+        "seats": lambda v: _int(v, minimum=1) or 1,
+        "contact": lambda v: _text(v, max_len=200),
+    }),
+    "expenses": Entity(Expense, {
+        "trip_id": _int,
+        "booking_id": _int,
+        "title": lambda v: _text(v, required=True, max_len=200),
+        "amount": lambda v: _float(v) or 0.0,
+        "note": _text,
+    }),
+}
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def reject(self, line: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def to_dict(self):
+        return {"inserted": self.inserted, "rejected": self.rejected,
+                "errors": [{"row": line, "error": msg} for line, msg in self.errors]}
+
+def read_rows(stream: Iterable[str], fmt: str) -> Iterator[dict]:
+    """Yield raw row dicts from a text stream without reading it all. An NDJSON line that is
+    not valid JSON is yielded as an InvalidRow, so one bad line does not end the import."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield InvalidRow(f"invalid JSON: {e.msg} at column {e.colno}")
+    else:
+        raise BulkError(f"unsupported format: {fmt}")
+
+def _validate(entity: Entity, raw) -> dict:
+    if isinstance(raw, InvalidRow):
+        raise ValueError(raw.error)
+    if not isinstance(raw, dict):
+        raise ValueError(f"expected an object, got {type(raw).__name__}")
+    row = {}
+    for name, clean in entity.fields.items():
+        try:
+            row[name] = clean(raw.get(name))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}")
+    return row
+
+def _existing_ids(conn, model, ids) -> set:
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    return set(conn.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+TAKE_SEATS = text("UPDATE trips SET seats_taken = seats_taken + :seats "
+                  "WHERE id = :id AND (capacity IS NULL OR seats_taken + :seats <= capacity)")
+
+def _take_seats(conn, trip_id: int, seats: int) -> bool:
+    return conn.execute(TAKE_SEATS, {"id": trip_id, "seats": seats}).rowcount == 1
+
+def _insert_chunk(conn, name: str, entity: Entity, chunk: List[Tuple[int, dict]], result: ImportResult) -> set:
+    """Insert one validated chunk; returns the page-cache tags it invalidates."""
+    now = datetime.utcnow()
+    rows = chunk
+    if name == "bookings":
+        # take seats with the same conditional UPDATE as checkout, per trip for the whole chunk and
+        # in one executemany; if any trip cannot fit its share, redo the chunk trip by trip and then
+        # row by row for the trips that were refused
+        seats_by_trip: Dict[int, int] = {}
+        for _, row in rows:
+            seats_by_trip[row["trip_id"]] = seats_by_trip.get(row["trip_id"], 0) + row["seats"]
+        refused = set()
+        # inside the chunk's transaction (import_rows begins it with database.immediate()), so a later failure in the
+        # chunk gives these seats back too
+        savepoint = conn.begin_nested()
+        taken = conn.execute(TAKE_SEATS, [{"id": t, "seats": n} for t, n in seats_by_trip.items()]).rowcount
+        if taken == len(seats_by_trip):
+            savepoint.commit()
+        else:
+            savepoint.rollback()
+            refused = {t for t, n in seats_by_trip.items() if not _take_seats(conn, t, n)}
+        kept = []
+        for line, row in rows:
+            if row["trip_id"] in refused and not _take_seats(conn, row["trip_id"], row["seats"]):
+                result.reject(line, f"trip_id {row['trip_id']}: unknown trip or not enough seats")
+            else:
+                kept.append((line, row))
+        rows = kept
+    elif name == "expenses":
+        trips = _existing_ids(conn, Trip, (r["trip_id"] for _, r in rows))
+        bookings = _existing_ids(conn, Booking, (r["booking_id"] for _, r in rows))
+        kept = []
+        for line, row in rows:
+            if row["trip_id"] is not None and row["trip_id"] not in trips:
+                result.reject(line, f"trip_id {row['trip_id']}: unknown trip")
+            elif row["booking_id"] is not None and row["booking_id"] not in bookings:
+                result.reject(line, f"booking_id {row['booking_id']}: unknown booking")
+            else:
+                kept.append((line, row))
+        rows = kept
+    if not rows:
+        return set()
+    params = [row for _, row in rows]
+    if "created_at" in entity.model.__table__.columns:
+        for row in params:
+            row["created_at"] = now
+    if name == "trips":
+        last_id = conn.execute(select(func.coalesce(func.max(Trip.id), 0))).scalar()
+    conn.execute(insert(entity.model.__table__), params)
+    if name == "trips":
+        fts_index_after(conn, last_id)
+    if name in ("trips", "bookings"):
+        bump_catalogue_version(conn)
+    if name == "bookings":
+        per_trip: Dict[int, dict] = {}
+        for row in params:
+            stats = per_trip.setdefault(row["trip_id"], {"trip_id": row["trip_id"], "bookings": 0, "seats": 0,
+                                                         "booked_at": now})
+            stats["bookings"] += 1
+            stats["seats"] += row["seats"]
+        trip_stats.record_bookings_many(conn, per_trip.values())
+    elif name == "expenses":
+        amounts: Dict[int, float] = {}
+        for row in params:
+            if row["trip_id"] is not None:
+                amounts[row["trip_id"]] = amounts.get(row["trip_id"], 0.0) + (row["amount"] or 0.0)
+        trip_stats.record_expenses_many(conn, ({"trip_id": t, "amount": a} for t, a in amounts.items()))
+    result.inserted += len(params)
+    if name == "trips":
+        return {"index"}
+    return {f"trip:{row['trip_id']}" for row in params if row["trip_id"] is not None}
+
+def import_rows(name: str, rows: Iterable[dict], chunk_size: int = CHUNK_SIZE, bind=None) -> ImportResult:
+    """Validate and insert rows chunk by chunk; each chunk commits in its own transaction.
+    If the input itself becomes unreadable (bad encoding, broken CSV), the rows validated so far
+    are committed and BulkError is raised with the result up to that point."""
+    if name not in ENTITIES:
+        raise BulkError(f"unknown entity: {name}")
+    entity = ENTITIES[name]
+    bind = immediate(bind)
+    result = ImportResult()
+    chunk: List[Tuple[int, dict]] = []
+
+    def flush():
+        with bind.begin() as conn:
+            tags = _insert_chunk(conn, name, entity, chunk, result)
+        if tags:
+            page_cache.invalidate(*tags)
+        chunk.clear()
+
+    rows = iter(rows)
+    line = 0
+    while True:
+        try:
+            raw = next(rows)
+        except StopIteration:
+            break
+        except (csv.Error, UnicodeDecodeError) as e:
+            if chunk:
+                flush()
+            raise BulkError(f"unreadable input after row {line}: {e}; "
+                            f"{result.inserted} row(s) before it were imported", result)
+        line += 1
+        try:
+            chunk.append((line, _validate(entity, raw)))
+        except ValueError as e:
+            result.reject(line, str(e))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
+
+def export_rows(name: str, fmt: str, chunk_size: int = CHUNK_SIZE, bind=None) -> Iterator[str]:
+    """Yield the table as CSV or NDJSON text, one keyset page of rows at a time."""
+    if name not in ENTITIES:
+        raise BulkError(f"unknown entity: {name}")
+    if fmt not in ("csv", "ndjson"):
+        raise BulkError(f"unsupported format: {fmt}")
+    table = ENTITIES[name].model.__table__
+    columns = [c.name for c in table.columns]
+    # a long export must not hold a connection on the writer engine
+    bind = bind or get_read_engine() or get_engine()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        writer.writerow(columns)
+        yield buf.getvalue()
+    last_id = 0
+    while True:
+        with bind.connect() as conn:
+            rows = conn.execute(select(table).where(table.c.id > last_id)
+                                .order_by(table.c.id).limit(chunk_size)).fetchall()
+        if not rows:
+            return
+        buf.seek(0)
+        buf.truncate()
+        for row in rows:
+            values = [v.isoformat() if isinstance(v, datetime) else v for v in row]
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buf.write(json.dumps(dict(zip(columns, values))) + "\n")
+        yield buf.getvalue()
+        last_id = rows[-1].id
+
+def guess_format(filename: Optional[str], default: str = "csv") -> str:
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export trips, bookings and expenses.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("entity", choices=sorted(ENTITIES))
+    imp.add_argument("path", help="input file, or - for stdin")
+    imp.add_argument("--format", choices=["csv", "ndjson"])
+    imp.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    exp = sub.add_parser("export")
+    exp.add_argument("entity", choices=sorted(ENTITIES))
+    exp.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    args = parser.parse_args(argv)
+
+    from database import create_tables
+    create_tables()
+    if args.command == "export":
+        for piece in export_rows(args.entity, args.format):
+            sys.stdout.write(piece)
+        return 0
+    fmt = args.format or guess_format(args.path)
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    stopped = False
+    with stream:
+        try:
+            result = import_rows(args.entity, read_rows(stream, fmt), chunk_size=args.chunk_size)
+        except BulkError as e:
+            if e.result is None:
+                raise
+            print(f"Stopped: {e}", file=sys.stderr)
+            result, stopped = e.result, True
+    print(f"Inserted {result.inserted} {args.entity}, rejected {result.rejected}", file=sys.stderr)
+    for line, msg in result.errors:
+        print(f"  row {line}: {msg}", file=sys.stderr)
+    return 0 if not (result.rejected or stopped) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Rendered-page cache with tag-based invalidation.
+
+Pages are stored under a key that embeds the current generation of each tag
+the page depends on ("index", "trip:<id>"). Invalidating a tag bumps its
+generation, so every page built from the old data stops being looked up and
+ages out of the backend. This works the same for the in-process LRU and
+for the SQLite backend shared by all workers on one host.
+
+Configure with PAGE_CACHE: "memory" (default), "sqlite:<path>" or "off";
+PAGE_CACHE_SIZE and PAGE_CACHE_TTL tune the memory backend and entry lifetime.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+class LRUBackend:
+    """Thread-safe in-process LRU with per-entry expiry. Tag generations are kept apart
+    from pages so eviction can never roll a tag back to an older generation."""
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._items.get(key)
+            if not entry:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def generation(self, tag: str) -> int:
+        return self._generations.get(tag, 0)
+
+    def bump(self, tag: str):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class SqliteBackend:
+    """Cache tables in a local SQLite file, shared by every worker process on the host."""
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS page_cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS page_tags (tag TEXT PRIMARY KEY, generation INTEGER)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute("SELECT value FROM page_cache WHERE key = ? AND expires >= ?",
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value, ttl: float):
+        self._conn().execute("INSERT OR REPLACE INTO page_cache (key, value, expires) VALUES (?, ?, ?)",
+                             (key, value, time.time() + ttl))
+
+    def generation(self, tag: str) -> int:
+        row = self._conn().execute("SELECT generation FROM page_tags WHERE tag = ?", (tag,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, tag: str):
+        conn = self._conn()
+        conn.execute("INSERT INTO page_tags (tag, generation) VALUES (?, 1) "
+                     "ON CONFLICT(tag) DO UPDATE SET generation = generation + 1", (tag,))
+        # superseded pages are unreachable now; use the write to drop expired ones
+        conn.execute("DELETE FROM page_cache WHERE expires < ?", (time.time(),))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM page_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM page_cache").fetchone()[0]
+
+class PageCache:
+    """Use key() once per request, before rendering, and pass that key to get() and set():
+    a page rendered from data that changed mid-request is then stored under the old,
+    already-invalidated generation and is never served."""
+    def __init__(self, backend=None, ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # counters are bumped from every request thread; += on an attribute is not atomic
+        self._stats_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, name: str, tags: Iterable[str], variant: str) -> str:
+        generations = ".".join(str(self.backend.generation(t)) for t in tags)
+        return f"{name}|{generations}|{variant}"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, html: str):
+        self.backend.set(key, html, self.ttl)
+
+    def invalidate(self, *tags: str):
+        if not self.enabled:
+            return
+        for tag in tags:
+            self.backend.bump(tag)
+        with self._stats_lock:
+            self.invalidations += 1
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        lookups = hits + misses
+        return {"backend": type(self.backend).__name__ if self.backend else None,
+                "hits": hits, "misses": misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "invalidations": invalidations,
+                "entries": len(self.backend) if self.backend else 0}
+
+def make_backend(spec: str):
+    if not spec or spec == "off":
+        return None
+    if spec == "memory":
+        return LRUBackend(int(os.environ.get("PAGE_CACHE_SIZE", "512")))
+    if spec.startswith("sqlite:"):
+        return SqliteBackend(spec[len("sqlite:"):])
+    raise ValueError(f"unknown PAGE_CACHE backend: {spec}")
+
+page_cache = PageCache(make_backend(os.environ.get("PAGE_CACHE", "memory")),
+                       ttl=float(os.environ.get("PAGE_CACHE_TTL", "300")))
@@ -0,0 +1,125 @@
+"""Server-side store for checkouts between booking_checkout and booking_complete.
+
+The pending booking (trip, seats, contact, seat-hold id) stays on the server
+under a random id; the session cookie only carries that id. Entries expire
+after CHECKOUT_TTL seconds (default: the seat-hold lifetime), so abandoned
+checkouts disappear on their own, and the live count is what the admin
+dashboard and /metrics report.
+
+Configure with CHECKOUT_STORE: "memory" (default, one process; bounded by
+CHECKOUT_STORE_SIZE) or "sqlite:<path>" (shared by all workers on one host).
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry; the oldest checkouts go first when full."""
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: dict, ttl: float):
+        with self._lock:
+            self._items[key] = (data, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._items.get(key)
+            if not entry or entry[1] < time.time():
+                return None
+            return dict(entry[0])
+
+    def pop(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._items.pop(key, None)
+        return entry[0] if entry and entry[1] >= time.time() else None
+
+    def live(self) -> int:
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._items.items() if expires < now]:
+                del self._items[key]
+            return len(self._items)
+
+class SqliteBackend:
+    """Checkouts in a local SQLite file, shared by every worker process on the host."""
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS checkouts (id TEXT PRIMARY KEY, data TEXT, expires REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def put(self, key: str, data: dict, ttl: float):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO checkouts (id, data, expires) VALUES (?, ?, ?)",
+                     (key, json.dumps(data), now + ttl))
+        # use the write to drop abandoned checkouts
+        conn.execute("DELETE FROM checkouts WHERE expires < ?", (now,))
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT data FROM checkouts WHERE id = ? AND expires >= ?",
+                                   (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, key: str) -> Optional[dict]:
+        # one statement, so two workers completing the same checkout can't both get it
+        row = self._conn().execute("DELETE FROM checkouts WHERE id = ? RETURNING data, expires", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[1] >= time.time() else None
+
+    def live(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM checkouts WHERE expires >= ?", (time.time(),)).fetchone()[0]
+
+class CheckoutStore:
+    def __init__(self, backend, ttl: float = 900):
+        self.backend = backend
+        self.ttl = ttl
+        self.started = 0
+        self.ended = 0
+
+    def start(self, data: dict) -> str:
+        """Keep a new checkout and return the opaque id for the session cookie."""
+        checkout_id = secrets.token_urlsafe(16)
+        self.backend.put(checkout_id, data, self.ttl)
+        self.started += 1
+        return checkout_id
+
+    def get(self, checkout_id: Optional[str]) -> Optional[dict]:
+        return self.backend.get(checkout_id) if checkout_id else None
+
+    def pop(self, checkout_id: Optional[str]) -> Optional[dict]:
+        """Remove and return a live checkout (None if unknown or expired)."""
+        data = self.backend.pop(checkout_id) if checkout_id else None
+        if data is not None:
+            self.ended += 1
+        return data
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, "live": self.backend.live(),
+                "started": self.started, "ended": self.ended}
+
+def make_backend(spec: str):
+    if not spec or spec == "memory":
+        return MemoryBackend(int(os.environ.get("CHECKOUT_STORE_SIZE", "10000")))
+    if spec.startswith("sqlite:"):
+        return SqliteBackend(spec[len("sqlite:"):])
+    raise ValueError(f"unknown CHECKOUT_STORE backend: {spec}")
+
+checkout_store = CheckoutStore(make_backend(os.environ.get("CHECKOUT_STORE", "memory")),
+                               ttl=float(os.environ.get("CHECKOUT_TTL", os.environ.get("SEAT_HOLD_TTL", "900"))))
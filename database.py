@@ -1,90 +1,216 @@
+"""Engines, sessions and the schema setup step.
+
+Nothing here connects at import: the engines are created on first use
+(get_engine / get_read_engine, or the module attributes `engine` and
+`read_engine`), and sessions from db_session bind to them when first opened.
+create_tables() creates missing tables and applies migrations. It is an
+explicit step (`python migrations.py`, the scripts, or MIGRATE_ON_START in
+app.create_app) rather than something every worker does on import.
+"""
+import os
+import re
 import sqlite3
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+from typing import List, NamedTuple, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, sessionmaker, scoped_session, declarative_base
+
+# SQLite DB in project root (override with DATABASE_URL, e.g. for benchmarks)
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///trip.db")
+
+# Connection pool sizing; a worker thread holds at most one connection per request.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "16"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", str(POOL_SIZE)))
+
+JOURNAL_MODES = {"wal", "delete", "truncate", "persist", "memory", "off"}
+SYNCHRONOUS_LEVELS = {"off", "normal", "full", "extra"}
+
+class StorageProfile(NamedTuple):
+    """SQLite pragmas applied to every new pooled connection."""
+    journal_mode: str = "wal"          # readers no longer wait for a writer's commit
+    synchronous: str = "normal"        # with WAL: durable across app crashes, fsync at checkpoints
+    mmap_size: int = 256 * 1024 ** 2   # bytes of the file read through the OS page cache
+    cache_size: int = -64 * 1024       # page cache per connection; negative means KiB
+    busy_timeout: int = 5000           # ms a writer waits for the lock before "database is locked"
+
+    @classmethod
+    def from_env(cls) -> Optional["StorageProfile"]:
+        """SQLITE_PROFILE=off keeps SQLite's defaults; otherwise SQLITE_* override single pragmas."""
+        if os.environ.get("SQLITE_PROFILE", "tuned") == "off":
+            return None
+        default = cls()
+        profile = cls(journal_mode=os.environ.get("SQLITE_JOURNAL_MODE", default.journal_mode).lower(),
+                      synchronous=os.environ.get("SQLITE_SYNCHRONOUS", default.synchronous).lower(),
+                      mmap_size=int(os.environ.get("SQLITE_MMAP_SIZE", default.mmap_size)),
+                      cache_size=int(os.environ.get("SQLITE_CACHE_SIZE", default.cache_size)),
+                      busy_timeout=int(os.environ.get("SQLITE_BUSY_TIMEOUT", default.busy_timeout)))
+        if profile.journal_mode not in JOURNAL_MODES or profile.synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unsupported SQLite storage profile: {profile}")
+        return profile
+
+    def apply(self, dbapi_conn, readonly: bool = False):
+        cursor = dbapi_conn.cursor()
+        # journal mode is stored in the database file, so only writers set it
+        if not readonly:
+            cursor.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {self.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        cursor.close()
+
+storage_profile = StorageProfile.from_env()
+
+_WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|SAVEPOINT|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+def make_engine(url: Optional[str] = None, profile: Optional[StorageProfile] = storage_profile,
+                readonly: bool = False, pool_size: int = POOL_SIZE):
+    eng = create_engine(url or DATABASE_URL,
+                        connect_args={"check_same_thread": False},
+                        poolclass=QueuePool,
+                        pool_size=pool_size,
+                        max_overflow=MAX_OVERFLOW,
+                        pool_timeout=POOL_TIMEOUT,
+                        pool_pre_ping=True)
+    if eng.dialect.name == "sqlite":
+        @event.listens_for(eng, "connect")
+        def _configure(dbapi_conn, record):
+            # pysqlite only opens a transaction before DML, so SAVEPOINT would run outside one and
+            # each RELEASE would commit on its own; turn that off and BEGIN ourselves (below)
+            dbapi_conn.isolation_level = None
+            if profile is not None:
+                profile.apply(dbapi_conn, readonly=readonly)
+            if readonly:
+                # a write that slips through fails loudly instead of landing on the reader
+                dbapi_conn.execute("PRAGMA query_only = ON")
+
+        @event.listens_for(eng, "begin")
+        def _begin(conn):
+            if readonly:
+                conn.exec_driver_sql("BEGIN")
+            elif conn.get_execution_options().get("begin_immediate"):
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            # otherwise the transaction opens at the first write (below). A request's reads then hold
+            # neither the write lock nor an old snapshot that a later write would fail to upgrade from.
+
+        if not readonly:
+            @event.listens_for(eng, "before_cursor_execute")
+            def _begin_at_first_write(conn, cursor, statement, parameters, context, executemany):
+                dbapi_conn = conn.connection.driver_connection
+                if not dbapi_conn.in_transaction and _WRITE_STATEMENT.match(statement):
+                    dbapi_conn.execute("BEGIN IMMEDIATE")
+    return eng
+
+def immediate(bind=None):
+    """`bind` (default: the writer engine) with transactions that take the write lock at BEGIN.
+    For units of work that read and then write on their own connection (write-queue batches, the
+    batch API, bulk import chunks): a deferred transaction that reads first fails with SQLITE_BUSY,
+    without waiting out busy_timeout, if another writer committed in between."""
+    return (bind if bind is not None else get_engine()).execution_options(begin_immediate=True)
+
+def _file_backed(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
 
-# SQLite DB in project root
-DATABASE_URL = "sqlite:///trip.db"
+_engines = {}
+_engines_lock = threading.RLock()  # re-entrant: the read engine's factory calls get_engine()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def configure(url: str):
+    """Use another database URL. Only possible before the first engine is created."""
+    global DATABASE_URL
+    with _engines_lock:
+        if _engines and url != DATABASE_URL:
+            raise RuntimeError(f"database already in use at {DATABASE_URL}; configure() must come first")
+        DATABASE_URL = url
+
+def _make_read_engine():
+    # GET handlers read through their own pool of query_only connections (DB_READ_ENGINE=off to share the writer's)
+    if os.environ.get("DB_READ_ENGINE", "on") == "off" or not _file_backed(get_engine().url):
+        return None
+    return make_engine(readonly=True, pool_size=READ_POOL_SIZE)
+
+def _lazy(name: str, factory):
+    if name not in _engines:
+        with _engines_lock:
+            # check again: another thread may have built it while we waited for the lock
+            if name not in _engines:
+                _engines[name] = factory()
+    return _engines[name]
+
+def get_engine():
+    """The read-write engine, created on first use."""
+    return _lazy("engine", make_engine)
+
+def get_read_engine():
+    """The read-only engine for GET handlers, or None when reads share the writer's pool."""
+    return _lazy("read_engine", _make_read_engine)
+
+def engines() -> List:
+    """Every engine the app uses (creating them), e.g. to instrument or count statements."""
+    return [e for e in (get_engine(), get_read_engine()) if e is not None]
+
+def __getattr__(name):
+    # `database.engine` / `from database import engine` for scripts and benchmarks
+    if name == "engine":
+        return get_engine()
+    if name == "read_engine":
+        return get_read_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class RoutingSession(Session):
+    """Session that sends every statement to the read-only engine while info["read_only"] is set.
+    The app sets it for GET/HEAD requests; writers and scripts never see it. Without an explicit
+    bind it uses the shared engine, so sessions can be configured before any engine exists."""
+    def __init__(self, bind=None, **kw):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kw)
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("read_only"):
+            reader = get_read_engine()
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+# One session per thread/request; call db_session.remove() when the request ends.
+db_session = scoped_session(SessionLocal)
 Base = declarative_base()
 
+class QueryCounter:
+    """Counts SQL statements executed inside a with-block (N+1 checks, benchmarks).
+    Watches the writer and the read-only engine unless a single bind is given."""
+    def __init__(self, bind=None):
+        self.binds = [bind] if bind is not None else engines()
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for bind in self.binds:
+            event.listen(bind, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for bind in self.binds:
+            event.remove(bind, "before_cursor_execute", self._on_execute)
+        return False
+
 def get_connection():
-    return sqlite3.connect("trip.db")
+    conn = sqlite3.connect(get_engine().url.database)
+    if storage_profile is not None:
+        storage_profile.apply(conn)
+    return conn
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
-
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # USERS
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS User (
-        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        role TEXT
-    )
-    """)
-
-    # TRIPS
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Trip (
-        trip_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        destination TEXT,
-        start_date TEXT,
-        end_date TEXT,
-        budget REAL,
-        agent_id INTEGER,
-        FOREIGN KEY(agent_id) REFERENCES User(user_id)
-    )
-    """)
-
-    # PACKAGES
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Package (
-        package_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        trip_id INTEGER,
-        name TEXT,
-        price REAL,
-        description TEXT,
-        FOREIGN KEY(trip_id) REFERENCES Trip(trip_id)
-    )
-    """)
-
-    # BOOKINGS
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Booking (
-        booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        package_id INTEGER,
-        status TEXT,
-        FOREIGN KEY(user_id) REFERENCES User(user_id),
-        FOREIGN KEY(package_id) REFERENCES Package(package_id)
-    )
-    """)
-
-    # WISHLIST
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Wishlist (
-        wishlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        package_id INTEGER,
-        FOREIGN KEY(user_id) REFERENCES User(user_id),
-        FOREIGN KEY(package_id) REFERENCES Package(package_id)
-    )
-    """)
-
-    # EXPENSES
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Expense (
-        expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        trip_id INTEGER,
-        description TEXT,
-        amount REAL,
-        FOREIGN KEY(trip_id) REFERENCES Trip(trip_id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Create missing tables and apply pending migrations (migrations.py)."""
+    import models  # noqa: F401  (register tables on Base.metadata)
+    from migrations import upgrade
+    Base.metadata.create_all(bind=get_engine())
+    upgrade(get_engine())
@@ -0,0 +1,204 @@
+"""Synthetic large-dataset generator for local performance work.
+
+Builds users, trips, bookings and expenses with a deterministic seed and
+bulk-loads them through SQLAlchemy Core in large transactions (one executemany
+per table per batch), keeping trips.seats_taken, the search index and the
+catalogue version consistent with what the app maintains itself.
+
+    python generate_data.py --users 100000 --trips 200000 --bookings-per-trip 10 --expenses-per-trip 3
+    python generate_data.py --db big.db --trips 1000000 --seed 7
+
+Every generated user shares one password (default "secret") so the slow hash
+is computed once, not per user. Timestamps count back from a fixed --until
+date, so a seed always produces the same rows. Running again appends:
+usernames continue after the ones already generated with that seed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+PLACES = ["Bali", "Lisbon", "Reykjavik", "Kyoto", "Nairobi", "Chamonix", "Lima", "Hanoi", "Cusco", "Seville",
+          "Porto", "Oslo", "Tromso", "Marrakesh", "Cairo", "Sydney", "Queenstown", "Banff", "Havana", "Tbilisi"]
+THEMES = ["Weekend", "City Break", "Adventure", "Safari", "Ski Week", "Road Trip", "Food Tour", "Wellness Retreat",
+          "Island Hopping", "Hiking", "Photography", "Wine Tasting", "Cultural Tour", "Family Holiday"]
+WORDS = ["beach", "temples", "glaciers", "markets", "trams", "vineyards", "mountains", "hot springs", "museums",
+         "street food", "sunsets", "wildlife", "old town", "boat trip", "guided walks", "local guides"]
+EXPENSES = ["Hotel deposit", "Airport transfer", "Guide fee", "Park entrance fee", "Tour tickets", "Car hire",
+            "Insurance", "Meals"]
+# created_at values end here rather than at the current time, so a seed always gives the same data
+EPOCH = datetime(2026, 1, 1)
+
+def trip_row(rnd: random.Random, n: int) -> dict:
+    place = rnd.choice(PLACES)
+    return {
+        "title": f"{rnd.choice(THEMES)} {place} #{n}",
+        "destination": place,
+        "date": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "description": " ".join(rnd.sample(WORDS, 4)),
+        "price": round(rnd.uniform(80, 3000), 2),
+    }
+
+@contextmanager
+def _synchronous_off(conn):
+    """PRAGMA synchronous = OFF for a bulk load, restored before the pooled connection is reused.
+    The pragma can't change inside a transaction, so it goes straight to the driver connection."""
+    raw = conn.connection.driver_connection
+    previous = raw.execute("PRAGMA synchronous").fetchone()[0]
+    raw.execute("PRAGMA synchronous = OFF")
+    try:
+        yield
+    finally:
+        if conn.in_transaction():
+            conn.rollback()
+        raw.execute(f"PRAGMA synchronous = {int(previous)}")
+
+def generate(users: int = 1000, trips: int = 10000, bookings_per_trip: float = 5, expenses_per_trip: float = 2,
+             seed: int = 42, batch_size: int = 20000, password: str = "secret", days: int = 365,
+             until: datetime = EPOCH, bind=None, progress=None) -> dict:
+    """Append a synthetic dataset to the database and return row counts.
+
+    Bookings per trip are uniform on [0, 2 * bookings_per_trip]; expenses per trip are
+    exponentially distributed around expenses_per_trip with log-normal amounts. created_at
+    values are spread over the `days` days before `until` so date-range reports have something to cut.
+    """
+    from sqlalchemy import func, insert, select
+
+    import trip_stats
+    from database import get_engine
+    from passwords import hasher
+    from models import User, Trip, Booking, Expense
+    from services import bump_catalogue_version, fts_index_after
+
+    bind = bind or get_engine()
+    rnd = random.Random(seed)
+    span = days * 86400
+    prefix = f"gen{seed}_"
+
+    def when():
+        return until - timedelta(seconds=rnd.randint(0, span))
+
+    counts = {"users": 0, "trips": 0, "bookings": 0, "expenses": 0}
+    # bulk load only: don't fsync every batch
+    with bind.connect() as conn, _synchronous_off(conn):
+        next_user, next_trip, next_booking = (
+            conn.execute(select(func.coalesce(func.max(m.id), 0))).scalar() + 1 for m in (User, Trip, Booking))
+        first_trip = next_trip
+        # continue after this seed's earlier users instead of colliding with their usernames
+        first_name = conn.execute(select(func.count()).select_from(User)
+                                  .where(User.username >= prefix, User.username < prefix + "\U0010ffff")).scalar()
+        conn.commit()
+
+        password_hash = hasher.hash(password)
+        customers = []
+        for start in range(0, users, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, users)):
+                role = "agent" if rnd.random() < 0.02 else "customer"
+                rows.append({"id": next_user, "username": f"{prefix}{first_name + i}", "password_hash": password_hash,
+                             "role": role, "agent_approved": role == "agent" and rnd.random() < 0.8,
+                             "created_at": when()})
+                if role == "customer":
+                    customers.append(next_user)
+                next_user += 1
+            with conn.begin():
+                conn.execute(insert(User.__table__), rows)
+            counts["users"] += len(rows)
+
+        trips_batch, bookings_batch, expenses_batch = [], [], []
+
+        def flush():
+            with conn.begin():
+                if trips_batch:
+                    conn.execute(insert(Trip.__table__), trips_batch)
+                if bookings_batch:
+                    conn.execute(insert(Booking.__table__), bookings_batch)
+                if expenses_batch:
+                    conn.execute(insert(Expense.__table__), expenses_batch)
+            counts["trips"] += len(trips_batch)
+            counts["bookings"] += len(bookings_batch)
+            counts["expenses"] += len(expenses_batch)
+            trips_batch.clear()
+            bookings_batch.clear()
+            expenses_batch.clear()
+            if progress:
+                progress(counts)
+
+        for n in range(trips):
+            trip_id = next_trip
+            next_trip += 1
+            trip = trip_row(rnd, trip_id)
+            seats_taken = 0
+            for _ in range(rnd.randint(0, int(2 * bookings_per_trip))):
+                seats = rnd.randint(1, 4)
+                seats_taken += seats
+                bookings_batch.append({
+                    "id": next_booking, "trip_id": trip_id,
+                    "user_id": rnd.choice(customers) if customers and rnd.random() < 0.8 else None,
+                    "customer_name": f"Guest {next_booking}", "seats": seats,
+                    "contact": f"guest{next_booking}@example.com", "created_at": when()})
+                next_booking += 1
+            for _ in range(int(rnd.expovariate(1 / expenses_per_trip)) if expenses_per_trip else 0):
+                expenses_batch.append({"trip_id": trip_id, "booking_id": None, "title": rnd.choice(EXPENSES),
+                                       "amount": round(rnd.lognormvariate(4, 1), 2), "note": None,
+                                       "created_at": when()})
+            trip.update(id=trip_id, seats_taken=seats_taken,
+                        capacity=None if rnd.random() < 0.5 else seats_taken + rnd.randint(0, 40))
+            trips_batch.append(trip)
+            if len(trips_batch) + len(bookings_batch) + len(expenses_batch) >= batch_size:
+                flush()
+        flush()
+
+        with conn.begin():
+            fts_index_after(conn, first_trip - 1)
+            trip_stats.rebuild(conn, after_id=first_trip - 1)
+            bump_catalogue_version(conn)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a large synthetic trip.db.")
+    parser.add_argument("--db", help="SQLite file to fill (default: DATABASE_URL / trip.db)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--trips", type=int, default=10000)
+    parser.add_argument("--bookings-per-trip", type=float, default=5)
+    parser.add_argument("--expenses-per-trip", type=float, default=2)
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over this many days")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=EPOCH,
+                        help="latest created_at, YYYY-MM-DD (default %(default)s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--reset", action="store_true", help="delete the database file first")
+    args = parser.parse_args(argv)
+    if args.db:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    if args.reset:
+        from sqlalchemy.engine import make_url
+        path = make_url(os.environ.get("DATABASE_URL", "sqlite:///trip.db")).database
+        if path and os.path.exists(path):
+            os.remove(path)
+            print(f"Deleted existing {path}")
+
+    from database import create_tables
+    create_tables()
+    start = time.perf_counter()
+
+    def progress(counts):
+        print(f"\r  {counts['trips']:,} trips, {counts['bookings']:,} bookings, "
+              f"{counts['expenses']:,} expenses", end="", file=sys.stderr)
+
+    counts = generate(users=args.users, trips=args.trips, bookings_per_trip=args.bookings_per_trip,
+                      expenses_per_trip=args.expenses_per_trip, seed=args.seed, batch_size=args.batch_size,
+                      password=args.password, days=args.days, until=args.until, progress=progress)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(file=sys.stderr)
+    print(f"Generated {counts['users']:,} users, {counts['trips']:,} trips, {counts['bookings']:,} bookings, "
+          f"{counts['expenses']:,} expenses in {elapsed:.1f}s ({total / elapsed:,.0f} rows/sec)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,86 @@
+import argparse
+import sys
+import time
 from database import create_tables
-from models import Trip
-from service import add_trip, view_trips, update_trip_budget, delete_trip,add_expense, view_expenses
-
-create_tables()
-
-while True:
-    print("\n--- Trip Management System ---")
-    print("1. Add Trip")
-    print("2. View Trips")
-    print("3. Update Trip Budget")
-    print("4. Delete Trip")
-    print("5. Add Expense")
-    print("6. View Expenses")
-    print("7. Exit")
-
-    choice = input("Enter choice: ")
-
-    if choice == "1":
-        dest = input("Destination: ")
-        start = input("Start Date: ")
-        end = input("End Date: ")
-        budget = float(input("Budget: "))
-        trip = Trip(dest, start, end, budget)
-        add_trip(trip)
-
-    elif choice == "2":
-        view_trips()
-
-    elif choice == "3":
-        trip_id = int(input("Trip ID: "))
-        budget = float(input("New Budget: "))
-        update_trip_budget(trip_id, budget)
-
-    elif choice == "4":
-        trip_id = int(input("Trip ID: "))
-        delete_trip(trip_id)
-
-    elif choice == "5":
-        trip_id = int(input("Trip ID: "))
-        category = input("Expense Category: ")
-        amount = float(input("Amount: "))
-        expense = Expense(trip_id, category, amount)
-        add_expense(expense)
-
-    elif choice == "6":
-        trip_id = int(input("Trip ID: "))
-        view_expenses(trip_id)
-
-    elif choice == "7":
-        print("Exiting...")
-        break
+from service import (add_trip, view_trips, update_trip_budget, delete_trip, add_expense, view_expenses,
+                     run_batch, TripRecord, ExpenseRecord)
 
+def interactive():
+    while True:
+        print("\n--- Trip Management System ---")
+        print("1. Add Trip")
+        print("2. View Trips")
+        print("3. Update Trip Budget")
+        print("4. Delete Trip")
+        print("5. Add Expense")
+        print("6. View Expenses")
+        print("7. Exit")
+
+        choice = input("Enter choice: ")
+
+        if choice == "1":
+            dest = input("Destination: ")
+            start = input("Start Date: ")
+            end = input("End Date: ")
+            budget = float(input("Budget: "))
+            trip = TripRecord(dest, start, end, budget)
+            add_trip(trip)
+
+        elif choice == "2":
+            view_trips()
+
+        elif choice == "3":
+            trip_id = int(input("Trip ID: "))
+            budget = float(input("New Budget: "))
+            update_trip_budget(trip_id, budget)
+
+        elif choice == "4":
+            trip_id = int(input("Trip ID: "))
+            delete_trip(trip_id)
+
+        elif choice == "5":
+            trip_id = int(input("Trip ID: "))
+            category = input("Expense Category: ")
+            amount = float(input("Amount: "))
+            expense = ExpenseRecord(trip_id, category, amount)
+            add_expense(expense)
+
+        elif choice == "6":
+            trip_id = int(input("Trip ID: "))
+            view_expenses(trip_id)
+
+        elif choice == "7":
+            print("Exiting...")
+            break
+
+        else:
+            print("Invalid choice")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Trip Management System console.",
+        epilog="Batch commands, one per line: add_trip DEST START END BUDGET | view_trips | "
+               "update_trip_budget TRIP_ID BUDGET | delete_trip TRIP_ID | add_expense TRIP_ID CATEGORY AMOUNT | "
+               "view_expenses TRIP_ID (or the menu numbers 1-6). Quote arguments with spaces; # starts a comment.")
+    parser.add_argument("--batch", metavar="FILE", help="run commands from FILE ('-' for stdin) instead of the menu")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="writes per transaction in batch mode")
+    parser.add_argument("--stop-on-error", action="store_true", help="stop at the first bad command")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    if not args.batch:
+        interactive()
+        return 0
+
+    start = time.perf_counter()
+    if args.batch == "-":
+        result = run_batch(sys.stdin, args.chunk_size, stop_on_error=args.stop_on_error)
     else:
-        print("Invalid choice")
+        with open(args.batch, encoding="utf-8") as f:
+            result = run_batch(f, args.chunk_size, stop_on_error=args.stop_on_error)
+    print(f"{result.commands} commands, {result.changed} rows changed, {result.missed} matched nothing, "
+          f"{result.errors} errors in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 1 if result.errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
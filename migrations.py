@@ -0,0 +1,261 @@
+"""Versioned, in-place schema upgrades for trip.db.
+
+`Base.metadata.create_all` only creates missing tables, so anything added to an
+existing table (indexes, columns) ships here as a numbered migration. Each
+migration may list EXPLAIN QUERY PLAN checks proving that the hot query it was
+written for actually uses the new index.
+
+    python migrations.py            # upgrade to the latest version
+    python migrations.py --status   # show applied/pending migrations
+"""
+import argparse
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Tuple, Union
+
+from sqlalchemy import text
+
+import trip_stats
+from database import get_engine
+
+class MigrationError(Exception):
+    pass
+
+def add_column(table: str, column: str, ddl: str) -> Callable:
+    """ALTER TABLE ADD COLUMN, skipped when create_all already built the table with the column."""
+    def run(conn):
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return run
+
+def rebuild_seat_holds_autoincrement(conn):
+    """Recreate seat_holds with AUTOINCREMENT so deleted hold ids are not reused (models.SeatHold)."""
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'seat_holds'")).scalar()
+    if "AUTOINCREMENT" in ddl.upper():
+        return
+    conn.execute(text("ALTER TABLE seat_holds RENAME TO seat_holds_old"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_seat_holds_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_seat_holds_expires_at"))
+    conn.execute(text("""
+    CREATE TABLE seat_holds (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        trip_id INTEGER NOT NULL REFERENCES trips (id),
+        seats INTEGER NOT NULL,
+        expires_at DATETIME NOT NULL,
+        created_at DATETIME
+    )
+    """))
+    conn.execute(text("INSERT INTO seat_holds (id, trip_id, seats, expires_at, created_at) "
+                      "SELECT id, trip_id, seats, expires_at, created_at FROM seat_holds_old"))
+    conn.execute(text("DROP TABLE seat_holds_old"))
+    conn.execute(text("CREATE INDEX ix_seat_holds_id ON seat_holds (id)"))
+    conn.execute(text("CREATE INDEX ix_seat_holds_expires_at ON seat_holds (expires_at)"))
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    # SQL strings, or callables taking the connection for steps that need to inspect the schema
+    statements: List[Union[str, Callable]]
+    # (query, index that EXPLAIN QUERY PLAN must mention)
+    checks: List[Tuple[str, str]] = []
+
+MIGRATIONS = [
+    Migration(1, "indexes for booking, expense and agent listings", [
+        "CREATE INDEX IF NOT EXISTS ix_bookings_trip_created ON bookings (trip_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_bookings_user_created ON bookings (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_bookings_created ON bookings (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_expenses_trip_created ON expenses (trip_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_expenses_booking_created ON expenses (booking_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_users_role_approved_created ON users (role, agent_approved, created_at)",
+    ], [
+        ("SELECT * FROM bookings WHERE trip_id = 1 ORDER BY created_at DESC", "ix_bookings_trip_created"),
+        ("SELECT * FROM bookings WHERE user_id = 1 ORDER BY created_at DESC", "ix_bookings_user_created"),
+        ("SELECT * FROM bookings ORDER BY created_at DESC", "ix_bookings_created"),
+        ("SELECT * FROM expenses WHERE trip_id = 1 ORDER BY created_at DESC", "ix_expenses_trip_created"),
+        ("SELECT * FROM expenses WHERE booking_id = 1 ORDER BY created_at DESC", "ix_expenses_booking_created"),
+        ("SELECT * FROM users WHERE role = 'agent' AND agent_approved = 0 ORDER BY created_at", "ix_users_role_approved_created"),
+    ]),
+    Migration(2, "trip seat inventory and checkout holds", [
+        add_column("trips", "capacity", "INTEGER"),
+        add_column("trips", "seats_taken", "INTEGER NOT NULL DEFAULT 0"),
+        "UPDATE trips SET seats_taken = COALESCE((SELECT SUM(seats) FROM bookings WHERE bookings.trip_id = trips.id), 0)",
+        "CREATE INDEX IF NOT EXISTS ix_seat_holds_expires_at ON seat_holds (expires_at)",
+    ], [
+        ("SELECT id FROM seat_holds WHERE expires_at < '2026-01-01'", "ix_seat_holds_expires_at"),
+    ]),
+    Migration(3, "catalogue version stamp", [
+        "INSERT OR IGNORE INTO catalogue_version (id, version, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)",
+    ]),
+    Migration(4, "notification outbox", [
+        "CREATE INDEX IF NOT EXISTS ix_outbox_status_next ON outbox (status, next_attempt_at)",
+    ], [
+        ("SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= '2026-01-01' ORDER BY next_attempt_at",
+         "ix_outbox_status_next"),
+    ]),
+    # rowid = trips.id; kept in sync by TripService and bulk imports (services.fts_index)
+    Migration(5, "full-text trip search", [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS trips_fts USING fts5(title, destination, description, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        "DELETE FROM trips_fts",
+        "INSERT INTO trips_fts (rowid, title, destination, description) "
+        "SELECT id, title, destination, description FROM trips",
+    ], [
+        ("SELECT rowid FROM trips_fts WHERE trips_fts MATCH 'bali'", "VIRTUAL TABLE INDEX"),
+    ]),
+    # profitability reports group by trip over a created_at range; carrying seats/amount in the
+    # index makes those scans index-only. Supersedes the two-column indexes from migration 1.
+    Migration(6, "covering indexes for profitability reports", [
+        "CREATE INDEX IF NOT EXISTS ix_bookings_trip_created_seats ON bookings (trip_id, created_at, seats)",
+        "CREATE INDEX IF NOT EXISTS ix_expenses_trip_created_amount ON expenses (trip_id, created_at, amount)",
+        "DROP INDEX IF EXISTS ix_bookings_trip_created",
+        "DROP INDEX IF EXISTS ix_expenses_trip_created",
+    ], [
+        ("SELECT trip_id, COUNT(id), SUM(seats) FROM bookings WHERE created_at >= '2026-01-01' GROUP BY trip_id",
+         "COVERING INDEX ix_bookings_trip_created_seats"),
+        ("SELECT trip_id, SUM(amount) FROM expenses WHERE trip_id IS NOT NULL GROUP BY trip_id",
+         "COVERING INDEX ix_expenses_trip_created_amount"),
+        ("SELECT * FROM bookings WHERE trip_id = 1 ORDER BY created_at DESC", "ix_bookings_trip_created_seats"),
+    ]),
+    # table itself comes from create_all (models.TripStats); fill it from existing bookings/expenses
+    Migration(7, "trip_stats dashboard read model", [trip_stats.rebuild]),
+    # tables of the legacy console tool (main.py / service.py), which used to be created on every app start
+    Migration(8, "legacy console tables", [
+        """
+        CREATE TABLE IF NOT EXISTS User (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            role TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Trip (
+            trip_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destination TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            budget REAL,
+            agent_id INTEGER,
+            FOREIGN KEY(agent_id) REFERENCES User(user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Package (
+            package_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id INTEGER,
+            name TEXT,
+            price REAL,
+            description TEXT,
+            FOREIGN KEY(trip_id) REFERENCES Trip(trip_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Booking (
+            booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            package_id INTEGER,
+            status TEXT,
+            FOREIGN KEY(user_id) REFERENCES User(user_id),
+            FOREIGN KEY(package_id) REFERENCES Package(package_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Wishlist (
+            wishlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            package_id INTEGER,
+            FOREIGN KEY(user_id) REFERENCES User(user_id),
+            FOREIGN KEY(package_id) REFERENCES Package(package_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Expense (
+            expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id INTEGER,
+            description TEXT,
+            amount REAL,
+            FOREIGN KEY(trip_id) REFERENCES Trip(trip_id)
+        )
+        """,
+    ]),
+    # an expired hold's id could be handed to the next checkout, letting the late payer confirm the new hold
+    Migration(9, "never reuse seat hold ids", [rebuild_seat_holds_autoincrement], [
+        ("SELECT id FROM seat_holds WHERE expires_at < '2026-01-01'", "ix_seat_holds_expires_at"),
+    ]),
+    # search-as-you-type matches the last word as a prefix; FTS5 answers prefixes of an indexed length
+    # from the prefix index and otherwise merges the whole doclist ("temples*": ~9 ms on 500k trips)
+    Migration(10, "prefix index for search prefixes up to 8 characters", [
+        "DROP TABLE IF EXISTS trips_fts",
+        "CREATE VIRTUAL TABLE trips_fts USING fts5(title, destination, description, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8')",
+        "INSERT INTO trips_fts (rowid, title, destination, description) "
+        "SELECT id, title, destination, description FROM trips",
+    ], [
+        ("SELECT rowid FROM trips_fts WHERE trips_fts MATCH 'templ*'", "VIRTUAL TABLE INDEX"),
+    ]),
+]
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT
+    )
+    """))
+
+def current_version(conn) -> int:
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def explain(conn, query: str) -> str:
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + query)).fetchall()
+    return "\n".join(str(r[-1]) for r in rows)
+
+def verify(conn, migration: Migration):
+    for query, index in migration.checks:
+        plan = explain(conn, query)
+        if index not in plan:
+            raise MigrationError(f"migration {migration.version}: {index} not used by {query!r}\n{plan}")
+
+def upgrade(bind=None, target: int = None) -> int:
+    """Apply pending migrations, each in its own transaction. Returns the resulting version."""
+    bind = bind or get_engine()
+    target = target if target is not None else MIGRATIONS[-1].version
+    with bind.begin() as conn:
+        version = current_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= version or migration.version > target:
+            continue
+        with bind.begin() as conn:
+            for stmt in migration.statements:
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    conn.execute(text(stmt))
+            verify(conn, migration)
+            conn.execute(text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                         {"v": migration.version, "n": migration.name, "t": datetime.utcnow().isoformat()})
+        version = migration.version
+        print(f"Applied migration {migration.version}: {migration.name}")
+    return version
+
+def status(bind=None):
+    bind = bind or get_engine()
+    with bind.begin() as conn:
+        version = current_version(conn)
+    for m in MIGRATIONS:
+        print(f"{m.version:>4}  {'applied' if m.version <= version else 'pending':<8} {m.name}")
+
+if __name__ == "__main__":
+    import models  # noqa: F401
+    from database import Base
+
+    parser = argparse.ArgumentParser(description="Upgrade the database schema in place.")
+    parser.add_argument("--status", action="store_true", help="show migration status and exit")
+    parser.add_argument("--target", type=int, help="stop at this version")
+    args = parser.parse_args()
+    if args.status:
+        status()
+    else:
+        Base.metadata.create_all(bind=get_engine())
+        print(f"Schema at version {upgrade(target=args.target)}")
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 from database import Base
 
 class BaseRecord:
@@ -24,11 +24,16 @@ class User(Base, BaseRecord):
     agent_approved = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # indexes are also shipped as migrations (migrations.py) for existing databases
+    __table_args__ = (
+        Index("ix_users_role_approved_created", "role", "agent_approved", "created_at"),
+    )
+
     def set_password(self, raw: str):
-        self.password_hash = generate_password_hash(raw)
+        self.password_hash = hasher.hash(raw)
 
     def check_password(self, raw: str) -> bool:
-        return check_password_hash(self.password_hash, raw)
+        return hasher.verify(self.password_hash, raw)
 
 class Trip(Base, BaseRecord):
     __tablename__ = "trips"
@@ -38,13 +43,23 @@ class Trip(Base, BaseRecord):
     date = Column(String(50), nullable=True)
     description = Column(Text, nullable=True)
     price = Column(Float, nullable=True)
+    capacity = Column(Integer, nullable=True)  # None = unlimited
+    # seats held at checkout plus seats booked; only changed by conditional UPDATEs in BookingService
+    seats_taken = Column(Integer, nullable=False, default=0, server_default="0")
 
     bookings = relationship("Booking", back_populates="trip", cascade="all, delete-orphan")
     expenses = relationship("Expense", back_populates="trip", cascade="all, delete-orphan")
+    seat_holds = relationship("SeatHold", back_populates="trip", cascade="all, delete-orphan")
 
     def summary(self):
         return f"{self.title} — {self.destination or 'TBA'}"
 
+    @property
+    def seats_remaining(self):
+        if self.capacity is None:
+            return None
+        return max(self.capacity - (self.seats_taken or 0), 0)
+
 class Booking(Base, BaseRecord):
     __tablename__ = "bookings"
     id = Column(Integer, primary_key=True, index=True)
@@ -55,6 +70,12 @@ class Booking(Base, BaseRecord):
     contact = Column(String(200), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_bookings_trip_created_seats", "trip_id", "created_at", "seats"),
+        Index("ix_bookings_user_created", "user_id", "created_at"),
+        Index("ix_bookings_created", "created_at"),
+    )
+
     trip = relationship("Trip", back_populates="bookings")
     user = relationship("User", backref="bookings")
     expenses = relationship("Expense", back_populates="booking", cascade="all, delete-orphan")
@@ -74,5 +95,59 @@ class Expense(Base, BaseRecord):
     note = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_expenses_trip_created_amount", "trip_id", "created_at", "amount"),
+        Index("ix_expenses_booking_created", "booking_id", "created_at"),
+    )
+
     trip = relationship("Trip", back_populates="expenses")
     booking = relationship("Booking", back_populates="expenses")
+
+class SeatHold(Base, BaseRecord):
+    """Seats reserved between checkout and payment; released if not confirmed before expires_at."""
+    __tablename__ = "seat_holds"
+    # checkout confirms a hold by id, so an id must never come back for a later hold (migration 9)
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True, index=True)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    seats = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    trip = relationship("Trip", back_populates="seat_holds")
+
+class TripStats(Base, BaseRecord):
+    """Denormalized per-trip totals for dashboards; maintained by trip_stats.py in the writing transaction."""
+    __tablename__ = "trip_stats"
+    trip_id = Column(Integer, ForeignKey("trips.id"), primary_key=True)
+    booking_count = Column(Integer, nullable=False, default=0)
+    seats_sold = Column(Integer, nullable=False, default=0)
+    gross_revenue = Column(Float, nullable=False, default=0.0)  # seats_sold x current trip price
+    expense_total = Column(Float, nullable=False, default=0.0)
+    last_booking_at = Column(DateTime, nullable=True)
+
+class CatalogueVersion(Base):
+    """Single row (id=1) bumped in the same transaction as any change to trip data; drives API ETags."""
+    __tablename__ = "catalogue_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxMessage(Base, BaseRecord):
+    """Email queued in the same transaction as the change it reports; delivered by notifications.OutboxWorker."""
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # agent_approved | agent_rejected | booking_confirmed
+    recipient = Column(String(200), nullable=False)
+    subject = Column(String(200), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending | sent | failed | skipped
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_status_next", "status", "next_attempt_at"),
+    )
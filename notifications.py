@@ -1,32 +1,204 @@
+"""Email notifications via a transactional outbox.
+
+Services call enqueue() on their own session, so a message is committed (or
+rolled back) together with the change it reports and nothing touches SMTP on
+the request thread. OutboxWorker drains due messages in batches over one
+reused SMTP connection, retrying failures with exponential backoff.
+
+Configure SMTP via env vars: SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS, FROM_EMAIL,
+SMTP_STARTTLS (default 1). Without SMTP_SERVER messages are printed to the console
+and recorded as "skipped" rather than "sent".
+
+    python notifications.py          # run the delivery worker in the foreground
+    python notifications.py --once   # deliver what is due now and exit
+"""
 import os
 import smtplib
+import threading
+from datetime import datetime, timedelta
 from email.message import EmailMessage
+from typing import Optional
+
+from sqlalchemy import insert, update
+
+from database import SessionLocal
+from models import OutboxMessage
+
+BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "50"))
+MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = float(os.environ.get("OUTBOX_BACKOFF", "30"))  # seconds; doubles per attempt
+BACKOFF_MAX = 3600.0
+LEASE = 300  # seconds a claimed message stays invisible to other workers
+POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "5"))
 
-def notify_agent_approval(user, approved: bool):
+def enqueue(db, kind: str, recipient: str, subject: str, body: str) -> OutboxMessage:
+    """Add a message to the caller's session; it is sent only if that transaction commits."""
+    msg = OutboxMessage(kind=kind, recipient=recipient, subject=subject, body=body,
+                        next_attempt_at=datetime.utcnow())
+    db.add(msg)
+    return msg
+
+def _agent_approval_message(user, approved: bool) -> dict:
+    subject = "Agent account " + ("approved" if approved else "rejected")
+    body = f"Hello {user.username},\n\nYour agent account has been {'approved' if approved else 'rejected'}.\n\nThanks,\nTrip Management System"
+    return {"kind": "agent_approved" if approved else "agent_rejected",
+            "recipient": getattr(user, "email", None) or user.username, "subject": subject, "body": body}
+
+def notify_agent_approval(db, user, approved: bool) -> OutboxMessage:
     """
-    Notify agent by email (if SMTP configured) or print to console.
+    Queue the approval/rejection email for an agent.
     Expects user to have .username and optionally .email attribute (not required).
-    Configure SMTP via env vars: SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS, FROM_EMAIL
     """
-    subject = "Agent account " + ("approved" if approved else "rejected")
-    body = f"Hello {user.username},\n\nYour agent account has been {'approved' if approved else 'rejected'}.\n\nThanks,\nTrip Management System"
-    print(f"[notify] {subject} -> {user.username}")
-    # attempt email if env configured
-    server = os.environ.get("SMTP_SERVER")
-    if not server:
-        print("SMTP not configured; skipping email send.")
-        return
-    try:
-        port = int(os.environ.get("SMTP_PORT", "587"))
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = os.environ.get("FROM_EMAIL", "noreply@example.com")
-        msg["To"] = getattr(user, "email", user.username)
-        msg.set_content(body)
-        with smtplib.SMTP(server, port) as smtp:
-            smtp.starttls()
-            smtp.login(os.environ.get("SMTP_USER"), os.environ.get("SMTP_PASS"))
-            smtp.send_message(msg)
-        print("Email notification sent.")
-    except Exception as e:
-        print("Failed to send email:", e)
\ No newline at end of file
+    return enqueue(db, **_agent_approval_message(user, approved))
+
+def notify_agent_approvals(db, users, approved: bool) -> int:
+    """notify_agent_approval for many agents with one INSERT (bulk approve/reject)."""
+    now = datetime.utcnow()
+    rows = [{**_agent_approval_message(u, approved), "status": "pending", "attempts": 0,
+             "next_attempt_at": now, "created_at": now} for u in users]
+    if rows:
+        db.execute(insert(OutboxMessage), rows)
+    return len(rows)
+
+def notify_booking_confirmation(db, booking, trip) -> Optional[OutboxMessage]:
+    """Queue a confirmation to the booking contact, if it is an email address."""
+    if not booking.contact or "@" not in booking.contact:
+        return None
+    subject = f"Booking confirmed: {trip.title}"
+    body = (f"Hello {booking.customer_name},\n\nYour booking for {trip.title} "
+            f"({trip.destination or 'TBA'}, {trip.date or 'date TBA'}) is confirmed for {booking.seats} seat(s).\n\n"
+            f"Thanks,\nTrip Management System")
+    return enqueue(db, "booking_confirmed", booking.contact, subject, body)
+
+class OutboxWorker:
+    """Delivers due outbox messages. Safe to run in several processes: each message is claimed
+    with a conditional UPDATE before sending, and a crashed claim becomes due again after LEASE."""
+    def __init__(self, session_factory=SessionLocal, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.server = os.environ.get("SMTP_SERVER")
+        self.port = int(os.environ.get("SMTP_PORT", "587"))
+        self.starttls = os.environ.get("SMTP_STARTTLS", "1") != "0"
+        self.from_email = os.environ.get("FROM_EMAIL", "noreply@example.com")
+        self._smtp = None
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+
+    # SMTP connection, opened lazily and reused until it breaks or the worker stops
+    def _connection(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.server, self.port, timeout=30)
+            if self.starttls:
+                smtp.starttls()
+            if os.environ.get("SMTP_USER"):
+                smtp.login(os.environ.get("SMTP_USER"), os.environ.get("SMTP_PASS"))
+            self._smtp = smtp
+        return self._smtp
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def _send(self, msg: OutboxMessage) -> str:
+        """Deliver msg; returns the status to record ("sent", or "skipped" without SMTP_SERVER)."""
+        if not self.server:
+            print(f"[notify] {msg.subject} -> {msg.recipient} (SMTP not configured; not emailed)")
+            return "skipped"
+        email = EmailMessage()
+        email["Subject"] = msg.subject
+        email["From"] = self.from_email
+        email["To"] = msg.recipient
+        email.set_content(msg.body)
+        try:
+            self._connection().send_message(email)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # stale pooled connection: reconnect once before counting it as a failure
+            self.close()
+            self._connection().send_message(email)
+        return "sent"
+
+    def _claim(self, db, msg_id: int, now: datetime) -> bool:
+        return db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == msg_id, OutboxMessage.status == "pending",
+                   OutboxMessage.next_attempt_at <= now)
+            .values(attempts=OutboxMessage.attempts + 1, next_attempt_at=now + timedelta(seconds=LEASE))
+            .execution_options(synchronize_session=False)).rowcount == 1
+
+    def run_once(self) -> int:
+        """Deliver one batch of due messages. Returns how many were processed."""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            due = (db.query(OutboxMessage.id)
+                   .filter(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+                   .order_by(OutboxMessage.next_attempt_at).limit(self.batch_size).all())
+            claimed = [row.id for row in due if self._claim(db, row.id, now)]
+            db.commit()
+            for msg in db.query(OutboxMessage).filter(OutboxMessage.id.in_(claimed)).order_by(OutboxMessage.id):
+                try:
+                    status = self._send(msg)
+                except Exception as e:
+                    self.close()
+                    msg.last_error = str(e)[:1000]
+                    if msg.attempts >= MAX_ATTEMPTS:
+                        msg.status = "failed"
+                        self.failed += 1
+                    else:
+                        delay = min(BACKOFF_BASE * 2 ** (msg.attempts - 1), BACKOFF_MAX)
+                        msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                else:
+                    msg.status = status
+                    if status == "sent":
+                        msg.sent_at = datetime.utcnow()
+                        msg.last_error = None
+                        self.sent += 1
+                    else:
+                        # recorded with the reason instead of passing for delivered
+                        msg.last_error = "SMTP not configured"
+                        self.skipped += 1
+                db.commit()
+        return len(claimed)
+
+    def run_forever(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    processed = self.run_once()
+                except Exception as e:
+                    print("Outbox worker error:", e)
+                    processed = 0
+                if processed < self.batch_size:
+                    # drained: drop the SMTP connection while idle
+                    self.close()
+                    stop.wait(POLL_INTERVAL)
+        finally:
+            self.close()
+
+def start_worker() -> threading.Event:
+    """Run an OutboxWorker on a daemon thread; set the returned event to stop it."""
+    stop = threading.Event()
+    threading.Thread(target=OutboxWorker().run_forever, args=(stop,), name="outbox-worker", daemon=True).start()
+    return stop
+
+if __name__ == "__main__":
+    import argparse
+    from database import create_tables
+
+    parser = argparse.ArgumentParser(description="Deliver queued email notifications.")
+    parser.add_argument("--once", action="store_true", help="deliver due messages and exit")
+    args = parser.parse_args()
+    create_tables()
+    worker = OutboxWorker()
+    if args.once:
+        while worker.run_once():
+            pass
+        worker.close()
+        print(f"Sent {worker.sent}, failed {worker.failed}, skipped {worker.skipped}")
+    else:
+        worker.run_forever()
@@ -0,0 +1,120 @@
+"""Password hashing off the request threads.
+
+Hashing and verification run on a small bounded pool, so a burst of logins or
+signups uses at most PASSWORD_HASH_WORKERS cores and can't starve everything
+else. At most PASSWORD_HASH_QUEUE jobs are in flight. Callers wait up to
+PASSWORD_HASH_TIMEOUT seconds for a slot, then HashingBusy is raised.
+
+PASSWORD_HASH_POOL picks the pool:
+- "process" (default): hashing runs in separate processes, so it never holds
+  the request processes' GIL. They are started with "spawn", which re-imports
+  the launching script; app.py, main.py and the scripts and benchmarks that
+  hash passwords are import-safe (gunicorn/flask launchers always are).
+- "thread": scrypt and pbkdf2 release the GIL, so threads hash in parallel.
+  Use it when the launching script can't be re-imported.
+- "inline": hash on the calling thread.
+
+`python -m benchmarks.logins` measures whole POST /login requests per pool.
+On 1 CPU with scrypt (8 s per setting):
+
+    pool     threads  logins/s      p50       p95
+    thread         1       6.6    144 ms    200 ms
+    thread         8       7.2    671 ms   3161 ms
+    process        1       7.2    141 ms    168 ms
+    process        8       7.9    661 ms   2424 ms
+
+Throughput is bound by scrypt either way; the process pool was no slower and
+had the lower p95 under a burst, and it isolates hashing from the request
+process entirely, as the pool was meant to.
+
+PASSWORD_HASH_WORKERS defaults to the CPU count.
+
+PASSWORD_HASH_METHOD is any werkzeug method string, e.g. "scrypt" (default),
+"scrypt:65536:8:1" or "pbkdf2:sha256:600000". Hashes made with other
+parameters still verify and are rewritten on the next successful login.
+
+Pool processes import this module, so keep it free of app and database imports.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class HashingBusy(RuntimeError):
+    """Every hashing slot stayed busy for longer than the timeout."""
+
+def _hash(raw: str, method: str) -> str:
+    return generate_password_hash(raw, method=method)
+
+def _verify(pwhash: str, raw: str) -> bool:
+    return check_password_hash(pwhash, raw)
+
+class PasswordHasher:
+    def __init__(self, method: str = "scrypt", pool: str = "process", workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, timeout: float = 10.0):
+        if pool not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown password hashing pool: {pool!r}")
+        self.method = method
+        self.pool = pool
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, self.workers) * 4)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        workers = os.environ.get("PASSWORD_HASH_WORKERS")
+        pending = os.environ.get("PASSWORD_HASH_QUEUE")
+        return cls(method=os.environ.get("PASSWORD_HASH_METHOD", "scrypt"),
+                   pool=os.environ.get("PASSWORD_HASH_POOL", "process"),
+                   workers=int(workers) if workers is not None else None,
+                   max_pending=int(pending) if pending else None,
+                   timeout=float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10")))
+
+    def _call(self, fn, *args):
+        if self.pool == "inline" or self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy("password hashing is saturated; try again shortly")
+        try:
+            if self._pool is None:
+                with self._lock:
+                    if self._pool is None:
+                        self._pool = self._make_pool()
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _make_pool(self):
+        if self.pool == "process":
+            # spawn, not fork: the app process has live threads and database connections
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+
+    def hash(self, raw: str) -> str:
+        return self._call(_hash, raw, self.method)
+
+    def verify(self, pwhash: str, raw: str) -> bool:
+        return self._call(_verify, pwhash, raw)
+
+    @property
+    def current_prefix(self) -> str:
+        """The "method:params" part werkzeug writes for the configured method (e.g. "scrypt:32768:8:1")."""
+        if self._prefix is None:
+            self._prefix = _hash("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        return pwhash.split("$", 1)[0] != self.current_prefix
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+hasher = PasswordHasher.from_env()
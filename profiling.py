@@ -0,0 +1,190 @@
+"""Opt-in request profiling and SQL instrumentation.
+
+Every request is timed end to end and broken into time spent in SQL (engine
+cursor events) and in template rendering (Flask's render signals); the number
+of statements it ran is recorded too. Per-endpoint counters and histograms are
+rendered in the Prometheus text format for the admin-only /metrics route.
+Statements slower than PROFILE_SLOW_QUERY_MS are logged with their SQL and kept
+as recent samples.
+
+Enable with PROFILING=1. PROFILE_SLOW_QUERY_MS (default 100) sets the slow-query
+threshold and PROFILE_SLOW_SAMPLES (default 50) how many samples are kept.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import Flask, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+log = logging.getLogger("trip.profiling")
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.labels, values)} {total:g}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def totals(self, *label_values) -> Tuple[int, float]:
+        """(observation count, sum) for one label set."""
+        with self._lock:
+            series = self._series.get(label_values)
+            return (series[-2], series[-1]) if series else (0, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labels + ("le",)
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                for bound, n in zip(self.buckets, series):
+                    yield f"{self.name}_bucket{_labels(names, values + (f'{bound:g}',))} {n}"
+                yield f"{self.name}_bucket{_labels(names, values + ('+Inf',))} {series[-2]}"
+                yield f"{self.name}_sum{_labels(self.labels, values)} {series[-1]:g}"
+                yield f"{self.name}_count{_labels(self.labels, values)} {series[-2]}"
+
+class RequestProfiler:
+    """Hooks a Flask app and one or more engines; call render() for the /metrics body."""
+    def __init__(self, app: Optional[Flask] = None, binds: Iterable = (), slow_query_ms: Optional[float] = None,
+                 slow_samples: Optional[int] = None):
+        self.slow_query_seconds = (slow_query_ms if slow_query_ms is not None
+                                   else float(os.environ.get("PROFILE_SLOW_QUERY_MS", "100"))) / 1000
+        self.slow_queries = deque(maxlen=slow_samples or int(os.environ.get("PROFILE_SLOW_SAMPLES", "50")))
+        by_endpoint = ("endpoint",)
+        self.requests = Counter("trip_http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status"))
+        self.request_seconds = Histogram("trip_http_request_duration_seconds",
+                                         "Total time to produce a response.", by_endpoint)
+        self.db_seconds = Histogram("trip_http_db_duration_seconds",
+                                    "Time spent executing SQL per request.", by_endpoint)
+        self.template_seconds = Histogram("trip_http_template_duration_seconds",
+                                          "Time spent rendering templates per request.", by_endpoint)
+        self.queries = Histogram("trip_http_queries_per_request", "SQL statements executed per request.",
+                                 by_endpoint, buckets=QUERY_COUNT_BUCKETS)
+        self.slow_total = Counter("trip_db_slow_queries_total", "Statements slower than the slow-query threshold.")
+        self.collectors = [self.requests, self.request_seconds, self.db_seconds, self.template_seconds,
+                           self.queries, self.slow_total]
+        for bind in binds:
+            self.instrument_engine(bind)
+        if app is not None:
+            self.init_app(app)
+
+    # --- SQL
+
+    def instrument_engine(self, bind):
+        event.listen(bind, "before_cursor_execute", self._before_execute)
+        event.listen(bind, "after_cursor_execute", self._after_execute)
+
+    # the start time lives on the statement's execution context, which is dropped with the statement
+    # whether it completes or raises; a per-connection stack leaked an entry for every failed statement
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:  # None for a few internal cursor executions, which aren't timed
+            context._profile_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_profile_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        profile = g.get("profile") if has_request_context() else None
+        if profile is not None:
+            profile["db"] += elapsed
+            profile["queries"] += 1
+        if elapsed >= self.slow_query_seconds:
+            endpoint = request.endpoint if has_request_context() else None
+            self.slow_total.inc()
+            self.slow_queries.append({"at": time.time(), "ms": round(elapsed * 1000, 1), "endpoint": endpoint,
+                                      "sql": statement, "executemany": executemany})
+            log.warning("slow query %.1f ms (%s): %s", elapsed * 1000, endpoint or "-", " ".join(statement.split()))
+
+    # --- requests and templates
+
+    def init_app(self, app: Flask):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def _start_request(self):
+        g.profile = {"start": time.perf_counter(), "db": 0.0, "queries": 0, "template": 0.0, "render_start": []}
+
+    def _before_render(self, sender, template, context, **extra):
+        profile = g.get("profile")
+        if profile is not None:
+            profile["render_start"].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        profile = g.get("profile")
+        if profile is not None and profile["render_start"]:
+            profile["template"] += time.perf_counter() - profile["render_start"].pop()
+
+    def _finish_request(self, response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            # streamed bodies are produced after this point; their time isn't included
+            endpoint = request.endpoint or "unmatched"
+            self.requests.inc(endpoint, request.method, response.status_code)
+            self.request_seconds.observe(time.perf_counter() - profile["start"], endpoint)
+            self.db_seconds.observe(profile["db"], endpoint)
+            self.template_seconds.observe(profile["template"], endpoint)
+            self.queries.observe(profile["queries"], endpoint)
+        return response
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        return render(self.collectors, extra)
+
+def render(collectors: Iterable, extra: Iterable[str] = ()) -> str:
+    """Prometheus text exposition for these counters/histograms plus pre-rendered lines."""
+    lines = []
+    for collector in collectors:
+        lines.extend(collector.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+def gauge(name: str, help: str, value: float) -> Iterable[str]:
+    """Prometheus lines for a one-off gauge sampled at scrape time."""
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} gauge"
+    yield f"{name} {value:g}"
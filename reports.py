@@ -0,0 +1,91 @@
+"""Per-trip profitability: revenue (seats x price), expenses, margin and booking counts.
+
+Everything is computed in SQL with grouped subqueries, one statement per report,
+instead of walking Trip.bookings / Trip.expenses in Python.
+"""
+from datetime import date, datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, select, or_
+
+from models import Trip, Booking, Expense
+from services import ServiceBase
+
+class TripProfit(NamedTuple):
+    trip_id: int
+    title: str
+    price: Optional[float]
+    bookings: int
+    seats: int
+    revenue: float
+    expenses: float
+    margin: float
+
+    def to_dict(self):
+        return self._asdict()
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+class ReportService(ServiceBase):
+    SORTS = ("margin", "revenue", "expenses", "bookings")
+    MAX_LIMIT = 500
+
+    def _period(self, column, start: Optional[date], end: Optional[date]):
+        """created_at within [start, end] (whole days, end inclusive)."""
+        conditions = []
+        if start:
+            conditions.append(column >= datetime.combine(start, datetime.min.time()))
+        if end:
+            conditions.append(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        return conditions
+
+    def _subqueries(self, start, end):
+        b = (select(Booking.trip_id.label("trip_id"),
+                    func.count(Booking.id).label("bookings"),
+                    func.sum(Booking.seats).label("seats"))
+             .where(*self._period(Booking.created_at, start, end))
+             .group_by(Booking.trip_id).subquery("b"))
+        e = (select(Expense.trip_id.label("trip_id"),
+                    func.sum(Expense.amount).label("total"))
+             .where(Expense.trip_id.isnot(None), *self._period(Expense.created_at, start, end))
+             .group_by(Expense.trip_id).subquery("e"))
+        bookings = func.coalesce(b.c.bookings, 0)
+        seats = func.coalesce(b.c.seats, 0)
+        revenue = seats * func.coalesce(Trip.price, 0.0)
+        expenses = func.coalesce(e.c.total, 0.0)
+        return b, e, bookings, seats, revenue, expenses
+
+    def trip_profitability(self, start: Optional[date] = None, end: Optional[date] = None,
+                           sort: str = "margin", limit: int = 100, offset: int = 0) -> List[TripProfit]:
+        """Trips with bookings or expenses in the period, best first by `sort`."""
+        b, e, bookings, seats, revenue, expenses = self._subqueries(start, end)
+        margin = revenue - expenses
+        order = {"margin": margin, "revenue": revenue, "expenses": expenses, "bookings": bookings}.get(sort, margin)
+        limit = max(1, min(limit or 100, self.MAX_LIMIT))
+        stmt = (select(Trip.id, Trip.title, Trip.price, bookings, seats, revenue, expenses, margin)
+                .select_from(Trip)
+                .outerjoin(b, b.c.trip_id == Trip.id)
+                .outerjoin(e, e.c.trip_id == Trip.id)
+                .where(or_(b.c.trip_id.isnot(None), e.c.trip_id.isnot(None)))
+                .order_by(order.desc(), Trip.id)
+                .limit(limit).offset(max(offset or 0, 0)))
+        return [TripProfit(*row) for row in self.db.execute(stmt)]
+
+    def totals(self, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+        """Period totals across all trips, without materialising per-trip rows."""
+        b, e, bookings, seats, revenue, expenses = self._subqueries(start, end)
+        stmt = (select(func.count(Trip.id), func.sum(bookings), func.sum(seats),
+                       func.sum(revenue), func.sum(expenses))
+                .select_from(Trip)
+                .outerjoin(b, b.c.trip_id == Trip.id)
+                .outerjoin(e, e.c.trip_id == Trip.id)
+                .where(or_(b.c.trip_id.isnot(None), e.c.trip_id.isnot(None))))
+        trips, n_bookings, n_seats, total_revenue, total_expenses = self.db.execute(stmt).one()
+        total_revenue = total_revenue or 0.0
+        total_expenses = total_expenses or 0.0
+        return {"trips": trips or 0, "bookings": n_bookings or 0, "seats": n_seats or 0,
+                "revenue": total_revenue, "expenses": total_expenses,
+                "margin": total_revenue - total_expenses}
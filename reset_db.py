@@ -3,11 +3,7 @@ from database import create_tables
 from services import TripService, BookingService, ExpenseService, AuthService
 
 DB_FILE = "trip.db"
-if os.path.exists(DB_FILE):
-    os.remove(DB_FILE)
-    print("Deleted existing trip.db")
 
-create_tables()
 trip_svc = TripService()
 booking_svc = BookingService()
 expense_svc = ExpenseService()
@@ -44,4 +40,8 @@ def seed():
     print("  Expenses: 3")
 
 if __name__ == "__main__":
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+        print("Deleted existing trip.db")
+    create_tables()
     seed()
\ No newline at end of file
@@ -1,8 +1,6 @@
 from database import create_tables
 from services import TripService, BookingService, ExpenseService, AuthService
 
-create_tables()
-
 trip_svc = TripService()
 booking_svc = BookingService()
 expense_svc = ExpenseService()
@@ -66,4 +64,5 @@ def seed():
     print("Run the app (python app.py) and open the UI to view the sample data.")
 
 if __name__ == "__main__":
+    create_tables()
     seed()
\ No newline at end of file
@@ -1,66 +1,141 @@
+import shlex
+import sys
+from typing import Iterable, NamedTuple
 from database import get_connection
-from models import Trip, Expense
 
-def add_trip(trip):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO Trip(destination, start_date, end_date, budget) VALUES (?, ?, ?, ?)",
-        (trip.destination, trip.start_date, trip.end_date, trip.budget)
-    )
-    conn.commit()
-    conn.close()
-    print("Trip added successfully")
+class TripRecord(NamedTuple):
+    destination: str
+    start_date: str
+    end_date: str
+    budget: float
 
-def view_trips():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Trip")
-    trips = cursor.fetchall()
-    conn.close()
+class ExpenseRecord(NamedTuple):
+    trip_id: int
+    category: str
+    amount: float
 
-    if not trips:
-        print("No trips found")
-    else:
-        for t in trips:
-            print(t)
+# Each function runs on `conn` when one is passed (batch mode: the caller owns the
+# transaction and commits in chunks); otherwise it opens, commits and closes its own.
 
-def update_trip_budget(trip_id, budget):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE Trip SET budget = ? WHERE trip_id = ?", (budget, trip_id))
-    conn.commit()
-    conn.close()
-    print("Trip updated successfully")
+def _run(conn, sql, params=()):
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        if own:
+            conn.commit()
+        return cursor.rowcount
+    finally:
+        if own:
+            conn.close()
 
-def delete_trip(trip_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM Trip WHERE trip_id = ?", (trip_id,))
-    conn.commit()
-    conn.close()
-    print("Trip deleted successfully")
+def add_trip(trip, conn=None, quiet=False):
+    _run(conn, "INSERT INTO Trip(destination, start_date, end_date, budget) VALUES (?, ?, ?, ?)",
+         (trip.destination, trip.start_date, trip.end_date, trip.budget))
+    if not quiet:
+        print("Trip added successfully")
+    return 1
 
-def add_expense(expense):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO Expense(trip_id, category, amount) VALUES (?, ?, ?)",
-        (expense.trip_id, expense.category, expense.amount)
-    )
-    conn.commit()
-    conn.close()
-    print("Expense added successfully")
+def _print_rows(conn, sql, params, empty_message, out):
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        # stream rows off the cursor instead of materialising them with fetchall()
+        found = False
+        for row in conn.execute(sql, params):
+            found = True
+            print(row, file=out)
+        if not found:
+            print(empty_message, file=out)
+    finally:
+        if own:
+            conn.close()
 
-def view_expenses(trip_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Expense WHERE trip_id = ?", (trip_id,))
-    expenses = cursor.fetchall()
-    conn.close()
+def view_trips(conn=None, out=None):
+    _print_rows(conn, "SELECT * FROM Trip", (), "No trips found", out or sys.stdout)
 
-    if not expenses:
-        print("No expenses found")
-    else:
-        for e in expenses:
-            print(e)
+def update_trip_budget(trip_id, budget, conn=None, quiet=False):
+    count = _run(conn, "UPDATE Trip SET budget = ? WHERE trip_id = ?", (budget, trip_id))
+    if not quiet:
+        print("Trip updated successfully" if count else "Trip not found")
+    return count
+
+def delete_trip(trip_id, conn=None, quiet=False):
+    count = _run(conn, "DELETE FROM Trip WHERE trip_id = ?", (trip_id,))
+    if not quiet:
+        print("Trip deleted successfully" if count else "Trip not found")
+    return count
+
+def add_expense(expense, conn=None, quiet=False):
+    # the legacy Expense table keeps the category in its description column
+    _run(conn, "INSERT INTO Expense(trip_id, description, amount) VALUES (?, ?, ?)",
+         (expense.trip_id, expense.category, expense.amount))
+    if not quiet:
+        print("Expense added successfully")
+    return 1
+
+def view_expenses(trip_id, conn=None, out=None):
+    _print_rows(conn, "SELECT * FROM Expense WHERE trip_id = ?", (trip_id,), "No expenses found", out or sys.stdout)
+
+# batch command -> (handler(conn, out, *args) returning rows changed or None for reads, argument count)
+# Menu numbers from the interactive tool work as aliases.
+COMMANDS = {
+    "add_trip": (lambda conn, out, dest, start, end, budget:
+                 add_trip(TripRecord(dest, start, end, float(budget)), conn, quiet=True), 4),
+    "view_trips": (lambda conn, out: view_trips(conn, out), 0),
+    "update_trip_budget": (lambda conn, out, trip_id, budget:
+                           update_trip_budget(int(trip_id), float(budget), conn, quiet=True), 2),
+    "delete_trip": (lambda conn, out, trip_id: delete_trip(int(trip_id), conn, quiet=True), 1),
+    "add_expense": (lambda conn, out, trip_id, category, amount:
+                    add_expense(ExpenseRecord(int(trip_id), category, float(amount)), conn, quiet=True), 3),
+    "view_expenses": (lambda conn, out, trip_id: view_expenses(int(trip_id), conn, out), 1),
+}
+for number, name in enumerate(list(COMMANDS), start=1):
+    COMMANDS[str(number)] = COMMANDS[name]
+
+class BatchResult(NamedTuple):
+    commands: int
+    changed: int
+    missed: int
+    errors: int
+
+def run_batch(lines: Iterable[str], chunk_size: int = 1000, out=None, err=None, stop_on_error: bool = False,
+              conn=None) -> BatchResult:
+    """Run CLI commands (one per line, shell-quoted arguments, `#` comments) over one connection,
+    committing every `chunk_size` writes. Updates/deletes that match no trip count as missed.
+    With stop_on_error the run ends at the first bad line; the commands before it are kept."""
+    out, err = out or sys.stdout, err or sys.stderr
+    own = conn is None
+    conn = conn or get_connection()
+    commands = changed = missed = errors = pending = 0
+    try:
+        for lineno, line in enumerate(lines, start=1):
+            try:
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                handler, nargs = COMMANDS.get(words[0], (None, None))
+                if handler is None:
+                    raise ValueError(f"unknown command {words[0]!r}")
+                if len(words) - 1 != nargs:
+                    raise ValueError(f"{words[0]} takes {nargs} argument(s), got {len(words) - 1}")
+                count = handler(conn, out, *words[1:])
+            except Exception as e:
+                errors += 1
+                print(f"line {lineno}: {e}", file=err)
+                if stop_on_error:
+                    break
+                continue
+            commands += 1
+            if count is not None:
+                changed += count
+                missed += count == 0
+                pending += 1
+                if pending >= chunk_size:
+                    conn.commit()
+                    pending = 0
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+    return BatchResult(commands, changed, missed, errors)
@@ -1,26 +1,146 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Trip, Booking, Expense, User
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import event, func, update, delete, or_, text
+from sqlalchemy.orm import Session, joinedload
+import notifications
+import trip_stats
+import writer
+from cache import page_cache
+from database import db_session
+from passwords import hasher
+from models import Trip, Booking, Expense, User, SeatHold, CatalogueVersion, TripStats
+
+def bump_catalogue_version(db):
+    """Mark trip data as changed; call on the session/connection doing the write so it commits with it.
+    A session with info["catalogue_changed"] set (batch.py) only records the change and bumps once itself."""
+    if "catalogue_changed" in db.info:
+        db.info["catalogue_changed"] = True
+        return
+    db.execute(update(CatalogueVersion).where(CatalogueVersion.id == 1)
+               .values(version=CatalogueVersion.version + 1, updated_at=datetime.utcnow())
+               .execution_options(synchronize_session=False))
+
+def touch_pages(db: Session, *tags: str):
+    """Queue rendered-page invalidation for these tags; it runs once the session commits."""
+    db.info.setdefault("page_tags", set()).update(tags)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_pages(session):
+    tags = session.info.pop("page_tags", None)
+    if tags:
+        page_cache.invalidate(*tags)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_page_tags(session):
+    session.info.pop("page_tags", None)
+
+def fts_index(db, *trip_ids: int):
+    """(Re)index trips in trips_fts from their current row; run inside the writing transaction."""
+    params = [{"id": i} for i in trip_ids]
+    db.execute(text("DELETE FROM trips_fts WHERE rowid = :id"), params)
+    db.execute(text("INSERT INTO trips_fts (rowid, title, destination, description) "
+                    "SELECT id, title, destination, description FROM trips WHERE id = :id"), params)
+
+def fts_index_after(db, last_id: int):
+    """Index trips inserted with ids above last_id (bulk imports)."""
+    db.execute(text("INSERT INTO trips_fts (rowid, title, destination, description) "
+                    "SELECT id, title, destination, description FROM trips WHERE id > :last_id"),
+               {"last_id": last_id})
+
+def fts_remove(db, trip_id: int):
+    db.execute(text("DELETE FROM trips_fts WHERE rowid = :id"), {"id": trip_id})
+
+def write_operation(method):
+    """Mark a service write. In write-queue mode (writer.py) a call on the request-scoped
+    session is handed to the writer thread and group-committed with other writes."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if writer.coordinator is None or self._db is not None:
+            return method(self, *args, **kwargs)
+        return writer.coordinator.run(lambda db: method(type(self)(db), *args, **kwargs))
+    return wrapper
 
 class ServiceBase:
+    """Services are stateless; each call runs on the caller's request-scoped session
+    unless an explicit session is passed in (scripts, tests)."""
     def __init__(self, db: Optional[Session] = None):
-        self.db = db or SessionLocal()
+        self._db = db
+
+    @property
+    def db(self) -> Session:
+        return self._db if self._db is not None else db_session()
+
+class Page(NamedTuple):
+    """One keyset page; cursors are the ids to pass back as after_id/before_id (None at the ends)."""
+    items: list
+    next_cursor: Optional[int]
+    prev_cursor: Optional[int]
+
+def keyset_page(q, id_column, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                limit: int = 24) -> Page:
+    """Newest-first keyset page of `q`: rows with id < after_id, or the page just before before_id."""
+    if before_id is not None:
+        rows = q.filter(id_column > before_id).order_by(id_column.asc()).limit(limit + 1).all()
+        if not rows:
+            return keyset_page(q, id_column, limit=limit)
+        has_prev = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        next_cursor = rows[-1].id if rows else None
+        prev_cursor = rows[0].id if rows and has_prev else None
+        return Page(rows, next_cursor, prev_cursor)
+    if after_id is not None:
+        q = q.filter(id_column < after_id)
+    rows = q.order_by(id_column.desc()).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].id if rows and has_next else None
+    prev_cursor = rows[0].id if rows and after_id is not None else None
+    return Page(rows, next_cursor, prev_cursor)
 
 class TripService(ServiceBase):
+    PAGE_SIZE = 24
+    MAX_PAGE_SIZE = 100
+
     def list(self) -> List[Trip]:
         return self.db.query(Trip).order_by(Trip.id.desc()).all()
 
+    def page(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+             limit: Optional[int] = None) -> Page:
+        """Newest-first keyset page: trips with id < after_id, or the page just before before_id."""
+        limit = max(1, min(limit or self.PAGE_SIZE, self.MAX_PAGE_SIZE))
+        return keyset_page(self.db.query(Trip), Trip.id, after_id, before_id, limit)
+
+    def count(self) -> int:
+        return self.db.query(func.count(Trip.id)).scalar()
+
     def get(self, id: int) -> Optional[Trip]:
         return self.db.query(Trip).get(id)
 
+    def catalogue_version(self):
+        """(version, updated_at) of the trip catalogue; one primary-key lookup."""
+        row = self.db.query(CatalogueVersion.version, CatalogueVersion.updated_at).filter(CatalogueVersion.id == 1).first()
+        return (row.version, row.updated_at) if row else (0, None)
+
+    @write_operation
     def create(self, **data) -> Trip:
         trip = Trip(**data)
         self.db.add(trip)
+        self.db.flush()
+        fts_index(self.db, trip.id)
+        bump_catalogue_version(self.db)
+        touch_pages(self.db, "index")
         self.db.commit()
         self.db.refresh(trip)
         return trip
 
+    @write_operation
     def update(self, id: int, **data) -> Optional[Trip]:
         trip = self.get(id)
         if not trip:
@@ -28,42 +148,243 @@ class TripService(ServiceBase):
         for k, v in data.items():
             setattr(trip, k, v)
         self.db.add(trip)
+        if {"title", "destination", "description"} & data.keys():
+            self.db.flush()
+            fts_index(self.db, id)
+        if "price" in data:
+            trip_stats.reprice(self.db, id, trip.price)
+        bump_catalogue_version(self.db)
+        touch_pages(self.db, "index", f"trip:{id}")
         self.db.commit()
         self.db.refresh(trip)
         return trip
 
+    @write_operation
     def delete(self, id: int) -> bool:
         trip = self.get(id)
         if not trip:
             return False
         self.db.delete(trip)
+        fts_remove(self.db, id)
+        trip_stats.forget(self.db, id)
+        bump_catalogue_version(self.db)
+        touch_pages(self.db, "index", f"trip:{id}")
         self.db.commit()
         return True
 
+class SearchService(ServiceBase):
+    """Full-text trip search over the trips_fts FTS5 table (title, destination, description)."""
+    # column weights: a hit in the title outranks one in the destination, then the description
+    WEIGHTS = (10.0, 5.0, 1.0)
+    MAX_LIMIT = 100
+    # Ranking every match of a broad term ("ski" -> 35k of 500k trips) costs tens of ms; even listing
+    # them is ~15 ms, and bm25 reads each term's whole doclist for its IDF. So the newest RANK_WINDOW
+    # matches (after the price/date filters) are read newest-first, which FTS5 stops early on, and
+    # ranked here. The window depends only on the query, not the page, so every offset pages through
+    # the same trips in the same order.
+    RANK_WINDOW = 300
+
+    @staticmethod
+    def match_expression(q: str) -> Optional[str]:
+        """User text -> FTS5 query: every word must match, the last one as a prefix (search-as-you-type)."""
+        words = re.findall(r"\w+", q or "")
+        if not words:
+            return None
+        terms = [f'"{w}"' for w in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    @staticmethod
+    def fold(value: str) -> str:
+        """Case- and accent-insensitive form, as the index's unicode61 remove_diacritics tokenizer sees it."""
+        value = value.casefold()
+        if value.isascii():
+            return value
+        return "".join(ch for ch in unicodedata.normalize("NFKD", value) if not unicodedata.combining(ch))
+
+    def ranking(self, q: str) -> Callable:
+        """Sort key for (id, title, destination, description) rows: weighted query-word hits per
+        word of each field, best first; newer trips first on ties, so the order is stable."""
+        words = [self.fold(w) for w in re.findall(r"\w+", q)]
+        pattern = re.compile(r"\b(?:" + "|".join([re.escape(w) + r"\b" for w in words[:-1]]
+                                                 + [re.escape(words[-1])]) + ")")
+
+        def key(row):
+            score = 0.0
+            for weight, value in zip(self.WEIGHTS, row[1:]):
+                if value:
+                    value = self.fold(value)
+                    score += weight * len(pattern.findall(value)) / (1 + value.count(" "))
+            return (-score, -row[0])
+        return key
+
+    def search(self, q: str, min_price: Optional[float] = None, max_price: Optional[float] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None,
+               limit: int = 24, offset: int = 0) -> List[Trip]:
+        match = self.match_expression(q)
+        if not match:
+            return []
+        limit = max(1, min(limit or 24, self.MAX_LIMIT))
+        where = ["trips_fts MATCH :match"]
+        params = {"match": match, "limit": limit, "offset": max(offset or 0, 0)}
+        if min_price is not None:
+            where.append("trips.price >= :min_price")
+            params["min_price"] = min_price
+        if max_price is not None:
+            where.append("trips.price <= :max_price")
+            params["max_price"] = max_price
+        if date_from:
+            where.append("trips.date >= :date_from")
+            params["date_from"] = date_from
+        if date_to:
+            where.append("trips.date <= :date_to")
+            params["date_to"] = date_to
+        params["window"] = self.RANK_WINDOW
+        stmt = text(f"SELECT trips.id, trips.title, trips.destination, trips.description "
+                    f"FROM trips_fts JOIN trips ON trips.id = trips_fts.rowid WHERE {' AND '.join(where)} "
+                    f"ORDER BY trips_fts.rowid DESC LIMIT :window")
+        rows = sorted(self.db.execute(stmt, params), key=self.ranking(q))
+        ids = [row[0] for row in rows[params["offset"]:params["offset"] + limit]]
+        if not ids:
+            return []
+        trips = {t.id: t for t in self.db.query(Trip).filter(Trip.id.in_(ids))}
+        return [trips[i] for i in ids if i in trips]
+
+    def rebuild(self) -> int:
+        """Repopulate trips_fts from trips (repair after out-of-band edits)."""
+        self.db.execute(text("DELETE FROM trips_fts"))
+        fts_index_after(self.db, 0)
+        self.db.commit()
+        return self.db.execute(text("SELECT COUNT(*) FROM trips_fts")).scalar()
+
 class BookingService(ServiceBase):
+    # Listings render b.trip for every row, so load it in the same SELECT instead of one lazy load per row.
     def list_for_trip(self, trip_id: int) -> List[Booking]:
+        # callers already hold the trip; the identity map resolves b.trip without a query
         return self.db.query(Booking).filter(Booking.trip_id == trip_id).order_by(Booking.created_at.desc()).all()
 
     def list_all(self) -> List[Booking]:
-        return self.db.query(Booking).order_by(Booking.created_at.desc()).all()
+        return (self.db.query(Booking).options(joinedload(Booking.trip))
+                .order_by(Booking.created_at.desc()).all())
 
     def list_for_user(self, user_id: int) -> List[Booking]:
-        return self.db.query(Booking).filter(Booking.user_id == user_id).order_by(Booking.created_at.desc()).all()
+        return (self.db.query(Booking).options(joinedload(Booking.trip))
+                .filter(Booking.user_id == user_id).order_by(Booking.created_at.desc()).all())
 
     def get(self, id: int) -> Optional[Booking]:
-        return self.db.query(Booking).get(id)
+        return self.db.get(Booking, id, options=[joinedload(Booking.trip)])
+
+    # Seat inventory: trips.seats_taken only moves through the conditional UPDATEs below, so
+    # concurrent workers cannot oversell and no lock is held while the customer is on the payment page.
+    HOLD_TTL = int(os.environ.get("SEAT_HOLD_TTL", "900"))
+
+    def _take_seats(self, trip_id: int, seats: int) -> bool:
+        result = self.db.execute(
+            update(Trip)
+            .where(Trip.id == trip_id,
+                   or_(Trip.capacity.is_(None), Trip.seats_taken + seats <= Trip.capacity))
+            .values(seats_taken=Trip.seats_taken + seats)
+            .execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            return False
+        bump_catalogue_version(self.db)
+        touch_pages(self.db, f"trip:{trip_id}")
+        return True
+
+    def _release_seats(self, trip_id: int, seats: int):
+        self.db.execute(
+            update(Trip)
+            .where(Trip.id == trip_id)
+            .values(seats_taken=func.max(Trip.seats_taken - seats, 0))
+            .execution_options(synchronize_session=False))
+        bump_catalogue_version(self.db)
+        touch_pages(self.db, f"trip:{trip_id}")
+
+    @write_operation
+    def reserve(self, trip_id: int, seats: int) -> Optional[SeatHold]:
+        """Hold seats for checkout. Returns None if the trip is missing or does not have enough seats left."""
+        if seats < 1:
+            return None
+        if not self._take_seats(trip_id, seats):
+            # abandoned checkouts may be sitting on the seats; reclaim them and try once more
+            if not self.release_expired(trip_id) or not self._take_seats(trip_id, seats):
+                self.db.rollback()
+                return None
+        hold = SeatHold(trip_id=trip_id, seats=seats,
+                        expires_at=datetime.utcnow() + timedelta(seconds=self.HOLD_TTL))
+        self.db.add(hold)
+        self.db.commit()
+        self.db.refresh(hold)
+        return hold
+
+    @write_operation
+    def release_expired(self, trip_id: Optional[int] = None) -> int:
+        """Give back seats from holds past expires_at. Returns the number of seats released."""
+        q = self.db.query(SeatHold.id, SeatHold.trip_id, SeatHold.seats).filter(SeatHold.expires_at < datetime.utcnow())
+        if trip_id is not None:
+            q = q.filter(SeatHold.trip_id == trip_id)
+        released = 0
+        for hold_id, hold_trip_id, seats in q.all():
+            # only the caller whose DELETE removed the hold gives its seats back
+            if self.db.execute(delete(SeatHold).where(SeatHold.id == hold_id)).rowcount == 1:
+                self._release_seats(hold_trip_id, seats)
+                released += seats
+        self.db.commit()
+        return released
+
+    @write_operation
+    def cancel_hold(self, hold_id: int):
+        hold = self.db.get(SeatHold, hold_id)
+        if hold and self.db.execute(delete(SeatHold).where(SeatHold.id == hold_id)).rowcount == 1:
+            self._release_seats(hold.trip_id, hold.seats)
+        self.db.commit()
 
-    def create(self, trip_id: int, user_id: Optional[int] = None, **data) -> Booking:
+    @write_operation
+    def confirm(self, hold_id: int, trip_id: int, seats: int, user_id: Optional[int] = None, **data) -> Optional[Booking]:
+        """Turn a checkout hold into a booking. If the hold already expired and was reclaimed,
+        the seats are taken again if still available; otherwise returns None."""
+        held = self.db.execute(delete(SeatHold).where(SeatHold.id == hold_id, SeatHold.trip_id == trip_id,
+                                                      SeatHold.seats == seats)).rowcount == 1
+        if not held and not self._take_seats(trip_id, seats):
+            self.db.rollback()
+            return None
+        booking = Booking(trip_id=trip_id, user_id=user_id, seats=seats, created_at=datetime.utcnow(), **data)
+        self.db.add(booking)
+        trip_stats.record_bookings(self.db, trip_id, 1, seats, booking.created_at)
+        notifications.notify_booking_confirmation(self.db, booking, self.db.get(Trip, trip_id))
+        self.db.commit()
+        self.db.refresh(booking)
+        return booking
+
+    @write_operation
+    def create(self, trip_id: int, user_id: Optional[int] = None, **data) -> Optional[Booking]:
+        """Book directly without a checkout hold. Returns None if not enough seats are left."""
+        seats = data.setdefault("seats", 1)
+        if not self._take_seats(trip_id, seats):
+            self.db.rollback()
+            return None
+        data.setdefault("created_at", datetime.utcnow())
         booking = Booking(trip_id=trip_id, user_id=user_id, **data)
         self.db.add(booking)
+        trip_stats.record_bookings(self.db, trip_id, 1, seats, booking.created_at)
         self.db.commit()
         self.db.refresh(booking)
         return booking
 
+    @write_operation
     def update(self, id: int, **data) -> Optional[Booking]:
+        """Returns None if the booking is missing or extra seats are not available."""
         booking = self.get(id)
         if not booking:
             return None
+        delta = data.get("seats", booking.seats) - booking.seats
+        if delta > 0 and not self._take_seats(booking.trip_id, delta):
+            self.db.rollback()
+            return None
+        if delta < 0:
+            self._release_seats(booking.trip_id, -delta)
+        if delta:
+            trip_stats.record_bookings(self.db, booking.trip_id, 0, delta)
         for k, v in data.items():
             setattr(booking, k, v)
         self.db.add(booking)
@@ -71,11 +392,21 @@ class BookingService(ServiceBase):
         self.db.refresh(booking)
         return booking
 
+    @write_operation
     def delete(self, id: int) -> bool:
         booking = self.get(id)
         if not booking:
             return False
+        self._release_seats(booking.trip_id, booking.seats)
+        # the booking's expenses go with it (cascade); take them off their trips' totals too
+        for trip_id, amount in (self.db.query(Expense.trip_id, func.sum(Expense.amount))
+                                .filter(Expense.booking_id == id, Expense.trip_id.isnot(None))
+                                .group_by(Expense.trip_id)):
+            trip_stats.record_expenses(self.db, trip_id, -amount)
         self.db.delete(booking)
+        self.db.flush()
+        trip_stats.record_bookings(self.db, booking.trip_id, -1, -booking.seats)
+        trip_stats.refresh_last_booking(self.db, booking.trip_id)
         self.db.commit()
         return True
 
@@ -89,40 +420,136 @@ class ExpenseService(ServiceBase):
     def get(self, id: int) -> Optional[Expense]:
         return self.db.query(Expense).get(id)
 
+    @write_operation
     def create(self, **data) -> Expense:
         expense = Expense(**data)
         self.db.add(expense)
+        trip_stats.record_expenses(self.db, expense.trip_id, expense.amount or 0.0)
+        touch_pages(self.db, f"trip:{expense.trip_id}")
         self.db.commit()
         self.db.refresh(expense)
         return expense
 
+    @write_operation
     def update(self, id: int, **data) -> Optional[Expense]:
         expense = self.get(id)
         if not expense:
             return None
+        old_trip_id, old_amount = expense.trip_id, expense.amount or 0.0
         for k, v in data.items():
             setattr(expense, k, v)
         self.db.add(expense)
+        if expense.trip_id == old_trip_id:
+            trip_stats.record_expenses(self.db, old_trip_id, (expense.amount or 0.0) - old_amount)
+        else:
+            trip_stats.record_expenses(self.db, old_trip_id, -old_amount)
+            trip_stats.record_expenses(self.db, expense.trip_id, expense.amount or 0.0)
+        touch_pages(self.db, f"trip:{old_trip_id}", f"trip:{expense.trip_id}")
         self.db.commit()
         self.db.refresh(expense)
         return expense
 
+    @write_operation
     def delete(self, id: int) -> bool:
         expense = self.get(id)
         if not expense:
             return False
         self.db.delete(expense)
+        trip_stats.record_expenses(self.db, expense.trip_id, -(expense.amount or 0.0))
+        touch_pages(self.db, f"trip:{expense.trip_id}")
         self.db.commit()
         return True
 
+class TripStatsService(ServiceBase):
+    """Reads of the trip_stats read model (see trip_stats.py); one indexed lookup per trip shown."""
+    def for_trips(self, trip_ids) -> Dict[int, TripStats]:
+        ids = list(trip_ids)
+        if not ids:
+            return {}
+        return {s.trip_id: s for s in self.db.query(TripStats).filter(TripStats.trip_id.in_(ids))}
+
+    def totals(self) -> dict:
+        row = self.db.query(func.coalesce(func.sum(TripStats.booking_count), 0),
+                            func.coalesce(func.sum(TripStats.seats_sold), 0),
+                            func.coalesce(func.sum(TripStats.gross_revenue), 0.0),
+                            func.coalesce(func.sum(TripStats.expense_total), 0.0),
+                            func.max(TripStats.last_booking_at)).one()
+        return dict(zip(("bookings", "seats_sold", "gross_revenue", "expense_total", "last_booking_at"), row))
+
+    def rebuild(self) -> int:
+        """Recompute every row from bookings and expenses (repair after out-of-band edits)."""
+        count = trip_stats.rebuild(self.db)
+        self.db.commit()
+        return count
+
+class Identity(NamedTuple):
+    """Read-only view of the logged-in user; safe to keep beyond the session that loaded it."""
+    id: int
+    username: str
+    role: str
+    agent_approved: bool
+
+class UserCache:
+    """Thread-safe LRU of Identity records with a TTL. ttl <= 0 disables caching."""
+    def __init__(self, maxsize: int = 1024, ttl: float = 10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, id: int) -> Optional[Identity]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._items.get(id)
+            if not entry:
+                return None
+            identity, expires = entry
+            if expires < time.monotonic():
+                del self._items[id]
+                return None
+            self._items.move_to_end(id)
+            return identity
+
+    def put(self, identity: Identity):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[identity.id] = (identity, time.monotonic() + self.ttl)
+            self._items.move_to_end(identity.id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, id: int):
+        with self._lock:
+            self._items.pop(id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+# Per-process; USER_CACHE_TTL bounds how long another worker may see a stale approval state.
+user_cache = UserCache(maxsize=int(os.environ.get("USER_CACHE_SIZE", "1024")),
+                       ttl=float(os.environ.get("USER_CACHE_TTL", "10")))
+
 class AuthService(ServiceBase):
+    # admin directories: newest-first keyset pages over users, filtered in SQL
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    MAX_BULK = 1000  # agents per bulk approve/reject
+
     def create_user(self, username: str, password: str, role: str = "customer", agent_approved: bool = False) -> Optional[User]:
+        # hash on the caller's thread: in write-queue mode the insert runs on the single writer thread,
+        # which must not spend its time in scrypt
+        return self._insert_user(username, hasher.hash(password), role, agent_approved)
+
+    @write_operation
+    def _insert_user(self, username: str, password_hash: str, role: str, agent_approved: bool) -> Optional[User]:
         # Enforce unique usernames: if user exists, do not overwrite password/role
         existing = self.db.query(User).filter(User.username == username).first()
         if existing:
             return None
-        user = User(username=username, role=role, agent_approved=agent_approved)
-        user.set_password(password)
+        user = User(username=username, password_hash=password_hash, role=role, agent_approved=agent_approved)
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
@@ -132,33 +559,127 @@ class AuthService(ServiceBase):
         user = self.db.query(User).filter(User.username == username).first()
         if not user:
             return None
-        if user.check_password(password):
-            return user
-        return None
+        if not user.check_password(password):
+            return None
+        if hasher.needs_rehash(user.password_hash):
+            # stored with older hashing parameters; upgrade while we have the plaintext
+            self.rehash_password(user.id, hasher.hash(password))
+        return user
+
+    @write_operation
+    def rehash_password(self, id: int, password_hash: str):
+        self.db.execute(update(User).where(User.id == id).values(password_hash=password_hash)
+                        .execution_options(synchronize_session=False))
+        self.db.commit()
 
     def get_user_by_id(self, id: int) -> Optional[User]:
         return self.db.query(User).get(id)
 
+    def get_identity(self, id: int) -> Optional[Identity]:
+        """Identity for a session user id, served from user_cache when possible."""
+        identity = user_cache.get(id)
+        if identity:
+            return identity
+        row = self.db.query(User.id, User.username, User.role, User.agent_approved).filter(User.id == id).first()
+        if not row:
+            return None
+        identity = Identity(row.id, row.username, row.role, bool(row.agent_approved))
+        user_cache.put(identity)
+        return identity
+
     def list_pending_agents(self) -> List[User]:
         return self.db.query(User).filter(User.role == "agent", User.agent_approved == False).order_by(User.created_at.asc()).all()
 
+    @write_operation
     def approve_agent(self, id: int) -> bool:
         u = self.get_user_by_id(id)
         if not u or u.role != "agent":
             return False
         u.agent_approved = True
         self.db.add(u)
+        notifications.notify_agent_approval(self.db, u, approved=True)
         self.db.commit()
+        user_cache.invalidate(id)
         return True
 
+    @write_operation
     def reject_agent(self, id: int) -> bool:
         u = self.get_user_by_id(id)
         if not u or u.role != "agent":
             return False
+        notifications.notify_agent_approval(self.db, u, approved=False)
         self.db.delete(u)
         self.db.commit()
+        user_cache.invalidate(id)
         return True
 
+    @write_operation
+    def approve_agents(self, ids) -> int:
+        """Approve the given pending agents with one UPDATE; returns how many were approved."""
+        ids = list(ids)[:self.MAX_BULK]
+        if not ids:
+            return 0
+        approved = self.db.execute(
+            update(User).where(User.id.in_(ids), User.role == "agent", User.agent_approved == False)
+            .values(agent_approved=True).returning(User.id, User.username)
+            .execution_options(synchronize_session=False)).all()
+        notifications.notify_agent_approvals(self.db, approved, approved=True)
+        self.db.commit()
+        for row in approved:
+            user_cache.invalidate(row.id)
+        return len(approved)
+
+    @write_operation
+    def reject_agents(self, ids) -> int:
+        """Delete the given pending agent accounts with one DELETE; returns how many were removed."""
+        ids = list(ids)[:self.MAX_BULK]
+        if not ids:
+            return 0
+        rejected = self.db.execute(
+            delete(User).where(User.id.in_(ids), User.role == "agent", User.agent_approved == False)
+            .returning(User.id, User.username)
+            .execution_options(synchronize_session=False)).all()
+        if rejected:
+            # same as the ORM delete in reject_agent: their bookings stay, unlinked
+            self.db.execute(update(Booking).where(Booking.user_id.in_([r.id for r in rejected]))
+                            .values(user_id=None).execution_options(synchronize_session=False))
+        notifications.notify_agent_approvals(self.db, rejected, approved=False)
+        self.db.commit()
+        for row in rejected:
+            user_cache.invalidate(row.id)
+        return len(rejected)
+
+    @staticmethod
+    def _filters(role: Optional[str] = None, approved: Optional[bool] = None, prefix: Optional[str] = None) -> list:
+        conditions = []
+        if role:
+            conditions.append(User.role == role)
+        if approved is not None:
+            conditions.append(User.agent_approved == approved)
+        if prefix:
+            # a range on the username index instead of LIKE (which can't use it); case-sensitive
+            conditions += [User.username >= prefix, User.username < prefix + "\U0010ffff"]
+        return conditions
+
+    def directory(self, role: Optional[str] = None, approved: Optional[bool] = None, prefix: Optional[str] = None,
+                  after_id: Optional[int] = None, before_id: Optional[int] = None,
+                  limit: Optional[int] = None) -> Page:
+        limit = max(1, min(limit or self.PAGE_SIZE, self.MAX_PAGE_SIZE))
+        q = self.db.query(User).filter(*self._filters(role, approved, prefix))
+        return keyset_page(q, User.id, after_id, before_id, limit)
+
+    def directory_counts(self, prefix: Optional[str] = None) -> dict:
+        """Account counts by role and approval in one grouped COUNT (index-only without a prefix)."""
+        counts = {"total": 0, "customer": 0, "agent": 0, "admin": 0, "approved_agents": 0, "pending_agents": 0}
+        rows = (self.db.query(User.role, User.agent_approved, func.count(User.id))
+                .filter(*self._filters(prefix=prefix)).group_by(User.role, User.agent_approved))
+        for role, approved, n in rows:
+            counts["total"] += n
+            counts[role] = counts.get(role, 0) + n
+            if role == "agent":
+                counts["approved_agents" if approved else "pending_agents"] += n
+        return counts
+
     def list_users(self) -> List[User]:
         return self.db.query(User).order_by(User.created_at.desc()).all()
 
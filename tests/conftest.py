@@ -0,0 +1,45 @@
+"""Shared fixtures. The suite runs against one throwaway SQLite file; tests create the rows they
+need and assert on those, so they don't depend on each other's data."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# settings are read at import, so they must be in place before the app modules load
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="triptest-"), "test.db")
+os.environ["OUTBOX_WORKER"] = "off"
+os.environ["PAGE_CACHE"] = "off"
+
+from database import create_tables, db_session  # noqa: E402
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    create_tables()
+
+@pytest.fixture(autouse=True)
+def session_cleanup():
+    yield
+    db_session.remove()
+
+@pytest.fixture
+def app():
+    from app import create_app
+    return create_app({"TESTING": True, "WTF_CSRF_ENABLED": False})
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin_client(app):
+    """A test client logged in as an admin."""
+    from services import AuthService
+    auth = AuthService()
+    if not auth.authenticate("test_admin", "password"):
+        auth.create_user("test_admin", "password", role="admin", agent_approved=True)
+    db_session.remove()
+    client = app.test_client()
+    client.post("/login", data={"username": "test_admin", "password": "password"})
+    return client
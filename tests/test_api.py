@@ -0,0 +1,16 @@
+NDJSON = {"Accept": "application/x-ndjson"}
+
+def test_trip_listing_etag_depends_on_the_format(client):
+    as_json = client.get("/api/trips")
+    as_ndjson = client.get("/api/trips", headers=NDJSON)
+    assert as_ndjson.mimetype == "application/x-ndjson"
+    assert as_json.headers["ETag"] != as_ndjson.headers["ETag"]
+    assert "Accept" in as_json.headers["Vary"] and "Accept" in as_ndjson.headers["Vary"]
+
+    # a cached JSON copy must not satisfy a request for NDJSON
+    revalidated = client.get("/api/trips", headers={**NDJSON, "If-None-Match": as_json.headers["ETag"]})
+    assert revalidated.status_code == 200
+    assert revalidated.mimetype == "application/x-ndjson"
+    unchanged = client.get("/api/trips", headers={"If-None-Match": as_json.headers["ETag"]})
+    assert unchanged.status_code == 304
+    assert "Accept" in unchanged.headers["Vary"]
@@ -0,0 +1,39 @@
+import batch
+from database import get_engine
+from models import Trip
+from sqlalchemy import event
+
+def count_trips(title: str) -> int:
+    with get_engine().connect() as conn:
+        return len(conn.execute(Trip.__table__.select().where(Trip.title == title)).fetchall())
+
+def test_atomic_batch_with_a_failing_item_leaves_no_rows():
+    result = batch.run("trips", [{"op": "create", "data": {"title": "atomic-keep"}},
+                                 {"op": "create", "data": {"price": 10}}], atomic=True)
+    assert result["committed"] is False
+    assert [r["status"] for r in result["results"]] == ["ok", "error"]
+    assert count_trips("atomic-keep") == 0
+
+def test_batch_runs_in_one_transaction():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(get_engine(), "before_cursor_execute", record)
+    try:
+        result = batch.run("trips", [{"op": "create", "data": {"title": "one-tx"}}] * 3)
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", record)
+    assert result["ok"] == 3
+    assert statements.count("BEGIN") == 1
+    assert statements.index("BEGIN") < statements.index("SAVEPOINT")
+    assert count_trips("one-tx") == 3
+
+def test_non_atomic_batch_keeps_good_items():
+    result = batch.run("trips", [{"op": "create", "data": {"title": "partial-keep"}},
+                                 {"op": "update", "id": 10 ** 9, "data": {"price": 1}}])
+    assert result["committed"] is True
+    assert (result["ok"], result["failed"]) == (1, 1)
+    assert result["results"][1]["error"] == "not found"
+    assert count_trips("partial-keep") == 1
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from cache import LRUBackend, page_cache
+from database import db_session
+from services import AuthService
+
+PENDING = b"pending approval"
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(page_cache, "backend", LRUBackend())
+    monkeypatch.setattr(page_cache, "hits", 0)
+    monkeypatch.setattr(page_cache, "misses", 0)
+    return page_cache
+
+def pending_agent_client(app, username: str):
+    agent_id = AuthService().create_user(username, "secret", role="agent").id
+    db_session.remove()
+    client = app.test_client()
+    client.post("/login", data={"username": username, "password": "secret"})
+    client.get("/")  # shows the login flash; pages with flashes are not cached
+    return agent_id, client
+
+@pytest.mark.parametrize("bulk", [False, True], ids=["approve_agent", "approve_agents"])
+def test_approved_agent_is_not_served_their_pending_page(app, memory_cache, bulk):
+    agent_id, client = pending_agent_client(app, f"cached_agent_{int(bulk)}")
+    assert PENDING in client.get("/").data
+    assert PENDING in client.get("/").data
+    assert memory_cache.hits == 1
+
+    auth = AuthService()
+    assert auth.approve_agents([agent_id]) if bulk else auth.approve_agent(agent_id)
+    db_session.remove()
+    assert PENDING not in client.get("/").data
+
+def test_stats_counters_are_exact_under_concurrency(memory_cache):
+    threads, lookups = 8, 2000
+
+    def worker():
+        for _ in range(lookups):
+            memory_cache.get("missing")
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert memory_cache.stats()["misses"] == threads * lookups
@@ -0,0 +1,138 @@
+import email
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import notifications
+from database import db_session
+from models import OutboxMessage
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server on localhost to receive (or refuse) the worker's mail."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.refuse = False
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 stand-in ESMTP")
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith("MAIL"):
+                self.reply("451 try again later" if self.server.refuse else "250 OK")
+            elif command.startswith(("RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                data = b"".join(iter(lambda: self.rfile.readline(), b".\r\n"))
+                self.server.messages.append(email.message_from_bytes(data))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+@pytest.fixture
+def smtp(monkeypatch):
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(server.server_address[1]))
+    monkeypatch.setenv("SMTP_STARTTLS", "0")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def queue_message(subject: str) -> int:
+    msg = notifications.enqueue(db_session(), "booking_confirmed", "guest@example.com", subject, "See you there.")
+    db_session.commit()
+    msg_id = msg.id
+    db_session.remove()
+    return msg_id
+
+def load(msg_id: int) -> OutboxMessage:
+    msg = db_session.get(OutboxMessage, msg_id)
+    db_session.expunge(msg)
+    db_session.remove()
+    return msg
+
+def make_due(msg_id: int):
+    db_session.get(OutboxMessage, msg_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    db_session.remove()
+
+def deliver() -> notifications.OutboxWorker:
+    worker = notifications.OutboxWorker(batch_size=1000)
+    worker.run_once()
+    worker.close()
+    return worker
+
+def test_delivers_over_smtp(smtp):
+    msg_id = queue_message("Delivered")
+    deliver()
+    assert "Delivered" in [m["Subject"] for m in smtp.messages]
+    msg = load(msg_id)
+    assert (msg.status, msg.attempts, msg.last_error) == ("sent", 1, None)
+    assert msg.sent_at is not None
+
+def test_claim_leases_the_message():
+    msg_id = queue_message("Leased")
+    worker, now = notifications.OutboxWorker(), datetime.utcnow()
+    with db_session() as db:
+        assert worker._claim(db, msg_id, now)
+        # a second worker does not get it while the lease runs...
+        assert not worker._claim(db, msg_id, now + timedelta(seconds=notifications.LEASE - 1))
+        # ...but does once a crashed claim's lease is over
+        assert worker._claim(db, msg_id, now + timedelta(seconds=notifications.LEASE))
+        db.commit()
+    msg = load(msg_id)
+    assert (msg.status, msg.attempts) == ("pending", 2)
+    assert msg.next_attempt_at == now + timedelta(seconds=2 * notifications.LEASE)
+
+def test_refused_message_is_retried_with_backoff(smtp):
+    smtp.refuse = True
+    msg_id = queue_message("Retried")
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        deliver()
+        msg = load(msg_id)
+        delay = timedelta(seconds=notifications.BACKOFF_BASE * 2 ** (attempt - 1))
+        assert (msg.status, msg.attempts) == ("pending", attempt)
+        assert "try again later" in msg.last_error
+        assert before + delay <= msg.next_attempt_at <= datetime.utcnow() + delay
+        make_due(msg_id)
+
+    smtp.refuse = False
+    deliver()
+    assert load(msg_id).status == "sent"
+
+def test_message_fails_after_max_attempts(smtp, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 2)
+    smtp.refuse = True
+    msg_id = queue_message("Given up")
+    deliver()
+    make_due(msg_id)
+    worker = deliver()
+    msg = load(msg_id)
+    assert (msg.status, msg.attempts) == ("failed", 2)
+    assert worker.failed >= 1
+    assert "Given up" not in [m["Subject"] for m in smtp.messages]
+
+def test_without_smtp_messages_are_skipped_not_sent(monkeypatch):
+    monkeypatch.delenv("SMTP_SERVER", raising=False)
+    msg_id = queue_message("Not configured")
+    deliver()
+    msg = load(msg_id)
+    assert (msg.status, msg.sent_at, msg.last_error) == ("skipped", None, "SMTP not configured")
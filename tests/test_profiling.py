@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from profiling import RequestProfiler
+
+def test_failed_statements_leave_no_timing_state_behind():
+    engine = create_engine("sqlite://")
+    profiler = RequestProfiler(binds=[engine], slow_query_ms=0)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(exc.OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert not conn.info
+    # only statements that completed are timed
+    assert [q["sql"] for q in profiler.slow_queries] == ["SELECT 1"]
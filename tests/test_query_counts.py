@@ -0,0 +1,10 @@
+from benchmarks.statement_counts import endpoints, measure, seed
+
+def test_statement_counts_do_not_grow_with_data(app):
+    paths = endpoints(*seed(trips=3, bookings_per_trip=2))
+    small = measure(app, paths)
+    assert all(status == 200 for status, _ in small.values()), small
+    seed(trips=27, bookings_per_trip=5)
+    large = measure(app, paths)
+    grown = {key: (small[key][1], large[key][1]) for key in paths if large[key][1] > small[key][1]}
+    assert not grown
@@ -0,0 +1,31 @@
+import bulk
+from database import db_session
+from services import SearchService
+
+def import_trips(rows) -> None:
+    assert bulk.import_rows("trips", rows).rejected == 0
+    db_session.remove()
+
+def test_title_match_outranks_newer_description_matches():
+    import_trips([{"title": "Zanzibar Spice Tour", "destination": "Zanzibar", "price": "900"}])
+    import_trips({"title": f"Island week {i}", "description": "ferry to zanzibar", "price": "100"} for i in range(100))
+    top = SearchService().search("zanz", limit=2)
+    assert [t.title for t in top] == ["Zanzibar Spice Tour", "Island week 99"]
+
+def test_only_the_newest_matches_are_ranked(monkeypatch):
+    monkeypatch.setattr(SearchService, "RANK_WINDOW", 10)
+    import_trips({"title": f"Wombat walk {i}", "price": "50"} for i in range(15))
+    svc = SearchService()
+    titles = {t.title for t in svc.search("wombat", limit=100)}
+    assert titles == {f"Wombat walk {i}" for i in range(5, 15)}
+    assert svc.search("wombat", offset=10) == []
+
+def test_pages_neither_repeat_nor_skip():
+    import_trips({"title": f"Tie {i}", "description": "quokka", "price": str(100 + i % 3)} for i in range(50))
+    svc = SearchService()
+    for filters in ({}, {"max_price": 101}):
+        everything = [t.id for t in svc.search("quokka", limit=100, **filters)]
+        pages = [t.id for offset in range(0, len(everything), 7)
+                 for t in svc.search("quokka", limit=7, offset=offset, **filters)]
+        assert pages == everything
+        assert len(set(pages)) == len(pages) == (50 if not filters else 34)
@@ -0,0 +1,104 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+
+from database import db_session
+from models import Booking, SeatHold, Trip
+from services import BookingService, TripService
+
+def trip_with_capacity(capacity: int) -> int:
+    trip_id = TripService().create(title="seat inventory", price=100, capacity=capacity).id
+    db_session.remove()
+    return trip_id
+
+def seats(trip_id: int):
+    """(trips.seats_taken, seats in bookings, seats in open holds)"""
+    taken = db_session.query(Trip.seats_taken).filter(Trip.id == trip_id).scalar()
+    booked = db_session.query(func.coalesce(func.sum(Booking.seats), 0)).filter(Booking.trip_id == trip_id).scalar()
+    held = db_session.query(func.coalesce(func.sum(SeatHold.seats), 0)).filter(SeatHold.trip_id == trip_id).scalar()
+    db_session.remove()
+    return taken, booked, held
+
+def expire_holds(trip_id: int):
+    db_session.execute(update(SeatHold).where(SeatHold.trip_id == trip_id)
+                       .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db_session.commit()
+    db_session.remove()
+
+def test_concurrent_checkouts_never_oversell():
+    capacity, threads, attempts = 40, 8, 15
+    trip_id = trip_with_capacity(capacity)
+    confirmed, lock = [], threading.Lock()
+
+    def worker():
+        svc = BookingService()
+        ok = 0
+        for i in range(attempts):
+            hold = svc.reserve(trip_id, 1)
+            if hold and svc.confirm(hold.id, trip_id=trip_id, seats=1, customer_name=f"Racer {i}"):
+                ok += 1
+        db_session.remove()
+        with lock:
+            confirmed.append(ok)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    taken, booked, held = seats(trip_id)
+    oversold = max(booked - capacity, 0)
+    assert oversold == 0
+    assert taken <= capacity
+    assert (taken, held) == (booked, 0)
+    # more checkouts than seats were attempted, so the trip sells out
+    assert sum(confirmed) == booked == capacity
+
+def test_expired_hold_is_reclaimed_for_the_next_checkout():
+    trip_id = trip_with_capacity(2)
+    svc = BookingService()
+    stale = svc.reserve(trip_id, 2).id
+    assert svc.reserve(trip_id, 1) is None
+
+    expire_holds(trip_id)
+    fresh = BookingService().reserve(trip_id, 2).id
+    assert seats(trip_id) == (2, 0, 2)
+
+    # the reclaimed hold can no longer be confirmed: its seats went to the next customer
+    assert BookingService().confirm(stale, trip_id=trip_id, seats=2, customer_name="Late") is None
+    assert BookingService().confirm(fresh, trip_id=trip_id, seats=2, customer_name="On time")
+    assert seats(trip_id) == (2, 2, 0)
+
+def test_expired_hold_is_confirmed_while_seats_are_left():
+    trip_id = trip_with_capacity(3)
+    hold = BookingService().reserve(trip_id, 2).id
+    expire_holds(trip_id)
+    assert BookingService().release_expired(trip_id) == 2
+    assert BookingService().confirm(hold, trip_id=trip_id, seats=2, customer_name="Slow payer")
+    assert seats(trip_id) == (2, 2, 0)
+
+def test_checkout_holds_seats_until_complete(client):
+    trip_id = trip_with_capacity(3)
+    form = {"trip_id": trip_id, "customer_name": "Web Guest", "seats": 2, "contact": "guest@example.com"}
+    assert client.post("/booking/checkout", data=form).status_code == 200
+    assert seats(trip_id) == (2, 0, 2)
+
+    # a second checkout in the same session replaces the abandoned hold instead of stacking on it
+    assert client.post("/booking/checkout", data=form).status_code == 200
+    assert seats(trip_id) == (2, 0, 2)
+
+    assert client.post("/booking/complete").status_code == 200
+    assert seats(trip_id) == (2, 2, 0)
+
+def test_checkout_of_a_sold_out_trip_is_refused(app):
+    trip_id = trip_with_capacity(1)
+    first, second = app.test_client(), app.test_client()
+    form = {"trip_id": trip_id, "customer_name": "Web Guest", "seats": 1}
+    assert first.post("/booking/checkout", data=form).status_code == 200
+    refused = second.post("/booking/checkout", data=form)
+    assert refused.status_code == 302
+    assert refused.headers["Location"].endswith(f"/trip/{trip_id}")
+    assert first.post("/booking/complete").status_code == 200
+    assert seats(trip_id) == (1, 1, 0)
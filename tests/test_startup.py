@@ -0,0 +1,40 @@
+import threading
+import time
+
+import database
+from app import create_app
+
+def outbox_threads() -> int:
+    return sum(t.name == "outbox-worker" for t in threading.enumerate())
+
+def test_outbox_worker_starts_with_the_first_request_only():
+    before = outbox_threads()
+    app = create_app({"OUTBOX_WORKER": "thread"})
+    assert "outbox_worker" not in app.extensions
+    assert outbox_threads() == before
+
+    client = app.test_client()
+    client.get("/api/trips")
+    client.get("/api/trips")
+    assert outbox_threads() == before + 1
+    app.extensions["outbox_worker"].set()
+
+def test_concurrent_first_use_builds_one_engine(monkeypatch):
+    monkeypatch.setattr(database, "_engines", {})
+    built, start = [], threading.Barrier(8)
+
+    def factory():
+        time.sleep(0.01)
+        built.append(object())
+        return built[-1]
+
+    def first_use():
+        start.wait()
+        database._lazy("engine", factory)
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1
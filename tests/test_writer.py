@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import passwords
+import writer
+from database import get_engine
+from services import AuthService, TripService
+
+def visible(title: str) -> int:
+    """Rows with this title as seen by an unrelated connection (committed data only)."""
+    conn = sqlite3.connect(get_engine().url.database)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM trips WHERE title = ?", (title,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def op(fn):
+    return (fn, (), {}, Future(), time.perf_counter())
+
+def test_batch_commits_once_for_all_operations():
+    coordinator = writer.WriteCoordinator()
+    seen_mid_batch = []
+    batch = [op(lambda db: TripService(db).create(title="group-commit").id),
+             op(lambda db: seen_mid_batch.append(visible("group-commit"))),
+             op(lambda db: TripService(db).create(title="group-commit").id)]
+    coordinator.run_batch(batch)
+    assert seen_mid_batch == [0]
+    assert all(f.result() is not None for _, _, _, f, _ in batch[::2])
+    assert visible("group-commit") == 2
+
+def test_failed_operation_only_undoes_itself():
+    coordinator = writer.WriteCoordinator()
+
+    def fails(db):
+        TripService(db).create(title="undone")
+        raise ValueError("boom")
+
+    batch = [op(lambda db: TripService(db).create(title="kept").id), op(fails)]
+    coordinator.run_batch(batch)
+    assert isinstance(batch[1][3].exception(), ValueError)
+    assert (visible("kept"), visible("undone")) == (1, 0)
+
+def test_create_user_hashes_on_the_callers_thread(monkeypatch):
+    coordinator = writer.WriteCoordinator()
+    monkeypatch.setattr(writer, "coordinator", coordinator)
+    threads = []
+    original = passwords.hasher.hash
+
+    def hash_and_record(raw):
+        threads.append(threading.current_thread().name)
+        return original(raw)
+
+    monkeypatch.setattr(passwords.hasher, "hash", hash_and_record)
+    user = AuthService().create_user("queued-signup", "pw")
+    assert user is not None and user.check_password("pw")
+    assert threads == [threading.current_thread().name]
+
+def test_checkout_through_the_write_queue(client, monkeypatch):
+    trip_id = TripService().create(title="queued checkout", price=100, capacity=2).id
+    monkeypatch.setattr(writer, "coordinator", writer.WriteCoordinator())
+    form = {"trip_id": trip_id, "customer_name": "Queued Guest", "seats": 1}
+    assert client.post("/booking/checkout", data=form).status_code == 200
+    assert client.post("/booking/complete").status_code == 200
@@ -0,0 +1,122 @@
+"""trip_stats: per-trip booking and expense totals kept up to date by every write.
+
+Dashboards read booking count, seats sold, gross revenue (seats x the trip's
+current price, as in reports.py), expense total and last booking time from
+one row per trip. They never walk Trip.bookings / Trip.expenses. Service
+writes, bulk imports and the data generator change the row in the same
+transaction as the bookings or expenses themselves. Rows are created on
+first use, so trips without activity may have none. rebuild() recomputes
+the table from the source rows after out-of-band edits.
+
+    python trip_stats.py            # rebuild
+    python trip_stats.py --check    # list trips whose row disagrees with the source tables
+
+Functions take a Session or Connection and never commit.
+"""
+import argparse
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import DateTime, bindparam, text
+
+_BOOKINGS = text("""
+    INSERT INTO trip_stats (trip_id, booking_count, seats_sold, gross_revenue, expense_total, last_booking_at)
+    SELECT id, :bookings, :seats, :seats * COALESCE(price, 0), 0, :booked_at FROM trips WHERE id = :trip_id
+    ON CONFLICT (trip_id) DO UPDATE SET
+        booking_count = booking_count + excluded.booking_count,
+        seats_sold = seats_sold + excluded.seats_sold,
+        gross_revenue = (seats_sold + excluded.seats_sold)
+                        * COALESCE((SELECT price FROM trips WHERE id = excluded.trip_id), 0),
+        last_booking_at = COALESCE(MAX(last_booking_at, excluded.last_booking_at),
+                                   last_booking_at, excluded.last_booking_at)
+""").bindparams(bindparam("booked_at", type_=DateTime()))
+
+_EXPENSES = text("""
+    INSERT INTO trip_stats (trip_id, booking_count, seats_sold, gross_revenue, expense_total)
+    SELECT id, 0, 0, 0, :amount FROM trips WHERE id = :trip_id
+    ON CONFLICT (trip_id) DO UPDATE SET expense_total = expense_total + excluded.expense_total
+""")
+
+_LAST_BOOKING = text("UPDATE trip_stats SET last_booking_at = (SELECT MAX(created_at) FROM bookings "
+                     "WHERE trip_id = :trip_id) WHERE trip_id = :trip_id")
+
+_REPRICE = text("UPDATE trip_stats SET gross_revenue = seats_sold * COALESCE(:price, 0) WHERE trip_id = :trip_id")
+
+# the source-of-truth aggregate, for trips with id > :after_id
+_COMPUTED = """
+    SELECT t.id AS trip_id, COALESCE(b.n, 0) AS booking_count, COALESCE(b.seats, 0) AS seats_sold,
+           COALESCE(b.seats, 0) * COALESCE(t.price, 0) AS gross_revenue, COALESCE(e.total, 0) AS expense_total,
+           b.last AS last_booking_at
+    FROM trips t
+    LEFT JOIN (SELECT trip_id, COUNT(*) AS n, SUM(seats) AS seats, MAX(created_at) AS last
+               FROM bookings WHERE trip_id > :after_id GROUP BY trip_id) b ON b.trip_id = t.id
+    LEFT JOIN (SELECT trip_id, SUM(amount) AS total
+               FROM expenses WHERE trip_id > :after_id GROUP BY trip_id) e ON e.trip_id = t.id
+    WHERE t.id > :after_id AND (b.trip_id IS NOT NULL OR e.trip_id IS NOT NULL)
+"""
+
+def record_bookings(db, trip_id: int, bookings: int, seats: int, booked_at: Optional[datetime] = None):
+    """Add (or with negative counts, remove) bookings. After removing, call refresh_last_booking."""
+    db.execute(_BOOKINGS, {"trip_id": trip_id, "bookings": bookings, "seats": seats, "booked_at": booked_at})
+
+def record_bookings_many(db, rows: Iterable[dict]):
+    """record_bookings for many trips in one executemany; rows have trip_id, bookings, seats, booked_at."""
+    rows = list(rows)
+    if rows:
+        db.execute(_BOOKINGS, rows)
+
+def record_expenses(db, trip_id: Optional[int], amount: float):
+    if trip_id is not None and amount:
+        db.execute(_EXPENSES, {"trip_id": trip_id, "amount": amount})
+
+def record_expenses_many(db, rows: Iterable[dict]):
+    """rows have trip_id and amount."""
+    rows = [r for r in rows if r["trip_id"] is not None]
+    if rows:
+        db.execute(_EXPENSES, rows)
+
+def refresh_last_booking(db, trip_id: int):
+    db.execute(_LAST_BOOKING, {"trip_id": trip_id})
+
+def reprice(db, trip_id: int, price: Optional[float]):
+    db.execute(_REPRICE, {"trip_id": trip_id, "price": price})
+
+def forget(db, trip_id: int):
+    db.execute(text("DELETE FROM trip_stats WHERE trip_id = :trip_id"), {"trip_id": trip_id})
+
+def rebuild(db, after_id: int = 0) -> int:
+    """Recompute rows for trips with id > after_id from bookings and expenses. Returns rows written."""
+    db.execute(text("DELETE FROM trip_stats WHERE trip_id > :after_id"), {"after_id": after_id})
+    return db.execute(text("INSERT INTO trip_stats (trip_id, booking_count, seats_sold, gross_revenue, "
+                           "expense_total, last_booking_at) " + _COMPUTED), {"after_id": after_id}).rowcount
+
+def check(db, tolerance: float = 0.005) -> List[int]:
+    """Trip ids whose stored row differs from a fresh aggregate (money compared within tolerance)."""
+    rows = db.execute(text(f"""
+        SELECT c.trip_id FROM ({_COMPUTED}) c
+        LEFT JOIN trip_stats s ON s.trip_id = c.trip_id
+        WHERE s.trip_id IS NULL OR s.booking_count != c.booking_count OR s.seats_sold != c.seats_sold
+           OR ABS(s.gross_revenue - c.gross_revenue) > :tol OR ABS(s.expense_total - c.expense_total) > :tol
+           OR s.last_booking_at IS NOT c.last_booking_at
+        UNION
+        SELECT s.trip_id FROM trip_stats s
+        WHERE (s.booking_count != 0 OR s.expense_total != 0)
+          AND s.trip_id NOT IN (SELECT trip_id FROM ({_COMPUTED}))
+        ORDER BY 1
+    """), {"after_id": 0, "tol": tolerance})
+    return [r[0] for r in rows]
+
+if __name__ == "__main__":
+    from database import create_tables, engine
+
+    parser = argparse.ArgumentParser(description="Rebuild or check the trip_stats read model.")
+    parser.add_argument("--check", action="store_true", help="report drifted trips instead of rebuilding")
+    args = parser.parse_args()
+    create_tables()
+    with engine.begin() as conn:
+        if args.check:
+            drifted = check(conn)
+            print(f"{len(drifted)} trip(s) out of date" + (f": {drifted[:50]}" if drifted else ""))
+            raise SystemExit(1 if drifted else 0)
+        else:
+            print(f"Rebuilt trip_stats: {rebuild(conn)} trips")
@@ -0,0 +1,173 @@
+"""Optional single-writer commit queue.
+
+With WRITE_QUEUE=on, service writes are not run on the caller's session.
+They are queued for one writer thread, which takes every operation waiting
+in the queue (up to WRITE_QUEUE_BATCH), runs each in its own savepoint and
+commits them together in one transaction. Callers block on a future for
+their result, so SQLite sees one writer and one commit per batch instead of
+many threads competing for the write lock.
+
+When WRITE_QUEUE_SIZE operations are already waiting, submit() waits up to
+WRITE_QUEUE_TIMEOUT seconds for room and then raises WriteQueueFull.
+WRITE_QUEUE_MAX_WAIT (ms, default 0) lets the writer linger to grow a batch.
+Objects returned through the queue are detached: their loaded columns are
+readable, unloaded relationships are not.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from database import RoutingSession, immediate
+from profiling import Counter, Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class WriteQueueFull(RuntimeError):
+    """The write queue stayed full for longer than the submit timeout."""
+
+class BatchSession(RoutingSession):
+    """Writer-thread session. While an operation runs inside a batch, the service's own
+    commit() only flushes and rollback() undoes just that operation's savepoint."""
+    def __init__(self, bind=None, **kw):
+        super().__init__(bind=immediate(bind), **kw)
+
+    def commit(self):
+        if "savepoint" in self.info:
+            self.flush()
+        else:
+            super().commit()
+
+    def rollback(self):
+        if "savepoint" in self.info:
+            self.info["savepoint"].rollback()
+            self.info["savepoint"] = self.begin_nested()
+        else:
+            super().rollback()
+
+class WriteCoordinator:
+    def __init__(self, bind=None, max_queue: int = 1000, max_batch: int = 64, max_wait: float = 0.0,
+                 submit_timeout: float = 5.0):
+        self.sessions = sessionmaker(class_=BatchSession, bind=bind, autoflush=False,
+                                     expire_on_commit=False)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.operations = Counter("trip_write_queue_operations_total", "Queued writes by outcome.", ("outcome",))
+        self.rejected = Counter("trip_write_queue_rejected_total", "Writes refused because the queue was full.")
+        self.batch_size = Histogram("trip_write_queue_batch_size", "Operations committed per transaction.",
+                                    buckets=BATCH_SIZE_BUCKETS)
+        self.commit_seconds = Histogram("trip_write_queue_commit_duration_seconds",
+                                        "Time to run and commit one batch.")
+        self.wait_seconds = Histogram("trip_write_queue_wait_seconds",
+                                      "Time from submit until the operation's batch committed.")
+
+    @classmethod
+    def from_env(cls) -> Optional["WriteCoordinator"]:
+        if os.environ.get("WRITE_QUEUE", "off") != "on":
+            return None
+        return cls(max_queue=int(os.environ.get("WRITE_QUEUE_SIZE", "1000")),
+                   max_batch=int(os.environ.get("WRITE_QUEUE_BATCH", "64")),
+                   max_wait=float(os.environ.get("WRITE_QUEUE_MAX_WAIT", "0")) / 1000,
+                   submit_timeout=float(os.environ.get("WRITE_QUEUE_TIMEOUT", "5")))
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(session, *args, **kwargs) for the writer thread."""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put((fn, args, kwargs, future, time.perf_counter()), timeout=self.submit_timeout)
+        except queue.Full:
+            self.rejected.inc()
+            raise WriteQueueFull(f"write queue full ({self._queue.maxsize} pending)") from None
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Submit and wait for the committed result (or the operation's exception)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.perf_counter()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.run_batch(batch)
+            except Exception as e:
+                # never leave a caller waiting on a batch the writer could not finish
+                for _, _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def run_batch(self, batch: list):
+        started = time.perf_counter()
+        done = []
+        db = self.sessions()
+        try:
+            for fn, args, kwargs, future, submitted in batch:
+                try:
+                    db.info["savepoint"] = db.begin_nested()
+                    result = fn(db, *args, **kwargs)
+                    db.info.pop("savepoint").commit()
+                except Exception as e:
+                    savepoint = db.info.pop("savepoint", None)
+                    if savepoint is not None and savepoint.is_active:
+                        savepoint.rollback()
+                    self.operations.inc("failed")
+                    future.set_exception(e)
+                    continue
+                done.append((future, result, submitted))
+            try:
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                for future, _, _ in done:
+                    self.operations.inc("failed")
+                    future.set_exception(e)
+                return
+        finally:
+            db.close()
+        committed = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        self.commit_seconds.observe(committed - started)
+        for future, result, submitted in done:
+            self.operations.inc("committed")
+            self.wait_seconds.observe(committed - submitted)
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        batches, operations = self.batch_size.totals()
+        return {"depth": self.depth, "max_queue": self._queue.maxsize, "max_batch": self.max_batch,
+                "batches": batches, "avg_batch": round(operations / batches, 2) if batches else 0.0}
+
+    def collectors(self) -> Iterable:
+        return [self.operations, self.rejected, self.batch_size, self.commit_seconds, self.wait_seconds]
+
+coordinator = WriteCoordinator.from_env()